@@ -0,0 +1,386 @@
+import html
+import re
+from typing import List, Optional
+
+from sqlalchemy import Float, Integer, String, column, func, literal_column, or_, text
+from sqlalchemy.orm import Session
+
+from models import Licitacao, Orgao
+
+# Postgres: configuração "português sem acento" (stem + unaccent)
+CONFIG_PT = "pt_sem_acento"
+
+MARCA_INICIO = "<mark>"
+MARCA_FIM = "</mark>"
+
+# O banco marca os termos com estes caracteres de controle (não aparecem
+# em texto do PNCP); o texto é escapado para HTML e só então eles viram
+# <mark>…</mark>. O objeto vem de terceiros: nada dele sai como tag.
+_INICIO_BRUTO = "\x02"
+_FIM_BRUTO = "\x03"
+_MARCAS_BRUTAS = re.compile(f"({_INICIO_BRUTO}|{_FIM_BRUTO})")
+
+_TERMO = re.compile(r"\w+", re.UNICODE)
+
+# O que o banco em uso oferece (preenchido por preparar_busca)
+RECURSOS = {"dialeto": None, "fts": False, "trigram": False, "config": "portuguese"}
+
+
+def termos_da_busca(busca: str) -> List[str]:
+    return _TERMO.findall(busca or "")
+
+
+# =======================================================
+# PREPARO DO ÍNDICE (RODA NA SUBIDA DA APLICAÇÃO)
+# =======================================================
+def _tentar(engine, sql: str) -> bool:
+    """Executa um DDL opcional; False se o banco não suportar (sem derrubar a subida)."""
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(sql))
+        return True
+    except Exception as e:
+        print(f"⚠ Busca textual: '{' '.join(sql.split()[:4])} ...' indisponível ({e.__class__.__name__})")
+        return False
+
+
+def ddl_configuracao_postgres() -> str:
+    return f"""
+        CREATE TEXT SEARCH CONFIGURATION {CONFIG_PT} (COPY = portuguese);
+        ALTER TEXT SEARCH CONFIGURATION {CONFIG_PT}
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+    """
+
+
+def ddl_vetor_postgres(config: str) -> str:
+    # coluna gerada: o próprio Postgres mantém o tsvector a cada INSERT/UPDATE
+    return f"""
+        ALTER TABLE licitacoes ADD COLUMN IF NOT EXISTS busca_vetor tsvector
+        GENERATED ALWAYS AS (to_tsvector('{config}'::regconfig, coalesce(objeto, ''))) STORED
+    """
+
+
+# expressão da coluna gerada busca_vetor, como o Postgres a guardou
+SQL_EXPRESSAO_VETOR = """
+    SELECT pg_get_expr(d.adbin, d.adrelid)
+    FROM pg_attrdef d
+    JOIN pg_attribute a ON a.attrelid = d.adrelid AND a.attnum = d.adnum
+    WHERE d.adrelid = 'licitacoes'::regclass AND a.attname = 'busca_vetor'
+"""
+
+_CONFIG_DO_VETOR = re.compile(r"to_tsvector\('([^']+)'::regconfig")
+
+
+def _config_da_coluna(engine) -> Optional[str]:
+    """Configuração com que busca_vetor é gerada (None se não der para ler)."""
+    try:
+        with engine.begin() as conn:
+            expressao = conn.execute(text(SQL_EXPRESSAO_VETOR)).scalar()
+    except Exception as e:
+        print(f"⚠ Busca textual: configuração de busca_vetor não lida ({e.__class__.__name__})")
+        return None
+    achado = _CONFIG_DO_VETOR.search(expressao or "")
+    return achado.group(1) if achado else None
+
+
+def _preparar_postgres(engine):
+    trigram = _tentar(engine, "CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    unaccent = _tentar(engine, "CREATE EXTENSION IF NOT EXISTS unaccent")
+
+    config = "portuguese"
+    if unaccent:
+        with engine.begin() as conn:
+            existe = conn.execute(
+                text("SELECT 1 FROM pg_ts_config WHERE cfgname = :nome"), {"nome": CONFIG_PT}
+            ).first()
+        if existe or _tentar(engine, ddl_configuracao_postgres()):
+            config = CONFIG_PT
+
+    fts = _tentar(engine, ddl_vetor_postgres(config)) and _tentar(engine, """
+        CREATE INDEX IF NOT EXISTS ix_licitacoes_busca_vetor ON licitacoes USING gin (busca_vetor)
+    """)
+
+    if trigram:
+        # pedaços de palavra ("didat", "livr") e ILIKE '%...%' usam este índice
+        trigram = _tentar(engine, """
+            CREATE INDEX IF NOT EXISTS ix_licitacoes_objeto_trgm ON licitacoes USING gin (objeto gin_trgm_ops)
+        """)
+
+    if fts:
+        # ADD COLUMN IF NOT EXISTS não mexe numa coluna de uma subida
+        # anterior (ex.: criada antes do unaccent existir): to_tsquery e
+        # ts_headline têm de usar a configuração com que ela foi gerada
+        da_coluna = _config_da_coluna(engine)
+        if da_coluna and da_coluna != config:
+            print(f"⚠ Busca textual: busca_vetor gerada com '{da_coluna}', não '{config}'; consultas usam '{da_coluna}'")
+            config = da_coluna
+
+    RECURSOS.update({"fts": fts, "trigram": trigram, "config": config})
+
+
+def _preparar_sqlite(engine):
+    with engine.begin() as conn:
+        existia = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'licitacoes_fts'")
+        ).first()
+
+    fts = _tentar(engine, """
+        CREATE VIRTUAL TABLE IF NOT EXISTS licitacoes_fts USING fts5(
+            objeto, content='licitacoes', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    if not fts:
+        RECURSOS["fts"] = False
+        return
+
+    # gatilhos mantêm o índice em dia com a tabela (o upsert dispara o de UPDATE)
+    for sql in (
+        """CREATE TRIGGER IF NOT EXISTS licitacoes_fts_ai AFTER INSERT ON licitacoes BEGIN
+            INSERT INTO licitacoes_fts(rowid, objeto) VALUES (new.id, new.objeto);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS licitacoes_fts_ad AFTER DELETE ON licitacoes BEGIN
+            INSERT INTO licitacoes_fts(licitacoes_fts, rowid, objeto) VALUES ('delete', old.id, old.objeto);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS licitacoes_fts_au AFTER UPDATE OF objeto ON licitacoes BEGIN
+            INSERT INTO licitacoes_fts(licitacoes_fts, rowid, objeto) VALUES ('delete', old.id, old.objeto);
+            INSERT INTO licitacoes_fts(rowid, objeto) VALUES (new.id, new.objeto);
+        END""",
+    ):
+        _tentar(engine, sql)
+
+    if not existia:
+        # licitações gravadas antes do índice existir
+        _tentar(engine, "INSERT INTO licitacoes_fts(licitacoes_fts) VALUES ('rebuild')")
+
+    RECURSOS["fts"] = True
+
+
+def preparar_busca(engine):
+    """Cria (se faltar) o índice de busca textual do banco em uso. Idempotente."""
+    RECURSOS["dialeto"] = engine.dialect.name
+
+    if engine.dialect.name == "postgresql":
+        _preparar_postgres(engine)
+    elif engine.dialect.name == "sqlite":
+        _preparar_sqlite(engine)
+
+
+# =======================================================
+# CONSULTAS
+# =======================================================
+def _tsquery(termos: List[str]):
+    # "livros didat" → livros:* & didat:*  (prefixo: pega palavra incompleta)
+    consulta = " & ".join(f"{termo}:*" for termo in termos)
+    return func.to_tsquery(RECURSOS["config"], consulta)
+
+
+def _radical(termo: str) -> str:
+    """
+    Stemming mínimo para o FTS5 (que não tem o de português): tira o
+    plural, e o prefixo faz o resto ("licitações" → licitaç* → licitação).
+    """
+    if len(termo) >= 5:
+        if termo.lower().endswith(("oes", "ões", "aes", "ães")):
+            return termo[:-3]
+        if termo.lower().endswith("s"):
+            return termo[:-1]
+    return termo
+
+
+def _consulta_fts5(termos: List[str]) -> str:
+    # cada termo entre aspas (nada de sintaxe FTS5 vinda do usuário) + prefixo
+    return " ".join('"' + _radical(termo).replace('"', "") + '"*' for termo in termos)
+
+
+def filtrar_por_busca(query, busca: str):
+    """
+    Aplica `busca` como filtro indexado (sem mexer na ordem da query).
+    Postgres: tsvector OU trigram (os dois índices GIN se combinam num
+    BitmapOr). SQLite: FTS5. Sem índice disponível: ILIKE, como antes.
+    """
+    termos = termos_da_busca(busca)
+    dialeto = RECURSOS["dialeto"]
+
+    if dialeto == "postgresql" and RECURSOS["fts"] and termos:
+        condicao = literal_column("licitacoes.busca_vetor").op("@@")(_tsquery(termos))
+        if RECURSOS["trigram"]:
+            condicao = or_(condicao, Licitacao.objeto.ilike(f"%{busca}%"))
+        return query.filter(condicao)
+
+    if dialeto == "sqlite" and RECURSOS["fts"] and termos:
+        return query.filter(
+            Licitacao.id.in_(
+                text("SELECT rowid FROM licitacoes_fts WHERE licitacoes_fts MATCH :consulta_fts")
+                .bindparams(consulta_fts=_consulta_fts5(termos))
+            )
+        )
+
+    return query.filter(Licitacao.objeto.ilike(f"%{busca}%"))
+
+
+def destacar(texto: Optional[str], termos: List[str]) -> Optional[str]:
+    """
+    Texto → HTML escapado com os termos em <mark>…</mark> (usado quando
+    o banco não faz o destaque).
+    """
+    if not texto:
+        return texto
+    if not termos:
+        return html.escape(texto)
+    padrao = re.compile("(" + "|".join(re.escape(t) for t in termos) + r")\w*", re.IGNORECASE)
+    partes = []
+    posicao = 0
+    for achado in padrao.finditer(texto):
+        partes.append(html.escape(texto[posicao:achado.start()]))
+        partes.append(MARCA_INICIO + html.escape(achado.group(0)) + MARCA_FIM)
+        posicao = achado.end()
+    partes.append(html.escape(texto[posicao:]))
+    return "".join(partes)
+
+
+def _destaque_html(destaque: Optional[str], objeto: Optional[str], termos: List[str]) -> Optional[str]:
+    """Destaque do banco (marcas brutas) → HTML escapado com <mark>…</mark>."""
+    if not destaque or _MARCAS_BRUTAS.search(objeto or ""):
+        # sem destaque do banco, ou o próprio texto tem as marcas brutas
+        return destacar(objeto, termos)
+    partes = []
+    for trecho in _MARCAS_BRUTAS.split(destaque):
+        if trecho == _INICIO_BRUTO:
+            partes.append(MARCA_INICIO)
+        elif trecho == _FIM_BRUTO:
+            partes.append(MARCA_FIM)
+        else:
+            partes.append(html.escape(trecho))
+    return "".join(partes)
+
+
+def _aplicar_filtros(query, uf: str, modalidade: str):
+    if uf:
+        query = query.filter(Licitacao.uf == uf.upper())
+    if modalidade:
+        query = query.filter(Licitacao.modalidade.ilike(f"%{modalidade}%"))
+    return query
+
+
+_COLUNAS_BUSCA = (
+    Licitacao.id,
+    Licitacao.objeto,
+    Orgao.nome.label("orgao"),
+    Licitacao.uf,
+    Licitacao.modalidade,
+    Licitacao.data_publicacao,
+)
+
+
+def consulta_ranqueada_postgres(db: Session, termos: List[str]):
+    """tsvector: relevância (ts_rank_cd) e trecho com as marcas brutas (ts_headline)."""
+    tsq = _tsquery(termos)
+    vetor = literal_column("licitacoes.busca_vetor")
+    return (
+        db.query(
+            *_COLUNAS_BUSCA,
+            func.ts_rank_cd(vetor, tsq).label("relevancia"),
+            func.ts_headline(
+                RECURSOS["config"], Licitacao.objeto, tsq,
+                f'StartSel="{_INICIO_BRUTO}", StopSel="{_FIM_BRUTO}", MaxFragments=2, MaxWords=30, MinWords=10',
+            ).label("destaque"),
+        )
+        .outerjoin(Orgao, Licitacao.orgao_id == Orgao.id)
+        .filter(vetor.op("@@")(tsq))
+    )
+
+
+def buscar_ranqueado(
+    db: Session,
+    busca: str,
+    uf: str = "",
+    modalidade: str = "",
+    limite: int = 20,
+    pagina: int = 1,
+) -> List[dict]:
+    """
+    Licitações que casam com `busca`, mais relevantes primeiro, com o
+    trecho do objeto destacado: HTML escapado, só <mark>…</mark> é tag.
+    """
+    termos = termos_da_busca(busca)
+    if not termos:
+        return []
+
+    dialeto = RECURSOS["dialeto"]
+    colunas_base = _COLUNAS_BUSCA
+    inicio = (pagina - 1) * limite
+
+    if dialeto == "postgresql" and RECURSOS["fts"]:
+        query = consulta_ranqueada_postgres(db, termos)
+        linhas = (
+            _aplicar_filtros(query, uf, modalidade)
+            .order_by(literal_column("relevancia").desc(), Licitacao.id.desc())
+            .offset(inicio).limit(limite).all()
+        )
+
+        if not linhas and RECURSOS["trigram"]:
+            # nada pelo dicionário (erro de digitação, pedaço do meio da palavra):
+            # parecença por trigramas
+            query = (
+                db.query(*colunas_base, func.similarity(Licitacao.objeto, busca).label("relevancia"))
+                .outerjoin(Orgao, Licitacao.orgao_id == Orgao.id)
+                .filter(or_(Licitacao.objeto.ilike(f"%{busca}%"), Licitacao.objeto.op("%")(busca)))
+            )
+            linhas = (
+                _aplicar_filtros(query, uf, modalidade)
+                .order_by(literal_column("relevancia").desc(), Licitacao.id.desc())
+                .offset(inicio).limit(limite).all()
+            )
+
+    elif dialeto == "sqlite" and RECURSOS["fts"]:
+        # bm25: quanto MENOR, mais relevante
+        fts = (
+            text(
+                "SELECT rowid, bm25(licitacoes_fts) AS rank, "
+                "highlight(licitacoes_fts, 0, :inicio_marca, :fim_marca) AS destaque "
+                "FROM licitacoes_fts WHERE licitacoes_fts MATCH :consulta_fts"
+            )
+            .bindparams(consulta_fts=_consulta_fts5(termos), inicio_marca=_INICIO_BRUTO, fim_marca=_FIM_BRUTO)
+            .columns(column("rowid", Integer), column("rank", Float), column("destaque", String))
+            .subquery("fts")
+        )
+        query = (
+            db.query(*colunas_base, (-fts.c.rank).label("relevancia"), fts.c.destaque.label("destaque"))
+            .select_from(Licitacao)
+            .join(fts, fts.c.rowid == Licitacao.id)
+            .outerjoin(Orgao, Licitacao.orgao_id == Orgao.id)
+        )
+        linhas = (
+            _aplicar_filtros(query, uf, modalidade)
+            .order_by(fts.c.rank, Licitacao.id.desc())
+            .offset(inicio).limit(limite).all()
+        )
+
+    else:
+        query = (
+            db.query(*colunas_base)
+            .outerjoin(Orgao, Licitacao.orgao_id == Orgao.id)
+            .filter(Licitacao.objeto.ilike(f"%{busca}%"))
+        )
+        linhas = (
+            _aplicar_filtros(query, uf, modalidade)
+            .order_by(Licitacao.id.desc())
+            .offset(inicio).limit(limite).all()
+        )
+
+    resultado = []
+    for linha in linhas:
+        dados = linha._mapping
+        relevancia = dados.get("relevancia")
+        resultado.append({
+            "id": dados["id"],
+            "objeto": dados["objeto"],
+            "destaque": _destaque_html(dados.get("destaque"), dados["objeto"], termos),
+            "relevancia": round(float(relevancia), 4) if relevancia is not None else None,
+            "orgao": dados["orgao"],
+            "uf": dados["uf"],
+            "modalidade": dados["modalidade"],
+            "data_publicacao": dados["data_publicacao"],
+        })
+    return resultado
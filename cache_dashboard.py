@@ -0,0 +1,193 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from database import engine, insert_dialeto
+from models import VersaoDados
+
+# Quanto tempo uma resposta vale mesmo sem escrita nenhuma
+TTL_PADRAO = int(os.getenv("CACHE_DASHBOARD_TTL", "300"))
+# A cada quantos segundos, no máximo, a versão é relida do banco. É o
+# atraso máximo para ver escritas de outro processo (outro worker, job,
+# python preenchimento.py); as deste processo valem na hora
+CHECAGEM_PADRAO = float(os.getenv("CACHE_DASHBOARD_CHECAGEM", "2"))
+# Quantas respostas (rota + parâmetros) ficam em memória
+CAPACIDADE_PADRAO = int(os.getenv("CACHE_DASHBOARD_CAPACIDADE", "256"))
+
+# sessão com escrita que muda o dashboard: ao confirmar, a versão sobe
+_ALTEROU_DADOS = "altera_dashboard"
+# versão gravada no banco por essa sessão (vale depois do commit)
+_VERSAO_NOVA = "versao_dashboard"
+
+
+# =======================================================
+# CACHE DAS ROTAS DO DASHBOARD
+# =======================================================
+class CacheDashboard:
+    """
+    Respostas do dashboard por (rota, parâmetros), cada uma marcada com a
+    versão dos dados em que foi calculada. Ingestão e acompanhamentos sobem
+    a versão (tabela versao_dados) no mesmo commit da escrita
+    (marcar_alteracao), e daí em diante as entradas antigas não valem
+    mais. A versão é relida do banco no máximo a cada `checagem`
+    segundos: escrita de outro processo aparece em até esse tempo.
+    Além disso: TTL e LRU limitado.
+    """
+
+    def __init__(self, ttl: int = TTL_PADRAO, capacidade: int = CAPACIDADE_PADRAO, checagem: float = CHECAGEM_PADRAO):
+        self.ttl = ttl
+        self.capacidade = capacidade
+        self.checagem = checagem
+        self.versao = 0
+        self.versao_lida_em: Optional[float] = None
+        self.entradas: "OrderedDict[tuple, tuple]" = OrderedDict()  # chave → (versao, expira_em, valor)
+        self.lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.expiradas = 0
+        self.invalidadas = 0
+        self.removidas = 0
+
+    def nova_versao(self, versao: Optional[int] = None):
+        """Escrita confirmada neste processo (com a versão que ela gravou no banco)."""
+        with self.lock:
+            self.versao = max(self.versao + 1, versao or 0)
+
+    def _ler_versao_do_banco(self) -> int:
+        with engine.connect() as conn:
+            return conn.execute(select(VersaoDados.versao).where(VersaoDados.id == 1)).scalar() or 0
+
+    def versao_atual(self) -> int:
+        agora = time.monotonic()
+        if self.versao_lida_em is not None and agora - self.versao_lida_em < self.checagem:
+            return self.versao
+        try:
+            # contexto vazio: a leitura é do cache, não entra no
+            # X-Consultas-SQL / orçamento da rota que chamou
+            versao_banco = contextvars.Context().run(self._ler_versao_do_banco)
+        except Exception as e:
+            print(f"⚠ Cache do dashboard: versão dos dados não lida ({e.__class__.__name__})")
+            return self.versao
+        with self.lock:
+            self.versao_lida_em = agora
+            self.versao = max(self.versao, versao_banco)
+            return self.versao
+
+    def obter_ou_calcular(self, chave: tuple, calcular: Callable):
+        versao = self.versao_atual()
+        with self.lock:
+            entrada = self.entradas.get(chave)
+            if entrada is not None:
+                versao_entrada, expira_em, valor = entrada
+                if versao_entrada == versao and expira_em > time.monotonic():
+                    self.entradas.move_to_end(chave)
+                    self.acertos += 1
+                    return valor
+                if versao_entrada != versao:
+                    self.invalidadas += 1
+                else:
+                    self.expiradas += 1
+                del self.entradas[chave]
+            self.falhas += 1
+
+        # calcula fora do lock (as consultas não travam as outras rotas).
+        # Guarda com a versão lida ANTES: se uma escrita confirmar no meio,
+        # a entrada já nasce velha e a próxima leitura recalcula.
+        valor = calcular()
+
+        with self.lock:
+            self.entradas[chave] = (versao, time.monotonic() + self.ttl, valor)
+            self.entradas.move_to_end(chave)
+            while len(self.entradas) > self.capacidade:
+                self.entradas.popitem(last=False)
+                self.removidas += 1
+        return valor
+
+    def limpar(self):
+        with self.lock:
+            self.entradas.clear()
+            self.versao = 0
+            self.versao_lida_em = None
+
+    def estatisticas(self) -> dict:
+        with self.lock:
+            consultas = self.acertos + self.falhas
+            return {
+                "versao_dados": self.versao,
+                "entradas": len(self.entradas),
+                "capacidade": self.capacidade,
+                "ttl_segundos": self.ttl,
+                "atraso_maximo_outros_processos_segundos": self.checagem,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa_acerto": round(self.acertos / consultas, 4) if consultas else None,
+                "expiradas": self.expiradas,
+                "invalidadas": self.invalidadas,
+                "removidas_lru": self.removidas,
+            }
+
+
+# Instância única do processo
+cache_dashboard = CacheDashboard()
+
+
+def em_cache(funcao):
+    """
+    Decorator de rota: a resposta fica em cache_dashboard, com chave
+    rota + parâmetros (menos a sessão do banco).
+
+        @router.get("/resumo")
+        @orcamento_sql(3)
+        @em_cache
+        def dashboard_resumo(db: Session = Depends(get_db)):
+    """
+    @functools.wraps(funcao)
+    def rota(*args, **kwargs):
+        parametros = tuple(sorted(
+            (nome, valor) for nome, valor in kwargs.items() if not isinstance(valor, Session)
+        ))
+        return cache_dashboard.obter_ou_calcular(
+            (funcao.__name__, parametros), lambda: funcao(*args, **kwargs)
+        )
+    return rota
+
+
+# =======================================================
+# INVALIDAÇÃO: VERSÃO SOBE NO COMMIT DE QUEM ALTEROU OS DADOS
+# =======================================================
+def marcar_alteracao(db: Session):
+    """Chamado pelas escritas que mudam o dashboard; vale quando a sessão confirmar."""
+    db.info[_ALTEROU_DADOS] = True
+
+
+@event.listens_for(Session, "before_commit")
+def _gravar_versao(sessao):
+    # na mesma transação da escrita: os outros processos veem a versão
+    # nova junto com os dados novos
+    if not sessao.info.get(_ALTEROU_DADOS):
+        return
+    stmt = insert_dialeto(sessao, VersaoDados).values(id=1, versao=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[VersaoDados.id],
+        set_={"versao": VersaoDados.versao + 1},
+    ).returning(VersaoDados.versao)
+    sessao.info[_VERSAO_NOVA] = sessao.execute(stmt).scalar()
+
+
+@event.listens_for(Session, "after_commit")
+def _subir_versao(sessao):
+    if sessao.info.pop(_ALTEROU_DADOS, False):
+        cache_dashboard.nova_versao(sessao.info.pop(_VERSAO_NOVA, None))
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_marca(sessao):
+    sessao.info.pop(_ALTEROU_DADOS, None)
+    sessao.info.pop(_VERSAO_NOVA, None)
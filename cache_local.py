@@ -0,0 +1,242 @@
+import gzip
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Iterable, Iterator, List
+
+from leitura_json import iterar_arquivo_json
+
+# Pasta do cache local (substitui o antigo licitacoes_cache.json)
+CACHE_DIR = "licitacoes_cache"
+CACHE_FILE_LEGADO = "licitacoes_cache.json"
+
+REGISTROS_POR_SEGMENTO = 5000
+# "gzip" ou "" (sem compressão)
+COMPRESSAO = os.getenv("CACHE_LOCAL_COMPRESSAO", "gzip")
+
+MANIFESTO = "manifesto.json"
+
+
+def _resumo_item(item: dict) -> dict:
+    """Campos usados para decidir se um segmento interessa a uma consulta."""
+    return {
+        "uf": (item.get("orgaoEntidade") or {}).get("uf") or (item.get("unidadeOrgao") or {}).get("ufSigla"),
+        "modalidade": item.get("modalidadeLicitacao") or item.get("modalidadeId"),
+        "data": item.get("dataPublicacaoPncp"),
+    }
+
+
+# =======================================================
+# CACHE LOCAL EM SEGMENTOS NDJSON
+# =======================================================
+class CacheLocal:
+    """
+    Licitações do PNCP guardadas em segmentos NDJSON (uma licitação por
+    linha, JSON compacto, gzip opcional) só de acréscimo, mais um
+    manifesto pequeno com o resumo de cada segmento (quantos registros,
+    UFs, modalidades e faixa de datas).
+
+    - Acrescentar não reescreve nada: a linha vai para o fim do último
+      segmento (gzip aceita "membros" concatenados) até ele encher.
+    - A leitura é em stream, segmento a segmento, e pula os segmentos cujo
+      resumo não bate com o filtro de UF/modalidade.
+    - Quando a mesma licitação (idCompra) aparece mais de uma vez vale a
+      versão mais nova. Com filtro, uma versão antiga num segmento lido pode
+      aparecer se a nova estiver num segmento pulado — `compactar()` resolve.
+    """
+
+    def __init__(self, diretorio: str = CACHE_DIR, compressao: str = COMPRESSAO):
+        self.diretorio = diretorio
+        self.compressao = compressao or ""
+        self.lock = threading.Lock()
+
+    # ---------- manifesto ----------
+
+    def _caminho(self, nome: str) -> str:
+        return os.path.join(self.diretorio, nome)
+
+    def manifesto(self) -> dict:
+        caminho = self._caminho(MANIFESTO)
+        if not os.path.exists(caminho):
+            return {"versao": 1, "total_registros": 0, "ultimo_numero": 0, "segmentos": []}
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _gravar_manifesto(self, manifesto: dict):
+        manifesto["total_registros"] = sum(s["registros"] for s in manifesto["segmentos"])
+        manifesto["atualizado_em"] = datetime.utcnow().isoformat()
+        temporario = self._caminho(MANIFESTO + ".tmp")
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(manifesto, f, ensure_ascii=False)
+        # troca atômica: leitores nunca veem um manifesto pela metade
+        os.replace(temporario, self._caminho(MANIFESTO))
+
+    def existe(self) -> bool:
+        self._migrar_legado()
+        return bool(self.manifesto()["segmentos"])
+
+    # ---------- escrita ----------
+
+    def _abrir_segmento(self, nome: str, modo: str):
+        caminho = self._caminho(nome)
+        if nome.endswith(".gz"):
+            return gzip.open(caminho, modo + "t", encoding="utf-8", compresslevel=5)
+        return open(caminho, modo, encoding="utf-8")
+
+    def _novo_segmento(self, manifesto: dict) -> dict:
+        # números nunca se repetem, nem depois de limpar/compactar
+        numero = manifesto.get("ultimo_numero", 0) + 1
+        manifesto["ultimo_numero"] = numero
+        nome = f"segmento_{numero:05d}.ndjson" + (".gz" if self.compressao == "gzip" else "")
+        segmento = {
+            "numero": numero,
+            "arquivo": nome,
+            "registros": 0,
+            "ufs": [],
+            "modalidades": [],
+            "data_min": None,
+            "data_max": None,
+        }
+        manifesto["segmentos"].append(segmento)
+        return segmento
+
+    def anexar(self, itens: Iterable[dict]) -> int:
+        """Acrescenta as licitações ao cache. Retorna quantas foram gravadas."""
+        with self.lock:
+            self._migrar_legado()
+            return self._anexar(itens, self.manifesto())
+
+    def _anexar(self, itens: Iterable[dict], manifesto: dict) -> int:
+        os.makedirs(self.diretorio, exist_ok=True)
+
+        segmento = manifesto["segmentos"][-1] if manifesto["segmentos"] else None
+        if segmento is None or segmento["registros"] >= REGISTROS_POR_SEGMENTO:
+            segmento = self._novo_segmento(manifesto)
+
+        gravados = 0
+        arquivo = None
+        ufs, modalidades = set(segmento["ufs"]), set(segmento["modalidades"])
+
+        def fechar_segmento():
+            arquivo.close()
+            segmento["ufs"] = sorted(ufs)
+            segmento["modalidades"] = sorted(modalidades)
+            segmento["bytes"] = os.path.getsize(self._caminho(segmento["arquivo"]))
+
+        try:
+            for item in itens:
+                if arquivo is None:
+                    arquivo = self._abrir_segmento(segmento["arquivo"], "a")
+
+                arquivo.write(json.dumps(item, ensure_ascii=False, separators=(",", ":")))
+                arquivo.write("\n")
+                gravados += 1
+                segmento["registros"] += 1
+
+                resumo = _resumo_item(item)
+                if resumo["uf"]:
+                    ufs.add(resumo["uf"])
+                if resumo["modalidade"] is not None:
+                    modalidades.add(resumo["modalidade"])
+                if resumo["data"]:
+                    segmento["data_min"] = min(filter(None, [segmento["data_min"], resumo["data"]]))
+                    segmento["data_max"] = max(filter(None, [segmento["data_max"], resumo["data"]]))
+
+                if segmento["registros"] >= REGISTROS_POR_SEGMENTO:
+                    fechar_segmento()
+                    arquivo = None
+                    segmento = self._novo_segmento(manifesto)
+                    ufs, modalidades = set(), set()
+        finally:
+            if arquivo:
+                fechar_segmento()
+            # segmento aberto no fim sem nenhuma linha não entra no manifesto
+            manifesto["segmentos"] = [s for s in manifesto["segmentos"] if s["registros"]]
+            self._gravar_manifesto(manifesto)
+
+        return gravados
+
+    def limpar(self):
+        """Apaga todos os segmentos (usado antes de uma coleta que substitui o cache)."""
+        with self.lock:
+            manifesto = self.manifesto()
+            for segmento in manifesto["segmentos"]:
+                caminho = self._caminho(segmento["arquivo"])
+                if os.path.exists(caminho):
+                    os.remove(caminho)
+            if os.path.isdir(self.diretorio):
+                self._gravar_manifesto({"versao": 1, "segmentos": [], "ultimo_numero": manifesto.get("ultimo_numero", 0)})
+
+    def compactar(self) -> dict:
+        """
+        Reescreve o cache sem as versões antigas de licitações repetidas.
+        Os segmentos novos só valem quando o manifesto é trocado, no fim;
+        aí os antigos são apagados.
+        """
+        with self.lock:
+            antigo = self.manifesto()
+            novo = {"versao": 1, "segmentos": [], "ultimo_numero": antigo.get("ultimo_numero", 0)}
+            depois = self._anexar(self._iterar(antigo["segmentos"]), novo)
+
+            for segmento in antigo["segmentos"]:
+                caminho = self._caminho(segmento["arquivo"])
+                if os.path.exists(caminho):
+                    os.remove(caminho)
+
+            return {"registros_antes": antigo["total_registros"], "registros_depois": depois}
+
+    # ---------- leitura ----------
+
+    def _ler_segmento(self, segmento: dict) -> List[str]:
+        with self._abrir_segmento(segmento["arquivo"], "r") as f:
+            return [linha for linha in f if linha.strip()]
+
+    def _iterar(self, segmentos: List[dict]) -> Iterator[dict]:
+        # do mais novo para o mais velho: a primeira versão vista é a atual
+        vistos = set()
+        for segmento in reversed(segmentos):
+            if not os.path.exists(self._caminho(segmento["arquivo"])):
+                continue
+            for linha in reversed(self._ler_segmento(segmento)):
+                item = json.loads(linha)
+                chave = item.get("idCompra") or item.get("numeroControlePNCP")
+                if chave:
+                    if chave in vistos:
+                        continue
+                    vistos.add(chave)
+                yield item
+
+    def segmentos_para(self, uf: str = "", modalidade: str = "") -> List[dict]:
+        """Segmentos que podem ter licitações da UF/modalidade pedidas."""
+        selecionados = []
+        for segmento in self.manifesto()["segmentos"]:
+            if uf and uf.upper() not in {u.upper() for u in segmento["ufs"]}:
+                continue
+            if modalidade and not any(modalidade.lower() in str(m).lower() for m in segmento["modalidades"]):
+                continue
+            selecionados.append(segmento)
+        return selecionados
+
+    def iterar(self, uf: str = "", modalidade: str = "") -> Iterator[dict]:
+        """
+        Licitações do cache, uma por vez (mais novas primeiro).
+        UF/modalidade só servem para pular segmentos inteiros; o filtro
+        linha a linha continua com quem chama.
+        """
+        self._migrar_legado()
+        return self._iterar(self.segmentos_para(uf, modalidade))
+
+    # ---------- arquivo antigo ----------
+
+    def _migrar_legado(self):
+        """Converte o licitacoes_cache.json antigo (array JSON) na primeira leitura."""
+        if not os.path.exists(CACHE_FILE_LEGADO) or os.path.exists(self._caminho(MANIFESTO)):
+            return
+        print(f"🛠 Convertendo {CACHE_FILE_LEGADO} para segmentos NDJSON em {self.diretorio}/")
+        self._anexar(iterar_arquivo_json(CACHE_FILE_LEGADO), self.manifesto())
+        os.replace(CACHE_FILE_LEGADO, CACHE_FILE_LEGADO + ".migrado")
+
+
+# Instância única do processo
+cache_local = CacheLocal()
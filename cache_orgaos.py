@@ -0,0 +1,172 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import insert_dialeto
+from models import Orgao
+
+# Quantos órgãos ficam em memória (os menos usados saem primeiro)
+CAPACIDADE_PADRAO = 20000
+
+ChaveOrgao = Tuple[str, Optional[str], Optional[str]]
+
+
+def _normalizar(chave: ChaveOrgao) -> ChaveOrgao:
+    """Como o índice único uq_orgaos_chave compara: NULL e "" são iguais."""
+    nome, uf, municipio = chave
+    return (nome, uf or "", municipio or "")
+
+
+# =======================================================
+# CACHE DE IDENTIDADE DOS ÓRGÃOS (nome, uf, municipio) → id
+# =======================================================
+class CacheOrgaos:
+    """
+    Mapa em memória (nome, uf, municipio) → orgao_id, compartilhado por
+    todas as coletas do processo.
+
+    - Aquecido uma vez com os órgãos mais recentes da tabela.
+    - LRU limitado: acima da capacidade, sai o menos usado.
+    - Órgãos novos são criados numa transação própria, já confirmada, com
+      INSERT ... ON CONFLICT DO NOTHING sobre o índice único (nome, uf,
+      municipio): se outro processo criou o mesmo órgão no meio tempo, a
+      linha dele é relida e o id é o mesmo. O lock só evita que as coletas
+      deste processo tentem criar o mesmo órgão ao mesmo tempo.
+    """
+
+    def __init__(self, capacidade: int = CAPACIDADE_PADRAO):
+        self.capacidade = capacidade
+        self.ids: "OrderedDict[ChaveOrgao, int]" = OrderedDict()
+        self.aquecido = False
+        self.lock = threading.Lock()
+        self.lock_criacao = threading.Lock()
+
+    def _guardar(self, chave: ChaveOrgao, orgao_id: int):
+        # chamar com self.lock já adquirido
+        self.ids[chave] = orgao_id
+        self.ids.move_to_end(chave)
+        while len(self.ids) > self.capacidade:
+            self.ids.popitem(last=False)
+
+    def _aquecer(self, db: Session):
+        rows = (
+            db.query(Orgao.id, Orgao.nome, Orgao.uf, Orgao.municipio)
+            .order_by(Orgao.id.desc())
+            .limit(self.capacidade)
+            .all()
+        )
+        with self.lock:
+            if self.aquecido:
+                return
+            # do mais antigo para o mais novo: os recentes ficam no fim do LRU;
+            # se houver duplicados antigos, fica o de menor id (igual ao .first())
+            for orgao_id, nome, uf, municipio in reversed(rows):
+                chave = (nome, uf, municipio)
+                if chave not in self.ids:
+                    self._guardar(chave, orgao_id)
+            self.aquecido = True
+
+    def _buscar_memoria(self, chaves: Iterable[ChaveOrgao]) -> Dict[ChaveOrgao, int]:
+        encontrados = {}
+        with self.lock:
+            for chave in chaves:
+                orgao_id = self.ids.get(chave)
+                if orgao_id is not None:
+                    self.ids.move_to_end(chave)
+                    encontrados[chave] = orgao_id
+        return encontrados
+
+    def _buscar_banco(self, conn, chaves: list) -> Dict[ChaveOrgao, int]:
+        encontrados = {}
+        nomes = list({nome for nome, _, _ in chaves})
+        procurados = {}
+        for chave in chaves:
+            procurados.setdefault(_normalizar(chave), []).append(chave)
+
+        for i in range(0, len(nomes), 500):
+            rows = conn.execute(
+                select(Orgao.id, Orgao.nome, Orgao.uf, Orgao.municipio)
+                .where(Orgao.nome.in_(nomes[i:i + 500]))
+                .order_by(Orgao.id)
+            )
+            for orgao_id, nome, uf, municipio in rows:
+                for chave in procurados.get(_normalizar((nome, uf, municipio)), ()):
+                    encontrados.setdefault(chave, orgao_id)
+        return encontrados
+
+    def resolver(self, chaves: Iterable[ChaveOrgao], db: Session) -> Dict[ChaveOrgao, int]:
+        """
+        Devolve {chave: orgao_id} para todas as chaves.
+        O caminho comum (órgão já conhecido) não vai ao banco.
+        """
+        chaves = set(chaves)
+        if not chaves:
+            return {}
+
+        if not self.aquecido:
+            self._aquecer(db)
+
+        ids = self._buscar_memoria(chaves)
+        faltando = [chave for chave in chaves if chave not in ids]
+        if not faltando:
+            return ids
+
+        # Fora da memória: pode existir no banco (saiu do LRU ou foi criado
+        # por outro processo) ou ser realmente novo.
+        with self.lock_criacao:
+            # outra coleta pode ter criado enquanto esperávamos o lock
+            ids.update(self._buscar_memoria(faltando))
+            faltando = [chave for chave in faltando if chave not in ids]
+
+            if faltando:
+                with db.get_bind().begin() as conn:
+                    do_banco = self._buscar_banco(conn, faltando)
+                    # em ordem: dois processos inserindo lotes parecidos
+                    # esperam um pelo outro em vez de travar em ciclo
+                    novos = sorted(
+                        {_normalizar(chave): chave for chave in faltando if chave not in do_banco}.values(),
+                        key=_normalizar,
+                    )
+
+                    criados = {}
+                    for i in range(0, len(novos), 500):
+                        stmt = (
+                            insert_dialeto(db, Orgao)
+                            .values([
+                                {"nome": nome, "uf": uf, "municipio": municipio}
+                                for nome, uf, municipio in novos[i:i + 500]
+                            ])
+                            .on_conflict_do_nothing()
+                            .returning(Orgao.id, Orgao.nome, Orgao.uf, Orgao.municipio)
+                        )
+                        for orgao_id, nome, uf, municipio in conn.execute(stmt):
+                            criados[_normalizar((nome, uf, municipio))] = orgao_id
+
+                    for chave in faltando:
+                        if chave not in do_banco and _normalizar(chave) in criados:
+                            do_banco[chave] = criados[_normalizar(chave)]
+
+                    # conflito não devolve linha: outro processo criou o
+                    # órgão depois da primeira leitura, relê pela chave
+                    restantes = [chave for chave in faltando if chave not in do_banco]
+                    if restantes:
+                        do_banco.update(self._buscar_banco(conn, restantes))
+
+                with self.lock:
+                    for chave, orgao_id in do_banco.items():
+                        self._guardar(chave, orgao_id)
+                ids.update(do_banco)
+
+        return ids
+
+    def limpar(self):
+        with self.lock:
+            self.ids.clear()
+            self.aquecido = False
+
+
+# Instância única do processo
+cache_orgaos = CacheOrgaos()
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, Optional, Tuple
+
+# As datas do PNCP vêm no horário de Brasília, sem fuso; as que vierem
+# com fuso são trazidas para o mesmo relógio (sem horário de verão desde 2019)
+FUSO_PNCP = timezone(timedelta(hours=-3))
+
+# orgaoEntidade.esferaId do PNCP → o mesmo texto de Orgao.esfera
+ESFERAS = {
+    "F": "federal",
+    "E": "estadual",
+    "M": "municipal",
+    "D": "distrital",
+}
+
+
+# =======================================================
+# CONVERSORES (VALOR DO JSON → VALOR DA COLUNA)
+# =======================================================
+def agora_pncp() -> datetime:
+    """Agora, no mesmo relógio das colunas de data (Brasília, sem fuso)."""
+    return datetime.now(FUSO_PNCP).replace(tzinfo=None)
+
+
+def converter_data(valor) -> Optional[datetime]:
+    """
+    Texto de data do PNCP → datetime sem fuso (horário de Brasília).
+    Aceita "2025-01-10", "2025-01-10T10:00:00", com "Z" ou offset.
+    None se vazio ou em formato desconhecido.
+    """
+    if not valor:
+        return None
+    if isinstance(valor, datetime):
+        dt = valor
+    else:
+        texto = str(valor).strip()
+        if texto.endswith("Z"):
+            texto = texto[:-1] + "+00:00"
+        try:
+            dt = datetime.fromisoformat(texto)
+        except ValueError:
+            return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(FUSO_PNCP).replace(tzinfo=None)
+    return dt
+
+
+def converter_valor(valor) -> Optional[Decimal]:
+    """
+    Número do PNCP → Decimal. Texto no formato brasileiro ("1.234,56")
+    também vale. None se vazio, inválido ou não finito.
+    """
+    if valor is None or valor == "" or isinstance(valor, bool):
+        return None
+    # via str: 1000.1 vira Decimal("1000.1"), não a dízima do float
+    texto = str(valor).strip()
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    try:
+        numero = Decimal(texto)
+    except InvalidOperation:
+        return None
+    return numero if numero.is_finite() else None
+
+
+def converter_esfera(valor) -> Optional[str]:
+    if not valor:
+        return None
+    texto = str(valor).strip()
+    return ESFERAS.get(texto.upper(), texto.lower())
+
+
+def converter_texto(valor) -> Optional[str]:
+    if valor is None:
+        return None
+    texto = str(valor).strip()
+    return texto or None
+
+
+# =======================================================
+# CAMPOS DO PNCP PROMOVIDOS A COLUNAS DE Licitacao
+# =======================================================
+# coluna → (caminho no item do PNCP, conversor). Para promover mais um
+# campo: declarar a coluna (com índice) no models.py, incluir em
+# migracoes.COLUNAS_NOVAS/PREENCHIMENTOS e acrescentar aqui.
+CAMPOS_PNCP: Dict[str, Tuple[str, Callable]] = {
+    "publicado_em": ("dataPublicacaoPncp", converter_data),
+    "abertura_em": ("dataAberturaProposta", converter_data),
+    "encerramento_em": ("dataEncerramentoProposta", converter_data),
+    "valor_total_estimado": ("valorTotalEstimado", converter_valor),
+    "esfera": ("orgaoEntidade.esferaId", converter_esfera),
+    "situacao": ("situacaoCompraNome", converter_texto),
+}
+
+
+def _valor_no_caminho(item: dict, caminho: str):
+    valor = item
+    for chave in caminho.split("."):
+        if not isinstance(valor, dict):
+            return None
+        valor = valor.get(chave)
+    return valor
+
+
+def extrair_campos(item: Optional[dict]) -> dict:
+    """Item do PNCP → {coluna: valor convertido} para todas as colunas de CAMPOS_PNCP."""
+    item = item or {}
+    return {
+        coluna: conversor(_valor_no_caminho(item, caminho))
+        for coluna, (caminho, conversor) in CAMPOS_PNCP.items()
+    }
@@ -0,0 +1,256 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from leitura_json import LeitorJson, TAMANHO_BLOCO
+
+# Limite global de chamadas ao PNCP (todas as coletas do processo somadas)
+REQUISICOES_POR_SEGUNDO = float(os.getenv("PNCP_REQUISICOES_POR_SEGUNDO", "5"))
+MAX_TENTATIVAS = 4
+ESPERA_BASE = 1.0   # segundos (dobra a cada tentativa, com jitter)
+ESPERA_MAXIMA = 30.0
+STATUS_REPETIR = (429, 500, 502, 503, 504)
+
+try:
+    import brotli  # noqa: F401  (o urllib3 só descompacta br se existir)
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+
+# =======================================================
+# BALDE DE TOKENS ADAPTATIVO
+# =======================================================
+class BaldeTokens:
+    """
+    Token bucket compartilhado pelas threads.
+    Ao receber 429 a taxa cai pela metade (e respeita o Retry-After,
+    pausando todo mundo); a cada sucesso ela volta a subir aos poucos
+    até o máximo configurado.
+    """
+
+    def __init__(self, taxa_maxima: float, capacidade: Optional[float] = None):
+        self.taxa_maxima = taxa_maxima
+        self.taxa_minima = min(0.2, taxa_maxima)
+        self.taxa = taxa_maxima
+        self.capacidade = capacidade or max(1.0, taxa_maxima)
+        self.tokens = self.capacidade
+        self.ultimo = time.monotonic()
+        self.pausado_ate = 0.0
+        self.lock = threading.Lock()
+
+    def adquirir(self):
+        while True:
+            with self.lock:
+                agora = time.monotonic()
+
+                if agora < self.pausado_ate:
+                    espera = self.pausado_ate - agora
+                else:
+                    self.tokens = min(self.capacidade, self.tokens + (agora - self.ultimo) * self.taxa)
+                    self.ultimo = agora
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    espera = (1 - self.tokens) / self.taxa
+
+            time.sleep(espera)
+
+    def reduzir(self, retry_after: Optional[float] = None):
+        with self.lock:
+            self.taxa = max(self.taxa_minima, self.taxa / 2)
+            self.tokens = 0
+            if retry_after:
+                self.pausado_ate = max(self.pausado_ate, time.monotonic() + retry_after)
+
+    def recuperar(self):
+        with self.lock:
+            self.taxa = min(self.taxa_maxima, self.taxa + 0.1)
+
+
+def _ler_retry_after(valor: Optional[str]) -> Optional[float]:
+    """Retry-After pode vir em segundos ou como data HTTP."""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        quando = parsedate_to_datetime(valor)
+        return max(0.0, (quando - datetime.now(timezone.utc)).total_seconds())
+    except Exception:
+        return None
+
+
+# =======================================================
+# CLIENTE HTTP ÚNICO DO PNCP
+# =======================================================
+class ClientePncp:
+    """
+    Sessão HTTP compartilhada: conexões keep-alive reaproveitadas (sem novo
+    handshake TLS a cada chamada), respostas comprimidas, novas tentativas
+    com backoff exponencial + jitter em 429/5xx/queda de conexão e limite
+    de taxa adaptativo. Guarda a latência das últimas chamadas.
+    """
+
+    def __init__(self, requisicoes_por_segundo: float = REQUISICOES_POR_SEGUNDO, conexoes: int = 32):
+        self.sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=conexoes)
+        self.sessao.mount("https://", adaptador)
+        self.sessao.mount("http://", adaptador)
+        self.sessao.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": ACCEPT_ENCODING,
+        })
+
+        self.balde = BaldeTokens(requisicoes_por_segundo)
+
+        self.lock_stats = threading.Lock()
+        self.latencias = deque(maxlen=1000)
+        self.chamadas = 0
+        self.falhas = 0
+        self.novas_tentativas = 0
+        self.respostas_429 = 0
+
+    def _registrar(self, latencia: float, ok: bool):
+        with self.lock_stats:
+            self.chamadas += 1
+            self.latencias.append(latencia)
+            if not ok:
+                self.falhas += 1
+
+    def get(self, url: str, params: Optional[dict] = None, timeout: float = 180, stream: bool = False) -> requests.Response:
+        """
+        GET com limite de taxa e novas tentativas.
+        Devolve a resposta já validada (raise_for_status); levanta a última
+        exceção se todas as tentativas falharem.
+        """
+        for tentativa in range(MAX_TENTATIVAS):
+            self.balde.adquirir()
+            inicio = time.monotonic()
+            retry_after = None
+
+            try:
+                r = self.sessao.get(url, params=params, timeout=timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._registrar(time.monotonic() - inicio, ok=False)
+                erro = e
+            else:
+                self._registrar(time.monotonic() - inicio, ok=r.status_code < 400)
+
+                if r.status_code not in STATUS_REPETIR:
+                    r.raise_for_status()
+                    self.balde.recuperar()
+                    return r
+
+                erro = requests.HTTPError(f"{r.status_code} em {r.url}", response=r)
+                if r.status_code == 429:
+                    retry_after = _ler_retry_after(r.headers.get("Retry-After"))
+                    with self.lock_stats:
+                        self.respostas_429 += 1
+                    self.balde.reduzir(retry_after)
+                r.close()
+
+            if tentativa == MAX_TENTATIVAS - 1:
+                raise erro
+
+            with self.lock_stats:
+                self.novas_tentativas += 1
+
+            # backoff exponencial com "full jitter"
+            espera = random.uniform(0, min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** tentativa))
+            time.sleep(max(espera, retry_after or 0))
+
+    def get_json(self, url: str, params: Optional[dict] = None, timeout: float = 180) -> dict:
+        """Como get(), já decodificado. PNCP responde 204 sem corpo quando não há dados."""
+        r = self.get(url, params=params, timeout=timeout)
+        if r.status_code == 204 or not r.content:
+            return {}
+        return r.json()
+
+    def iterar_itens(self, url: str, params: Optional[dict] = None, meta: Optional[dict] = None, timeout: float = 180) -> Iterator[dict]:
+        """
+        Os itens de "data" um a um, conforme chegam na resposta em stream
+        (leitura_json.py): nem o corpo bruto nem a lista de itens ficam em
+        memória. As demais chaves do topo (totalPaginas, totalRegistros...)
+        vão para `meta`, completas só quando o iterador termina. Queda no
+        meio da leitura ganha nova tentativa, que pula os itens já entregues.
+        """
+        meta = meta if meta is not None else {}
+        entregues = 0
+
+        for tentativa in range(MAX_TENTATIVAS):
+            r = self.get(url, params=params, timeout=timeout, stream=True)
+            try:
+                if r.status_code == 204:
+                    return
+
+                r.encoding = r.encoding or "utf-8"
+                leitor = LeitorJson(r.iter_content(chunk_size=TAMANHO_BLOCO, decode_unicode=True))
+                if leitor.vazio():
+                    return
+                meta.clear()
+                for posicao, item in enumerate(leitor.iterar_array_da_chave("data", meta)):
+                    if posicao >= entregues:
+                        entregues += 1
+                        yield item
+                return
+            except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError):
+                if tentativa == MAX_TENTATIVAS - 1:
+                    raise
+                with self.lock_stats:
+                    self.novas_tentativas += 1
+                time.sleep(random.uniform(0, min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** tentativa)))
+            finally:
+                r.close()
+
+    def get_itens(self, url: str, params: Optional[dict] = None, timeout: float = 180) -> Tuple[List[dict], dict]:
+        """
+        Como iterar_itens(), mas a página inteira numa lista: para quem
+        precisa dela de uma vez (ex.: a coleta concorrente, que entrega a
+        página de uma thread ao escritor único). Retorna (itens, meta).
+        """
+        meta = {}
+        itens = list(self.iterar_itens(url, params=params, meta=meta, timeout=timeout))
+        return itens, meta
+
+    def estatisticas(self) -> dict:
+        with self.lock_stats:
+            latencias = sorted(self.latencias)
+            dados = {
+                "chamadas": self.chamadas,
+                "falhas": self.falhas,
+                "novas_tentativas": self.novas_tentativas,
+                "respostas_429": self.respostas_429,
+            }
+
+        def percentil(p: float):
+            if not latencias:
+                return None
+            return round(latencias[min(len(latencias) - 1, int(p * len(latencias)))] * 1000, 1)
+
+        dados.update({
+            "taxa_atual_por_segundo": round(self.balde.taxa, 2),
+            "taxa_maxima_por_segundo": self.balde.taxa_maxima,
+            "latencia_ms": {
+                "amostras": len(latencias),
+                "media": round(sum(latencias) / len(latencias) * 1000, 1) if latencias else None,
+                "p50": percentil(0.50),
+                "p95": percentil(0.95),
+                "max": round(latencias[-1] * 1000, 1) if latencias else None,
+            },
+        })
+        return dados
+
+
+# Instância única do processo
+cliente_pncp = ClientePncp()
@@ -0,0 +1,393 @@
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from sqlalchemy.orm import Session
+
+from models import ColetaHistorico
+from ingestao import salvar_lote_no_banco
+from cliente_pncp import cliente_pncp
+from cache_local import cache_local, CACHE_DIR
+from coletor_pncp import PNCP_URL_PUBLICACAO, MODALIDADES_PNCP, coletar_unidades_concorrente
+from sincronizacao import carregar_estados, planejar_inicio, registrar_pagina, marcar_dia_concluido
+
+
+# =======================================================
+# ACOMPANHAMENTO DO PROGRESSO DE UMA COLETA
+# =======================================================
+class ProgressoColeta:
+    """
+    Recebe o andamento de uma coleta.
+    Esta versão não faz nada (chamada direta pela rota, sem job);
+    os jobs em segundo plano usam uma subclasse que grava no banco.
+    """
+
+    def pagina_concluida(self, contagem: Optional[dict] = None):
+        pass
+
+    def registrar_erro(self, erro: dict):
+        pass
+
+    def deve_parar(self) -> bool:
+        return False
+
+
+def somar_contagem(totais: dict, contagem: dict):
+    for chave in ("inseridos", "atualizados", "inalterados"):
+        totais[chave] += contagem.get(chave, 0)
+
+
+def cobertura(resultado: dict) -> dict:
+    """Páginas que o PNCP informou x páginas gravadas nesta coleta."""
+    return {
+        "paginas_esperadas": resultado["paginas_esperadas"],
+        "paginas_coletadas": resultado["paginas_coletadas"],
+        "paginas_fora_do_limite": resultado["paginas_fora_do_limite"],
+        "cobertura_completa": (
+            resultado["paginas_coletadas"] >= resultado["paginas_esperadas"]
+            and not resultado["interrompido"]
+            and not resultado["erros"]
+        ),
+    }
+
+
+def interpretar_modalidades(valor: Union[str, List[int], None], padrao: int = 6) -> List[int]:
+    """
+    "todas", "6,8,9" ou uma lista de códigos → lista de códigos do PNCP.
+    Vazio devolve [padrao]. Levanta ValueError para código desconhecido.
+    """
+    if valor is None or valor == "" or valor == []:
+        return [padrao]
+
+    if isinstance(valor, str):
+        if valor.strip().lower() in ("todas", "todos", "all"):
+            return sorted(MODALIDADES_PNCP)
+        valor = [parte for parte in valor.split(",") if parte.strip()]
+
+    codigos = sorted({int(codigo) for codigo in valor})
+    desconhecidos = [codigo for codigo in codigos if codigo not in MODALIDADES_PNCP]
+    if desconhecidos:
+        raise ValueError(f"Modalidades desconhecidas: {desconhecidos}")
+    return codigos
+
+
+def detalhar_modalidades(resultado: dict, contagens: Dict[int, dict]) -> Dict[str, dict]:
+    """Cobertura e contagens de cada modalidade (vai para ColetaHistorico.detalhes)."""
+    detalhes = {}
+    sem_paginas = {"paginas_esperadas": 0, "paginas_coletadas": 0, "paginas_fora_do_limite": 0, "paginas_com_erro": 0}
+    # modalidade sem nenhuma página a buscar (ex.: já sincronizada) também aparece
+    for modalidade in sorted(set(resultado["por_modalidade"]) | set(contagens)):
+        paginas = resultado["por_modalidade"].get(modalidade, sem_paginas)
+        detalhes[str(modalidade)] = {
+            "nome": MODALIDADES_PNCP.get(modalidade),
+            **paginas,
+            "cobertura_completa": (
+                paginas["paginas_coletadas"] >= paginas["paginas_esperadas"]
+                and not paginas["paginas_com_erro"]
+                and not resultado["interrompido"]
+            ),
+            **contagens.get(modalidade, {}),
+        }
+    return detalhes
+
+
+def gerar_dias(data_inicial: str, data_final: str) -> List[str]:
+    """
+    Lista os dias (AAAAMMDD) do período, inclusive as pontas.
+    Levanta ValueError se as datas estiverem fora do formato.
+    """
+    di = datetime.strptime(data_inicial, "%Y%m%d")
+    df = datetime.strptime(data_final, "%Y%m%d")
+
+    dias = []
+    dia_atual = di
+    while dia_atual <= df:
+        dias.append(dia_atual.strftime("%Y%m%d"))
+        dia_atual += timedelta(days=1)
+    return dias
+
+
+# =======================================================
+# SALVAR CACHE LOCAL (SEGMENTOS NDJSON)
+# =======================================================
+def _sem_repetidos(itens: Iterable[dict], vistos: set) -> Iterator[dict]:
+    """Remove duplicados por idCompra (entre todas as páginas da coleta)."""
+    for item in itens:
+        id_compra = item.get("idCompra")
+        if not id_compra or id_compra in vistos:
+            continue
+        vistos.add(id_compra)
+        yield item
+
+
+def salvar_cache_arquivo(
+    paginas: int = 20,
+    tamanho_pagina: int = 50,
+    substituir: bool = False,
+    progresso: Optional[ProgressoColeta] = None,
+) -> dict:
+    """
+    Cada página é decodificada em stream e acrescentada ao cache local
+    (cache_local.py) sem reescrever o que já estava lá.
+    Com substituir=True o cache é esvaziado antes.
+    """
+    progresso = progresso or ProgressoColeta()
+    vistos = set()
+
+    # a página 1 informa totalPaginas; daí em diante só as páginas que existem
+    ultima = paginas
+    pagina = 0
+
+    while pagina < ultima:
+        pagina += 1
+        if progresso.deve_parar():
+            break
+
+        params = {
+            "dataInicial": "20250101",
+            "dataFinal": "20251231",
+            "codigoModalidadeContratacao": 6,
+            "pagina": pagina,
+            "tamanhoPagina": tamanho_pagina
+        }
+
+        # itens decodificados em stream e gravados no cache conforme chegam
+        meta = {}
+        try:
+            itens = cliente_pncp.iterar_itens(PNCP_URL_PUBLICACAO, params=params, meta=meta)
+            primeiro = next(itens, None)
+            if primeiro is None:
+                break
+
+            # só limpa depois que a primeira página respondeu com dados:
+            # falha logo de cara não apaga o cache
+            if substituir and pagina == 1:
+                cache_local.limpar()
+            cache_local.anexar(_sem_repetidos(chain([primeiro], itens), vistos))
+        except Exception as e:
+            progresso.registrar_erro({"pagina": pagina, "erro": str(e)})
+            return {
+                "erro": str(e),
+                "pagina": pagina,
+                "dados_parciais": len(vistos)
+            }
+
+        if meta.get("totalPaginas") is not None:
+            ultima = min(paginas, meta["totalPaginas"])
+
+        progresso.pagina_concluida()
+
+    manifesto = cache_local.manifesto()
+
+    return {
+        "status": "OK",
+        "salvo_em": CACHE_DIR,
+        "quantidade": len(vistos),
+        "total_no_cache": manifesto["total_registros"],
+        "segmentos": len(manifesto["segmentos"]),
+    }
+
+
+# =======================================================
+# COLETAR + SALVAR VÁRIAS PÁGINAS (MULTIPLO)
+# =======================================================
+def coletar_multiplo(
+    db: Session,
+    data_inicial: str,
+    data_final: str,
+    codigo_modalidade: int = 6,
+    paginas: Optional[int] = None,
+    tamanho_pagina: int = 50,
+    concorrencia: int = 4,
+    requisicoes_por_segundo: float = 4.0,
+    modalidades: Optional[List[int]] = None,
+    progresso: Optional[ProgressoColeta] = None,
+) -> dict:
+    """
+    Lê totalPaginas na página 1 e busca exatamente as páginas restantes
+    do período (em paralelo). `paginas` é só um limite opcional.
+    Com `modalidades`, todas entram na mesma fila (mesma concorrência e
+    mesmo limite de taxa) e `codigo_modalidade` é ignorado.
+    """
+    progresso = progresso or ProgressoColeta()
+    modalidades = modalidades or [codigo_modalidade]
+    totais = {"inseridos": 0, "atualizados": 0, "inalterados": 0}
+    contagens = {m: {"inseridos": 0, "atualizados": 0, "inalterados": 0} for m in modalidades}
+
+    def gravar_pagina(unidade, pagina: int, itens: list, meta: dict):
+        try:
+            contagem = salvar_lote_no_banco(itens, db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        somar_contagem(totais, contagem)
+        somar_contagem(contagens[unidade[2]], contagem)
+        progresso.pagina_concluida(contagem)
+
+    resultado = coletar_unidades_concorrente(
+        {(data_inicial, data_final, modalidade): 1 for modalidade in modalidades},
+        tamanho_pagina=tamanho_pagina,
+        ao_receber_pagina=gravar_pagina,
+        limite_paginas=paginas,
+        concorrencia=concorrencia,
+        requisicoes_por_segundo=requisicoes_por_segundo,
+        ao_falhar=progresso.registrar_erro,
+        deve_parar=progresso.deve_parar,
+    )
+
+    por_modalidade = detalhar_modalidades(resultado, contagens)
+
+    # Registrar histórico apenas do que deu certo
+    historico = ColetaHistorico(
+        fonte="PNCP_MULTIPLO",
+        url="interno /coletar_e_salvar_multiplo",
+        quantidade=totais["inseridos"],
+        paginas_esperadas=resultado["paginas_esperadas"],
+        paginas_coletadas=resultado["paginas_coletadas"],
+        detalhes={"modalidades": modalidades, "por_modalidade": por_modalidade},
+    )
+    db.add(historico)
+    db.commit()
+
+    coletadas = resultado["paginas_coletadas"]
+    esperadas = resultado["paginas_esperadas"]
+
+    return {
+        "status": "OK" if not resultado["erros"] else "PARCIAL",
+        "data_inicial": data_inicial,
+        "data_final": data_final,
+        "modalidades": modalidades,
+        "paginas_processadas": coletadas,
+        **cobertura(resultado),
+        "inseridos": totais["inseridos"],
+        "atualizados": totais["atualizados"],
+        "inalterados": totais["inalterados"],
+        "paginas_com_erro": len(resultado["erros"]),
+        "erros": resultado["erros"],
+        "por_modalidade": por_modalidade,
+        "historico_id": historico.id,
+        "mensagem": f"Coleta finalizada com {coletadas}/{esperadas} páginas processadas com sucesso."
+    }
+
+
+# =======================================================
+# COLETAR PERÍODO COMPLETO (DIA POR DIA, PÁGINA POR PÁGINA)
+# =======================================================
+def coletar_periodo_completo(
+    db: Session,
+    data_inicial: str,
+    data_final: str,
+    codigo_modalidade: int = 6,
+    paginas_por_dia: Optional[int] = None,
+    tamanho_pagina: int = 50,
+    concorrencia: int = 4,
+    requisicoes_por_segundo: float = 4.0,
+    incremental: bool = False,
+    dias_reprocessar: int = 3,
+    modalidades: Optional[List[int]] = None,
+    progresso: Optional[ProgressoColeta] = None,
+) -> dict:
+    """
+    As páginas são buscadas em paralelo; a gravação no banco é feita
+    por um único escritor (a thread que chamou esta função).
+    Cada página gravada avança o checkpoint do dia (sincronizacao.py);
+    no modo incremental só vão ao PNCP os dias que ainda faltam.
+    Com `modalidades`, as unidades (dia, modalidade) de todas elas dividem
+    a mesma fila, e o histórico sai num registro só, com o detalhe de
+    cada modalidade.
+    """
+    progresso = progresso or ProgressoColeta()
+    modalidades = modalidades or [codigo_modalidade]
+    dias = gerar_dias(data_inicial, data_final)
+
+    # checkpoints separados por modalidade
+    estados = {m: carregar_estados(db, dias, m) for m in modalidades}
+    inicio = {
+        m: planejar_inicio(dias, estados[m], tamanho_pagina, incremental, dias_reprocessar)
+        for m in modalidades
+    }
+    gravadas = {m: {} for m in modalidades}
+
+    totais = {"inseridos": 0, "atualizados": 0, "inalterados": 0}
+    contagens = {m: {"inseridos": 0, "atualizados": 0, "inalterados": 0} for m in modalidades}
+
+    def gravar_pagina(unidade, pagina: int, itens: list, meta: dict):
+        data_str, _, modalidade = unidade
+        try:
+            contagem = salvar_lote_no_banco(itens, db)
+            registrar_pagina(
+                db, estados[modalidade], data_str, modalidade, pagina, tamanho_pagina, meta, gravadas[modalidade]
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        somar_contagem(totais, contagem)
+        somar_contagem(contagens[modalidade], contagem)
+        progresso.pagina_concluida(contagem)
+
+    def concluir_dia(unidade, ultima_pagina: int):
+        data_str, _, modalidade = unidade
+        try:
+            marcar_dia_concluido(db, estados[modalidade], data_str, modalidade, tamanho_pagina, ultima_pagina)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    resultado = coletar_unidades_concorrente(
+        {
+            (data_str, data_str, modalidade): pagina
+            for modalidade in modalidades
+            for data_str, pagina in inicio[modalidade].items()
+        },
+        tamanho_pagina=tamanho_pagina,
+        ao_receber_pagina=gravar_pagina,
+        limite_paginas=paginas_por_dia,
+        concorrencia=concorrencia,
+        requisicoes_por_segundo=requisicoes_por_segundo,
+        ao_falhar=progresso.registrar_erro,
+        deve_parar=progresso.deve_parar,
+        ao_concluir_unidade=concluir_dia,
+    )
+
+    por_modalidade = detalhar_modalidades(resultado, contagens)
+    for modalidade in modalidades:
+        por_modalidade[str(modalidade)]["dias_processados"] = len(inicio[modalidade])
+        por_modalidade[str(modalidade)]["dias_ja_sincronizados"] = len(dias) - len(inicio[modalidade])
+
+    historico = ColetaHistorico(
+        fonte="PNCP_PERIODO_COMPLETO",
+        url="interno /coletar_periodo_completo",
+        quantidade=totais["inseridos"],
+        paginas_esperadas=resultado["paginas_esperadas"],
+        paginas_coletadas=resultado["paginas_coletadas"],
+        detalhes={"modalidades": modalidades, "por_modalidade": por_modalidade},
+    )
+    db.add(historico)
+    db.commit()
+
+    # um dia conta como sincronizado só quando está em dia em todas as modalidades
+    dias_processados = set()
+    for modalidade in modalidades:
+        dias_processados.update(inicio[modalidade])
+
+    return {
+        "status": "OK" if not resultado["erros"] else "PARCIAL",
+        "periodo": f"{data_inicial} → {data_final}",
+        "modalidades": modalidades,
+        "dias_processados": len(dias_processados),
+        "dias_ja_sincronizados": len(dias) - len(dias_processados),
+        "paginas_processadas": resultado["paginas_coletadas"],
+        **cobertura(resultado),
+        "inseridos": totais["inseridos"],
+        "atualizados": totais["atualizados"],
+        "inalterados": totais["inalterados"],
+        "paginas_com_erro": len(resultado["erros"]),
+        "erros": resultado["erros"],
+        "por_modalidade": por_modalidade,
+        "historico_id": historico.id,
+    }
@@ -0,0 +1,276 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cliente_pncp import cliente_pncp
+
+PNCP_URL_PUBLICACAO = "https://pncp.gov.br/api/consulta/v1/contratacoes/publicacao"
+
+# Unidade de coleta: (data_inicial, data_final, codigo_modalidade)
+Unidade = Tuple[str, str, int]
+
+# Modalidades de contratação do PNCP (codigoModalidadeContratacao)
+MODALIDADES_PNCP = {
+    1: "Leilão - Eletrônico",
+    2: "Diálogo Competitivo",
+    3: "Concurso",
+    4: "Concorrência - Eletrônica",
+    5: "Concorrência - Presencial",
+    6: "Pregão - Eletrônico",
+    7: "Pregão - Presencial",
+    8: "Dispensa de Licitação",
+    9: "Inexigibilidade",
+    10: "Manifestação de Interesse",
+    11: "Pré-qualificação",
+    12: "Credenciamento",
+    13: "Leilão - Presencial",
+}
+
+
+# =======================================================
+# LIMITADOR DE TAXA (ORÇAMENTO GLOBAL DE REQUISIÇÕES)
+# =======================================================
+class LimitadorTaxa:
+    """
+    Espaça as requisições para não passar de N por segundo,
+    somando TODAS as threads desta coleta. Por cima dele ainda vale o
+    limite global do processo (cliente_pncp.py).
+    """
+
+    def __init__(self, requisicoes_por_segundo: float):
+        self.intervalo = 1.0 / requisicoes_por_segundo
+        self.proximo_horario = time.monotonic()
+        self.lock = threading.Lock()
+
+    def aguardar(self):
+        with self.lock:
+            agora = time.monotonic()
+            horario = max(agora, self.proximo_horario)
+            self.proximo_horario = horario + self.intervalo
+
+        espera = horario - agora
+        if espera > 0:
+            time.sleep(espera)
+
+
+# =======================================================
+# BUSCA DE 1 PÁGINA (RODA DENTRO DAS THREADS)
+# =======================================================
+def buscar_pagina(
+    unidade: Unidade,
+    pagina: int,
+    tamanho_pagina: int,
+    limitador: LimitadorTaxa,
+) -> Tuple[List[dict], dict]:
+    """
+    Retorna (itens, meta), onde meta traz os totais que o PNCP informa
+    (totalPaginas, totalRegistros).
+    """
+    data_inicial, data_final, codigo_modalidade = unidade
+    params = {
+        "dataInicial": data_inicial,
+        "dataFinal": data_final,
+        "codigoModalidadeContratacao": codigo_modalidade,
+        "pagina": pagina,
+        "tamanhoPagina": tamanho_pagina
+    }
+
+    limitador.aguardar()
+    # decodificado em stream, mas montado em lista: a página vai inteira
+    # para o escritor único (outra thread). PNCP responde 204 (sem corpo)
+    # quando não há mais registros
+    itens, meta = cliente_pncp.get_itens(PNCP_URL_PUBLICACAO, params=params)
+    return itens, meta
+
+
+# =======================================================
+# COLETA CONCORRENTE DE VÁRIAS UNIDADES
+# =======================================================
+def coletar_unidades_concorrente(
+    unidades: Dict[Unidade, int],
+    tamanho_pagina: int,
+    ao_receber_pagina: Callable[[Unidade, int, List[dict], dict], None],
+    limite_paginas: Optional[int] = None,
+    concorrencia: int = 4,
+    requisicoes_por_segundo: float = 4.0,
+    ao_falhar: Optional[Callable[[dict], None]] = None,
+    deve_parar: Optional[Callable[[], bool]] = None,
+    ao_concluir_unidade: Optional[Callable[[Unidade, int], None]] = None,
+) -> dict:
+    """
+    Busca as páginas (unidade, página) em paralelo num pool de threads.
+    `unidades` diz por qual página cada unidade começa (1, ou a seguinte ao
+    checkpoint).
+
+    - A primeira página de cada unidade traz `totalPaginas`: a partir dela o
+      conjunto exato das páginas restantes é planejado e agendado de uma vez
+      (sem "sondar até vir vazio"). Se o PNCP não informar o total, volta a
+      encadear página a página enquanto elas vierem cheias.
+    - `limite_paginas` (opcional) corta cada unidade nessa página; o que
+      ficou de fora aparece em `paginas_fora_do_limite`.
+    - Só a thread que chamou esta função grava no banco: cada página recebida
+      é entregue a `ao_receber_pagina` (escritor único, a Session não é thread-safe).
+    - Uma página que falha é registrada em `erros` (e avisada em `ao_falhar`)
+      e a coleta continua.
+    - Se `deve_parar` devolver True, nada novo é agendado e as páginas ainda
+      na fila são descartadas (cancelamento).
+    - `ao_concluir_unidade(unidade, ultima_pagina)` é chamado quando todas as
+      páginas que o PNCP tem para a unidade foram gravadas (não é chamado se
+      houve erro, cancelamento ou corte por `limite_paginas`).
+
+    Cobertura: `paginas_esperadas` (o que o PNCP disse existir) x
+    `paginas_coletadas` (o que foi gravado), no total e em `por_modalidade`.
+    """
+    limitador = LimitadorTaxa(requisicoes_por_segundo)
+    paginas_coletadas = 0
+    paginas_esperadas = 0
+    paginas_fora_do_limite = 0
+    erros = []
+    interrompido = False
+    por_modalidade = {
+        modalidade: {"paginas_esperadas": 0, "paginas_coletadas": 0, "paginas_fora_do_limite": 0, "paginas_com_erro": 0}
+        for modalidade in sorted({u[2] for u in unidades})
+    }
+
+    # estado por unidade
+    ultima_conhecida = {}   # última página que o PNCP tem (quando já se sabe)
+    faltando = {u: set() for u in unidades}
+    com_falha = set()
+    cortadas = set()
+
+    def registrar_erro(unidade: Unidade, pagina: int, e: Exception):
+        erro = {
+            "data_inicial": unidade[0],
+            "data_final": unidade[1],
+            "modalidade": unidade[2],
+            "pagina": pagina,
+            "erro": str(e),
+        }
+        erros.append(erro)
+        por_modalidade[unidade[2]]["paginas_com_erro"] += 1
+        com_falha.add(unidade)
+        if ao_falhar:
+            ao_falhar(erro)
+
+    def tentar_concluir(unidade: Unidade):
+        if (
+            not ao_concluir_unidade
+            or unidade not in ultima_conhecida
+            or faltando[unidade]
+            or unidade in com_falha
+            or unidade in cortadas
+        ):
+            return
+        try:
+            ao_concluir_unidade(unidade, ultima_conhecida[unidade])
+        except Exception as e:
+            print(f"⚠ Erro ao concluir {unidade}: {e}")
+            registrar_erro(unidade, ultima_conhecida[unidade], e)
+
+    with ThreadPoolExecutor(max_workers=concorrencia) as pool:
+
+        def agendar(unidade: Unidade, pagina: int):
+            fut = pool.submit(buscar_pagina, unidade, pagina, tamanho_pagina, limitador)
+            pendentes[fut] = (unidade, pagina)
+            faltando[unidade].add(pagina)
+
+        def planejar(unidade: Unidade, pagina: int, itens: List[dict], meta: dict):
+            """Decide o que agendar depois de receber `pagina` (com itens)."""
+            nonlocal paginas_esperadas, paginas_fora_do_limite
+            total = meta.get("totalPaginas")
+            primeira = pagina == unidades[unidade]
+            da_modalidade = por_modalidade[unidade[2]]
+
+            if total is not None and primeira:
+                ultima_conhecida[unidade] = total
+                paginas_esperadas += max(total - pagina + 1, 1)
+                da_modalidade["paginas_esperadas"] += max(total - pagina + 1, 1)
+                ate = total if limite_paginas is None else min(total, limite_paginas)
+                if ate < total:
+                    cortadas.add(unidade)
+                    paginas_fora_do_limite += total - ate
+                    da_modalidade["paginas_fora_do_limite"] += total - ate
+                if interrompido and ate > pagina:
+                    # o resto nem foi agendado: a unidade não está completa
+                    cortadas.add(unidade)
+                elif not interrompido:
+                    for proxima in range(pagina + 1, ate + 1):
+                        agendar(unidade, proxima)
+                return
+
+            if total is not None:
+                # página do plano: nada novo a agendar
+                return
+
+            # PNCP sem total: encadeia enquanto vier cheia
+            if primeira:
+                paginas_esperadas += 1
+                da_modalidade["paginas_esperadas"] += 1
+            if len(itens) < tamanho_pagina:
+                ultima_conhecida[unidade] = pagina
+            elif limite_paginas is not None and pagina >= limite_paginas:
+                cortadas.add(unidade)
+            elif interrompido:
+                cortadas.add(unidade)
+            else:
+                paginas_esperadas += 1
+                da_modalidade["paginas_esperadas"] += 1
+                agendar(unidade, pagina + 1)
+
+        pendentes = {}
+        for unidade, pagina in unidades.items():
+            agendar(unidade, pagina)
+
+        while pendentes:
+            concluidos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+
+            for fut in concluidos:
+                unidade, pagina = pendentes.pop(fut)
+                if fut.cancelled():
+                    continue
+
+                try:
+                    itens, meta = fut.result()
+                except Exception as e:
+                    faltando[unidade].discard(pagina)
+                    print(f"⚠ Erro ao coletar {unidade}, página {pagina}: {e}")
+                    registrar_erro(unidade, pagina, e)
+                    continue
+
+                if not itens:
+                    # nada nesta página: a unidade termina na anterior
+                    faltando[unidade].discard(pagina)
+                    if pagina == unidades[unidade] or unidade not in ultima_conhecida:
+                        ultima_conhecida[unidade] = pagina - 1
+                    tentar_concluir(unidade)
+                    continue
+
+                if not interrompido and deve_parar and deve_parar():
+                    interrompido = True
+                    for pendente in pendentes:
+                        pendente.cancel()
+
+                planejar(unidade, pagina, itens, meta)
+
+                try:
+                    ao_receber_pagina(unidade, pagina, itens, meta)
+                except Exception as e:
+                    faltando[unidade].discard(pagina)
+                    print(f"⚠ Erro ao gravar {unidade}, página {pagina}: {e}")
+                    registrar_erro(unidade, pagina, e)
+                    continue
+
+                faltando[unidade].discard(pagina)
+                paginas_coletadas += 1
+                por_modalidade[unidade[2]]["paginas_coletadas"] += 1
+                tentar_concluir(unidade)
+
+    return {
+        "paginas_coletadas": paginas_coletadas,
+        "paginas_esperadas": paginas_esperadas,
+        "paginas_fora_do_limite": paginas_fora_do_limite,
+        "erros": erros,
+        "interrompido": interrompido,
+        "por_modalidade": por_modalidade,
+    }
@@ -0,0 +1,21 @@
+import os
+
+from starlette.middleware.gzip import GZipMiddleware
+
+# Respostas menores que isso saem sem compressão (não compensa o CPU)
+COMPRESSAO_MINIMO = int(os.getenv("COMPRESSAO_MINIMO", "1024"))
+# gzip 6: quase a mesma taxa do nível máximo, bem mais rápido
+NIVEL_GZIP = 6
+
+
+# =======================================================
+# MIDDLEWARE: GZIP QUANDO O CLIENTE ACEITA
+# =======================================================
+def instalar_compressao(app):
+    """
+    Comprime com gzip as respostas acima de COMPRESSAO_MINIMO bytes para
+    clientes que mandam Accept-Encoding: gzip. O GZipMiddleware do
+    Starlette, só com os parâmetros públicos (minimum_size, compresslevel);
+    streams (ndjson) são comprimidos pedaço a pedaço.
+    """
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSAO_MINIMO, compresslevel=NIVEL_GZIP)
@@ -0,0 +1,158 @@
+from collections import Counter
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from cache_dashboard import marcar_alteracao
+from database import SessionLocal, insert_dialeto
+from models import ContagemInteresses, ContagemLicitacoes, ContagemOrgaos, Licitacao, LicitacaoInteresse
+
+ChaveContagem = Tuple[str, str, str, int]  # (dia AAAAMMDD, uf, modalidade, orgao_id)
+
+
+def chave_contagem(publicado_em, uf: Optional[str], modalidade: Optional[str], orgao_id: Optional[int]) -> ChaveContagem:
+    if isinstance(publicado_em, datetime):
+        dia = publicado_em.strftime("%Y%m%d")
+    else:
+        # func.date(): date no Postgres, "AAAA-MM-DD" no SQLite
+        dia = str(publicado_em or "").replace("-", "")[:8]
+    return (dia, uf or "", modalidade or "", orgao_id or 0)
+
+
+def _por_tabela(deltas: Counter) -> Tuple[Counter, Counter]:
+    """{(dia, uf, modalidade, orgao_id): n} → o que cabe em cada tabela de contagem."""
+    por_uf_modalidade = Counter()
+    por_orgao = Counter()
+    for (dia, uf, modalidade, orgao_id), n in deltas.items():
+        por_uf_modalidade[(dia, uf, modalidade)] += n
+        por_orgao[(dia, orgao_id)] += n
+    return por_uf_modalidade, por_orgao
+
+
+# =======================================================
+# ATUALIZAÇÃO INCREMENTAL (NA MESMA TRANSAÇÃO DA ESCRITA)
+# =======================================================
+def somar_licitacoes(db: Session, deltas: Counter):
+    """
+    Soma {(dia, uf, modalidade, orgao_id): +n/-n} em contagem_licitacoes e
+    contagem_orgaos com upserts (total = total + n). Não faz commit: entra
+    no commit da ingestão, que também invalida o cache do dashboard
+    (cache_dashboard.py).
+    """
+    por_uf_modalidade, por_orgao = _por_tabela(deltas)
+    linhas = [
+        {"dia": dia, "uf": uf, "modalidade": modalidade, "total": n}
+        for (dia, uf, modalidade), n in por_uf_modalidade.items()
+        if n
+    ]
+    linhas_orgao = [
+        {"dia": dia, "orgao_id": orgao_id, "total": n}
+        for (dia, orgao_id), n in por_orgao.items()
+        if n
+    ]
+    if not linhas and not linhas_orgao:
+        return
+
+    marcar_alteracao(db)
+    if linhas:
+        stmt = insert_dialeto(db, ContagemLicitacoes).values(linhas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ContagemLicitacoes.dia, ContagemLicitacoes.uf, ContagemLicitacoes.modalidade],
+            set_={"total": ContagemLicitacoes.total + stmt.excluded.total},
+        )
+        db.execute(stmt)
+    if linhas_orgao:
+        stmt = insert_dialeto(db, ContagemOrgaos).values(linhas_orgao)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ContagemOrgaos.dia, ContagemOrgaos.orgao_id],
+            set_={"total": ContagemOrgaos.total + stmt.excluded.total},
+        )
+        db.execute(stmt)
+
+
+def somar_interesses(db: Session, status: Optional[str], n: int):
+    """+n/-n no status; chamar antes do commit da rota que mexeu no acompanhamento."""
+    if not status or not n:
+        return
+
+    marcar_alteracao(db)
+    stmt = insert_dialeto(db, ContagemInteresses).values(status=status, total=n)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ContagemInteresses.status],
+        set_={"total": ContagemInteresses.total + stmt.excluded.total},
+    )
+    db.execute(stmt)
+
+
+# =======================================================
+# RECÁLCULO COMPLETO
+# =======================================================
+def recalcular_contagens(db: Session):
+    """
+    Refaz as tabelas de contagem a partir de licitacoes e
+    licitacoes_interesse (um GROUP BY em cada). Não faz commit.
+    """
+    por_chave = Counter()
+    linhas = (
+        db.query(
+            func.date(Licitacao.publicado_em),
+            Licitacao.uf,
+            Licitacao.modalidade,
+            Licitacao.orgao_id,
+            func.count(Licitacao.id),
+        )
+        .group_by(func.date(Licitacao.publicado_em), Licitacao.uf, Licitacao.modalidade, Licitacao.orgao_id)
+        .all()
+    )
+    for dia, uf, modalidade, orgao_id, total in linhas:
+        # uf NULL e "" caem na mesma chave
+        por_chave[chave_contagem(dia, uf, modalidade, orgao_id)] += total
+    por_uf_modalidade, por_orgao = _por_tabela(por_chave)
+
+    status_rows = (
+        db.query(LicitacaoInteresse.status, func.count(LicitacaoInteresse.id))
+        .group_by(LicitacaoInteresse.status)
+        .all()
+    )
+
+    marcar_alteracao(db)
+    db.query(ContagemLicitacoes).delete(synchronize_session=False)
+    db.query(ContagemOrgaos).delete(synchronize_session=False)
+    db.query(ContagemInteresses).delete(synchronize_session=False)
+    db.bulk_insert_mappings(ContagemLicitacoes, [
+        {"dia": dia, "uf": uf, "modalidade": modalidade, "total": total}
+        for (dia, uf, modalidade), total in por_uf_modalidade.items()
+    ])
+    db.bulk_insert_mappings(ContagemOrgaos, [
+        {"dia": dia, "orgao_id": orgao_id, "total": total}
+        for (dia, orgao_id), total in por_orgao.items()
+    ])
+    db.bulk_insert_mappings(ContagemInteresses, [
+        {"status": status, "total": total}
+        for status, total in status_rows
+        if status
+    ])
+
+
+def preparar_contagens():
+    """
+    Na subida: se alguma contagem está vazia mas os dados dela existem
+    (tabela recém-criada num banco existente), calcula tudo uma vez.
+    """
+    db = SessionLocal()
+    try:
+        tem_licitacoes = db.query(Licitacao.id).first() is not None
+        tem_interesses = db.query(LicitacaoInteresse.id).first() is not None
+        faltando = (
+            (tem_licitacoes and db.query(ContagemLicitacoes.id).first() is None)
+            or (tem_licitacoes and db.query(ContagemOrgaos.id).first() is None)
+            or (tem_interesses and db.query(ContagemInteresses.status).first() is None)
+        )
+        if faltando:
+            recalcular_contagens(db)
+            db.commit()
+            print("🛠 Contagens do dashboard calculadas")
+    finally:
+        db.close()
@@ -20,3 +20,13 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def insert_dialeto(db, tabela):
+    """INSERT com suporte a ON CONFLICT (Postgres em produção, SQLite local)."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as insert_pg
+        return insert_pg(tabela)
+
+    from sqlalchemy.dialects.sqlite import insert as insert_sqlite
+    return insert_sqlite(tabela)
@@ -0,0 +1,188 @@
+import json
+import os
+from bisect import bisect_left
+import re
+import threading
+import unicodedata
+from array import array
+from typing import Dict, List, Optional
+
+from cache_local import cache_local, CacheLocal, MANIFESTO
+
+_TOKEN = re.compile(r"\w+")
+
+
+def dobrar(texto: str) -> str:
+    """Minúsculas e sem acento: "Licitação" → "licitacao"."""
+    decomposto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).lower()
+
+
+def tokens(texto_dobrado: str) -> List[str]:
+    return _TOKEN.findall(texto_dobrado)
+
+
+# =======================================================
+# ÍNDICE EM MEMÓRIA DO CACHE LOCAL
+# =======================================================
+class _Colunas:
+    """Uma carga do cache: listas paralelas (uma posição por licitação) + índices."""
+
+    def __init__(self):
+        self.objetos: List[str] = []      # objeto sem acento, para conferir a busca
+        self.ufs: List[str] = []
+        self.modalidades: List[str] = []
+        self.linhas: List[str] = []       # licitação em JSON compacto (decodificada só na saída)
+        self.por_token: Dict[str, array] = {}
+        self.tokens_ordenados: List[str] = []  # chaves de por_token em ordem, para bisect
+        self.por_uf: Dict[str, array] = {}
+        self.por_modalidade: Dict[str, array] = {}
+
+    def adicionar(self, item: dict):
+        linha = len(self.linhas)
+        objeto = dobrar(item.get("objetoCompra") or item.get("descricao") or "")
+        uf = ((item.get("orgaoEntidade") or {}).get("uf") or "").lower()
+        modalidade = str(item.get("modalidadeLicitacao") or "").lower()
+
+        self.objetos.append(objeto)
+        self.ufs.append(uf)
+        self.modalidades.append(modalidade)
+        self.linhas.append(json.dumps(item, ensure_ascii=False, separators=(",", ":")))
+
+        for token in set(tokens(objeto)):
+            self.por_token.setdefault(token, array("I")).append(linha)
+        self.por_uf.setdefault(uf, array("I")).append(linha)
+        self.por_modalidade.setdefault(modalidade, array("I")).append(linha)
+
+    def finalizar(self):
+        """Depois da carga: vocabulário ordenado para a busca por prefixo."""
+        self.tokens_ordenados = sorted(self.por_token)
+
+
+class IndiceCache:
+    """
+    O cache local carregado uma vez em colunas, com índice invertido
+    token → linhas sobre o objeto (sem acento) e índices hash de UF e
+    modalidade. Recarrega sozinho quando o manifesto do cache muda
+    (mtime/tamanho), isto é, depois de qualquer /salvar, compactação ou
+    limpeza. A carga nova é montada à parte e trocada de uma vez, então
+    consultas em andamento seguem na anterior.
+    """
+
+    def __init__(self, cache: CacheLocal = cache_local):
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.assinatura = None
+        self.dados = _Colunas()
+
+    def _assinatura_atual(self):
+        caminho = os.path.join(self.cache.diretorio, MANIFESTO)
+        try:
+            info = os.stat(caminho)
+        except FileNotFoundError:
+            return None
+        return (info.st_mtime_ns, info.st_size)
+
+    def atualizar(self) -> _Colunas:
+        """Recarrega se o cache mudou desde a última carga."""
+        self.cache.existe()  # converte o arquivo antigo, se houver
+        assinatura = self._assinatura_atual()
+        if assinatura == self.assinatura:
+            return self.dados
+        with self.lock:
+            if assinatura != self.assinatura:
+                dados = _Colunas()
+                for item in self.cache.iterar():
+                    dados.adicionar(item)
+                dados.finalizar()
+                self.dados = dados
+                self.assinatura = assinatura
+        return self.dados
+
+    @staticmethod
+    def _linhas_da_busca(dados: _Colunas, busca_dobrada: str, trecho: bool = False) -> Optional[set]:
+        """
+        Candidatas pelo índice invertido: cada termo da busca precisa ser
+        o começo de algum token do objeto ("livro" acha "livros"), achado
+        por bisect no vocabulário ordenado. Com trecho=True o termo pode
+        estar em qualquer parte do token ("ivro" acha "livros"), o que
+        percorre o vocabulário inteiro. None quando a busca não tem nenhum
+        termo indexável.
+        """
+        termos = tokens(busca_dobrada)
+        if not termos:
+            return None
+
+        vocabulario = dados.tokens_ordenados
+        candidatas = None
+        for termo in sorted(set(termos), key=len, reverse=True):
+            linhas = set()
+            if trecho:
+                for token in vocabulario:
+                    if termo in token:
+                        linhas.update(dados.por_token[token])
+            else:
+                i = bisect_left(vocabulario, termo)
+                while i < len(vocabulario) and vocabulario[i].startswith(termo):
+                    linhas.update(dados.por_token[vocabulario[i]])
+                    i += 1
+            candidatas = linhas if candidatas is None else candidatas & linhas
+            if not candidatas:
+                break
+        return candidatas
+
+    def filtrar(self, busca: str = "", uf: str = "", modalidade: str = "", trecho: bool = False) -> List[dict]:
+        """
+        Busca no objeto (sem acento) com cada termo no começo de uma
+        palavra, em qualquer ordem; com trecho=True, o mesmo da varredura
+        antiga (busca inteira como trecho do objeto). UF exata, modalidade
+        contida.
+        """
+        return [json.loads(linha) for linha in self.filtrar_json(busca, uf, modalidade, trecho)]
+
+    def filtrar_json(self, busca: str = "", uf: str = "", modalidade: str = "", trecho: bool = False) -> List[str]:
+        """Como filtrar(), mas cada licitação já em JSON (vai direto para a resposta)."""
+        dados = self.atualizar()
+
+        linhas: Optional[set] = None
+
+        if uf:
+            linhas = set(dados.por_uf.get(uf.lower(), ()))
+
+        if modalidade:
+            da_modalidade = set()
+            for chave, postings in dados.por_modalidade.items():
+                if modalidade.lower() in chave:
+                    da_modalidade.update(postings)
+            linhas = da_modalidade if linhas is None else linhas & da_modalidade
+
+        if busca:
+            busca_dobrada = dobrar(busca)
+            candidatas = self._linhas_da_busca(dados, busca_dobrada, trecho) if linhas is None or linhas else set()
+            if candidatas is not None:
+                linhas = candidatas if linhas is None else linhas & candidatas
+            if trecho or candidatas is None:
+                # trecho (ou busca sem termo indexável, só pontuação): a
+                # busca inteira precisa aparecer no objeto, como na
+                # varredura antiga. Sem trecho, os termos casam cada um
+                # por prefixo, em qualquer ordem
+                universo = linhas if linhas is not None else range(len(dados.linhas))
+                linhas = {i for i in universo if busca_dobrada in dados.objetos[i]}
+
+        if linhas is None:
+            linhas = range(len(dados.linhas))
+
+        return [dados.linhas[i] for i in sorted(linhas)]
+
+    def estatisticas(self) -> dict:
+        dados = self.dados
+        return {
+            "licitacoes": len(dados.linhas),
+            "tokens": len(dados.por_token),
+            "ufs": len(dados.por_uf),
+            "modalidades": len(dados.por_modalidade),
+        }
+
+
+# Instância única do processo
+indice_cache = IndiceCache()
@@ -0,0 +1,240 @@
+import hashlib
+import json
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from database import insert_dialeto
+from models import Licitacao
+from campos_pncp import CAMPOS_PNCP, extrair_campos
+from contagens import chave_contagem, somar_licitacoes
+from cache_dashboard import marcar_alteracao
+from prazos import gravar_prazos
+from cache_orgaos import cache_orgaos
+
+# Quantas linhas vão em cada INSERT multi-linha
+TAMANHO_LOTE = 500
+
+# Colunas reescritas quando a licitação já existe (ON CONFLICT DO UPDATE)
+COLUNAS_ATUALIZAVEIS = (
+    "numero",
+    "objeto",
+    "modalidade",
+    "orgao_id",
+    "uf",
+    "municipio",
+    "data_publicacao",
+    "data_abertura",
+    "url_externa",
+    "json_raw",
+    "hash_conteudo",
+    # campos do json_raw promovidos a colunas (campos_pncp.py)
+    *CAMPOS_PNCP,
+)
+
+
+# =======================================================
+# CONVERSÃO ITEM DO PNCP → LINHAS
+# =======================================================
+def chave_orgao(item: dict) -> Optional[Tuple[str, Optional[str], Optional[str]]]:
+    orgao = item.get("orgaoEntidade", {}) or {}
+    nome = orgao.get("razaoSocial")
+    if not nome:
+        return None
+    return (nome, orgao.get("uf"), orgao.get("municipio"))
+
+
+def hash_conteudo(item: dict) -> str:
+    """
+    Hash estável do item: chaves ordenadas e JSON compacto, então a mesma
+    resposta do PNCP sempre gera o mesmo hash.
+    """
+    bruto = json.dumps(item, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+def montar_linha_licitacao(item: dict) -> Optional[dict]:
+    id_externo = item.get("idCompra") or item.get("numeroControlePNCP")
+    if not id_externo:
+        return None
+
+    orgao = item.get("orgaoEntidade", {}) or {}
+
+    return {
+        "id_externo": id_externo,
+        "numero": item.get("numeroCompra"),
+        "objeto": item.get("objetoCompra") or item.get("descricao"),
+        "modalidade": str(item.get("modalidadeLicitacao")),
+        "uf": orgao.get("uf"),
+        "municipio": orgao.get("municipio"),
+        "data_publicacao": item.get("dataPublicacaoPncp"),
+        "data_abertura": item.get("dataAberturaProposta"),
+        "url_externa": item.get("linkSistemaOrigem"),
+        "json_raw": item,
+        "hash_conteudo": hash_conteudo(item),
+        **extrair_campos(item),
+    }
+
+
+def _lotes(lista: list, tamanho: int = TAMANHO_LOTE):
+    for i in range(0, len(lista), tamanho):
+        yield lista[i:i + tamanho]
+
+
+def _estado_atual(db: Session, ids_externos: list, travar: bool = False) -> Dict[str, tuple]:
+    """
+    {id_externo: (hash_conteudo, chave da contagem)} das licitações que já
+    existem. Com travar=True as linhas ficam presas até o commit
+    (SELECT ... FOR UPDATE no Postgres; o SQLite ignora, lá quem já
+    escreveu na transação segura o banco todo).
+    """
+    estado = {}
+    for lote in _lotes(sorted(ids_externos)):
+        query = (
+            db.query(
+                Licitacao.id_externo,
+                Licitacao.hash_conteudo,
+                Licitacao.publicado_em,
+                Licitacao.uf,
+                Licitacao.modalidade,
+                Licitacao.orgao_id,
+            )
+            .filter(Licitacao.id_externo.in_(lote))
+            .order_by(Licitacao.id_externo)
+        )
+        if travar:
+            query = query.with_for_update()
+        for id_externo, hash_atual, publicado_em, uf, modalidade, orgao_id in query.all():
+            estado[id_externo] = (hash_atual, chave_contagem(publicado_em, uf, modalidade, orgao_id))
+    return estado
+
+
+# =======================================================
+# SALVAR UM LOTE (PÁGINA OU ARQUIVO INTEIRO) NO BANCO
+# =======================================================
+def salvar_lote_no_banco(itens: List[dict], db: Session) -> dict:
+    """
+    Grava vários itens do PNCP com poucos comandos multi-linha:
+    os órgãos vêm do cache em memória (cache_orgaos.py), 1 SELECT traz o
+    hash das licitações que já existem e itens com o mesmo hash não tocam
+    no banco. O resto vai num INSERT ... ON CONFLICT DO NOTHING (as novas)
+    e, para as que já existiam, num ON CONFLICT DO UPDATE.
+
+    Contagens do dashboard (contagens.py) e o retorno saem só das linhas
+    que o RETURNING confirmou, com o estado anterior lido sob trava: uma
+    coleta concorrente gravando os mesmos itens não conta nada duas vezes.
+
+    Retorna {"inseridos": n, "atualizados": n, "inalterados": n}. Não faz commit.
+    """
+    linhas = {}
+    itens_por_id = {}
+
+    for item in itens:
+        linha = montar_linha_licitacao(item)
+        if not linha:
+            continue
+        # o mesmo id repetido no lote: vale a última versão
+        linhas[linha["id_externo"]] = linha
+        itens_por_id[linha["id_externo"]] = item
+
+    if not linhas:
+        return {"inseridos": 0, "atualizados": 0, "inalterados": 0}
+
+    # --------------------
+    # FILTRO BARATO (SEM TRAVA): O QUE JÁ EXISTE COM O MESMO HASH
+    # --------------------
+    inalterados = 0
+    for id_externo, (hash_atual, _) in _estado_atual(db, list(linhas)).items():
+        if hash_atual == linhas[id_externo]["hash_conteudo"]:
+            del linhas[id_externo]
+            inalterados += 1
+
+    if not linhas:
+        return {"inseridos": 0, "atualizados": 0, "inalterados": inalterados}
+
+    # --------------------
+    # ORGÃOS
+    # --------------------
+    chaves_orgao = {id_externo: chave_orgao(itens_por_id[id_externo]) for id_externo in linhas}
+    orgao_ids = cache_orgaos.resolver((c for c in chaves_orgao.values() if c), db)
+
+    for id_externo, linha in linhas.items():
+        chave = chaves_orgao[id_externo]
+        linha["orgao_id"] = orgao_ids.get(chave) if chave else None
+
+    # no commit, o cache do dashboard passa a ser recalculado
+    marcar_alteracao(db)
+    deltas = Counter()
+    # sempre na mesma ordem (id_externo): duas coletas não se travam em cruz
+    ordenadas = [linhas[id_externo] for id_externo in sorted(linhas)]
+
+    # --------------------
+    # NOVAS: só conta a que o RETURNING devolveu
+    # --------------------
+    # A que outra coleta gravou depois do filtro acima cai em DO NOTHING e
+    # segue para as atualizações. No SQLite este INSERT já pega a trava de
+    # escrita, que vale até o commit.
+    inseridas = {}
+    for lote in _lotes(ordenadas):
+        stmt = (
+            insert_dialeto(db, Licitacao)
+            .values(lote)
+            .on_conflict_do_nothing(index_elements=[Licitacao.id_externo])
+            .returning(Licitacao.id, Licitacao.id_externo)
+        )
+        for licitacao_id, id_externo in db.execute(stmt):
+            linha = inseridas[licitacao_id] = linhas[id_externo]
+            deltas[chave_contagem(linha["publicado_em"], linha["uf"], linha["modalidade"], linha["orgao_id"])] += 1
+
+    # --------------------
+    # JÁ EXISTENTES: estado anterior relido com trava, depois DO UPDATE
+    # --------------------
+    ja_inseridas = {linha["id_externo"] for linha in inseridas.values()}
+    existentes = [linha for linha in ordenadas if linha["id_externo"] not in ja_inseridas]
+    anteriores = _estado_atual(db, [linha["id_externo"] for linha in existentes], travar=True)
+
+    para_atualizar = []
+    for linha in existentes:
+        anterior = anteriores.get(linha["id_externo"])
+        if anterior is None or anterior[0] == linha["hash_conteudo"]:
+            # já gravada igual por outra coleta (ou apagada nesse meio tempo)
+            inalterados += 1
+        else:
+            para_atualizar.append(linha)
+
+    atualizadas = {}
+    for lote in _lotes(para_atualizar):
+        stmt = insert_dialeto(db, Licitacao).values(lote)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Licitacao.id_externo],
+            set_={coluna: stmt.excluded[coluna] for coluna in COLUNAS_ATUALIZAVEIS},
+            where=Licitacao.hash_conteudo.is_distinct_from(stmt.excluded.hash_conteudo),
+        ).returning(Licitacao.id, Licitacao.id_externo)
+        for licitacao_id, id_externo in db.execute(stmt):
+            linha = atualizadas[licitacao_id] = linhas[id_externo]
+            deltas[chave_contagem(linha["publicado_em"], linha["uf"], linha["modalidade"], linha["orgao_id"])] += 1
+            deltas[anteriores[id_externo][1]] -= 1
+    inalterados += len(para_atualizar) - len(atualizadas)
+
+    # prazos (abertura/encerramento) das que foram gravadas, para /dashboard/proximos_prazos
+    gravar_prazos(db, {**inseridas, **atualizadas})
+
+    # --------------------
+    # CONTAGENS DO DASHBOARD (mesma transação)
+    # --------------------
+    somar_licitacoes(db, deltas)
+
+    return {
+        "inseridos": len(inseridas),
+        "atualizados": len(atualizadas),
+        "inalterados": inalterados,
+    }
+
+
+def salvar_licitacao_no_banco(item: dict, db: Session) -> bool:
+    """
+    Versão de 1 item só (mantida por compatibilidade).
+    Retorna True se criou novo registro, False se atualizou (ou não mudou).
+    """
+    return salvar_lote_no_banco([item], db)["inseridos"] == 1
@@ -0,0 +1,307 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func, or_
+
+from database import SessionLocal
+from models import ColetaJob
+import coletas
+
+# Quantos jobs de coleta rodam ao mesmo tempo neste processo
+MAX_JOBS_SIMULTANEOS = 2
+
+# Tipos de job → função de coleta (em coletas.py)
+TIPOS_JOB = {
+    "cache_local": lambda db, progresso, **params: coletas.salvar_cache_arquivo(
+        progresso=progresso, **params
+    ),
+    "multiplo": lambda db, progresso, **params: coletas.coletar_multiplo(
+        db, progresso=progresso, **params
+    ),
+    "periodo_completo": lambda db, progresso, **params: coletas.coletar_periodo_completo(
+        db, progresso=progresso, **params
+    ),
+}
+
+STATUS_FINAIS = ("concluido", "erro", "cancelado")
+
+# Dono dos jobs que este processo executa (vários workers do uvicorn,
+# cada um com o seu)
+ID_PROCESSO = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+# A cada quantos segundos o processo avisa que segue com os seus jobs
+INTERVALO_BATIMENTO = int(os.getenv("JOBS_INTERVALO_BATIMENTO", "30"))
+# Job 'executando' sem sinal de vida há mais que isso: o processo dono
+# caiu e o job volta para a fila
+PRAZO_BATIMENTO = int(os.getenv("JOBS_PRAZO_BATIMENTO", "120"))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_JOBS_SIMULTANEOS)
+
+# ids já entregues ao _executor deste processo (na fila ou rodando)
+_agendados = set()
+_lock_agendados = threading.Lock()
+_supervisor: Optional[threading.Thread] = None
+
+
+# =======================================================
+# PROGRESSO GRAVADO NA TABELA coletas_jobs
+# =======================================================
+class ProgressoJob(coletas.ProgressoColeta):
+    """
+    Atualiza os contadores do job a cada página.
+    O pedido de cancelamento é lido do banco (no máximo a cada 2s),
+    assim funciona mesmo com vários workers do uvicorn. Se o job foi
+    retomado por outro processo (este ficou sem dar sinal de vida além do
+    prazo), a coleta daqui para também.
+    """
+
+    def __init__(self, db, job: ColetaJob):
+        self.db = db
+        self.job = job
+        self.ultima_checagem = 0.0
+        self.cancelado = False
+        self.perdeu_job = False
+
+    def pagina_concluida(self, contagem: Optional[dict] = None):
+        contagem = contagem or {}
+        self.job.paginas_concluidas = (self.job.paginas_concluidas or 0) + 1
+        self.job.inseridos = (self.job.inseridos or 0) + contagem.get("inseridos", 0)
+        self.job.atualizados = (self.job.atualizados or 0) + contagem.get("atualizados", 0)
+        self.job.inalterados = (self.job.inalterados or 0) + contagem.get("inalterados", 0)
+        self.job.batimento_em = datetime.utcnow()
+        self.db.commit()
+
+    def registrar_erro(self, erro: dict):
+        # reatribui a lista para o SQLAlchemy perceber a mudança no JSON
+        self.job.erros = (self.job.erros or []) + [erro]
+        self.db.commit()
+
+    def deve_parar(self) -> bool:
+        if self.cancelado or self.perdeu_job:
+            return True
+
+        agora = time.monotonic()
+        if agora - self.ultima_checagem < 2:
+            return False
+        self.ultima_checagem = agora
+
+        cancelar, dono = (
+            self.db.query(ColetaJob.cancelar_solicitado, ColetaJob.dono)
+            .filter(ColetaJob.id == self.job.id)
+            .one()
+        )
+        self.cancelado = bool(cancelar)
+        self.perdeu_job = dono != ID_PROCESSO
+        return self.cancelado or self.perdeu_job
+
+
+# =======================================================
+# EXECUÇÃO
+# =======================================================
+def _reservar_job(db, job_id: int) -> bool:
+    """
+    Passa o job de 'pendente' para 'executando' com um UPDATE condicional:
+    se dois processos tentarem pegar o mesmo job, só um consegue. A coleta
+    recomeça do zero, então os contadores e erros da tentativa anterior
+    (job retomado) são zerados junto.
+    """
+    agora = datetime.utcnow()
+    atualizados = (
+        db.query(ColetaJob)
+        .filter(ColetaJob.id == job_id, ColetaJob.status == "pendente")
+        .update(
+            {
+                "status": "executando",
+                "iniciado_em": agora,
+                "finalizado_em": None,
+                "dono": ID_PROCESSO,
+                "batimento_em": agora,
+                "paginas_concluidas": 0,
+                "inseridos": 0,
+                "atualizados": 0,
+                "inalterados": 0,
+                "erros": [],
+                "resultado": None,
+                "historico_id": None,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return atualizados == 1
+
+
+def _executar_job(job_id: int):
+    db = SessionLocal()
+    try:
+        if not _reservar_job(db, job_id):
+            return
+
+        job = db.query(ColetaJob).filter(ColetaJob.id == job_id).first()
+        progresso = ProgressoJob(db, job)
+
+        try:
+            resultado = TIPOS_JOB[job.tipo](db, progresso, **(job.parametros or {}))
+        except Exception as e:
+            db.rollback()
+            print(f"⚠ Job de coleta {job_id} falhou: {e}")
+            job.status = "erro"
+            job.resultado = {"erro": str(e)}
+            job.finalizado_em = datetime.utcnow()
+            db.commit()
+            return
+
+        if progresso.perdeu_job:
+            # outro processo retomou o job: o status agora é dele
+            print(f"⚠ Job de coleta {job_id} foi retomado por outro processo; esta execução parou")
+            db.rollback()
+            return
+
+        if progresso.cancelado:
+            job.status = "cancelado"
+        elif "erro" in resultado:
+            job.status = "erro"
+        else:
+            job.status = "concluido"
+
+        job.resultado = resultado
+        job.historico_id = resultado.get("historico_id")
+        job.finalizado_em = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+        with _lock_agendados:
+            _agendados.discard(job_id)
+
+
+def _agendar(job_id: int):
+    with _lock_agendados:
+        if job_id in _agendados:
+            return
+        _agendados.add(job_id)
+    _executor.submit(_executar_job, job_id)
+
+
+def submeter_job(tipo: str, parametros: dict) -> int:
+    """
+    Grava o job como 'pendente' e agenda a execução em segundo plano.
+    Retorna o id do job imediatamente.
+    """
+    if tipo not in TIPOS_JOB:
+        raise ValueError(f"Tipo de job desconhecido: {tipo}")
+
+    db = SessionLocal()
+    try:
+        job = ColetaJob(tipo=tipo, parametros=parametros, status="pendente", erros=[])
+        db.add(job)
+        db.commit()
+        job_id = job.id
+    finally:
+        db.close()
+
+    _agendar(job_id)
+    return job_id
+
+
+# =======================================================
+# RETOMADA (JOBS DE PROCESSOS QUE CAÍRAM)
+# =======================================================
+def _bater_coracao(db):
+    """Renova o batimento dos jobs que este processo está executando."""
+    db.query(ColetaJob).filter(
+        ColetaJob.dono == ID_PROCESSO, ColetaJob.status == "executando"
+    ).update({"batimento_em": datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+
+
+def retomar_jobs_pendentes():
+    """
+    Jobs 'executando' cujo dono não dá sinal de vida há mais de
+    PRAZO_BATIMENTO voltam para 'pendente'; os pendentes são agendados
+    aqui (a reserva em _reservar_job garante que só um processo executa).
+    Jobs de outro worker que segue vivo não são tocados.
+    """
+    limite = datetime.utcnow() - timedelta(seconds=PRAZO_BATIMENTO)
+    db = SessionLocal()
+    try:
+        retomados = (
+            db.query(ColetaJob)
+            .filter(
+                ColetaJob.status == "executando",
+                or_(ColetaJob.dono.is_(None), ColetaJob.dono != ID_PROCESSO),
+                func.coalesce(ColetaJob.batimento_em, ColetaJob.iniciado_em) < limite,
+            )
+            .update({"status": "pendente"}, synchronize_session=False)
+        )
+        db.commit()
+        if retomados:
+            print(f"🛠 {retomados} job(s) de coleta sem sinal de vida voltaram para a fila")
+
+        ids = [
+            job_id
+            for (job_id,) in db.query(ColetaJob.id)
+            .filter(ColetaJob.status == "pendente")
+            .order_by(ColetaJob.id)
+            .all()
+        ]
+    finally:
+        db.close()
+
+    for job_id in ids:
+        _agendar(job_id)
+
+    return len(ids)
+
+
+def _supervisionar():
+    while True:
+        time.sleep(INTERVALO_BATIMENTO)
+        try:
+            db = SessionLocal()
+            try:
+                _bater_coracao(db)
+            finally:
+                db.close()
+            retomar_jobs_pendentes()
+        except Exception as e:
+            print(f"⚠ Supervisor dos jobs de coleta: {e}")
+
+
+def iniciar_supervisor():
+    """
+    Chamado na subida da aplicação (em cada worker): agenda os pendentes,
+    retoma os abandonados e, a cada INTERVALO_BATIMENTO, renova o
+    batimento dos jobs deste processo e repete a retomada.
+    """
+    global _supervisor
+    if _supervisor is None:
+        _supervisor = threading.Thread(target=_supervisionar, name="supervisor-jobs", daemon=True)
+        _supervisor.start()
+    return retomar_jobs_pendentes()
+
+
+def serializar_job(job: ColetaJob) -> dict:
+    return {
+        "id": job.id,
+        "tipo": job.tipo,
+        "status": job.status,
+        "parametros": job.parametros,
+        "paginas_concluidas": job.paginas_concluidas or 0,
+        "inseridos": job.inseridos or 0,
+        "atualizados": job.atualizados or 0,
+        "inalterados": job.inalterados or 0,
+        "erros": job.erros or [],
+        "cancelar_solicitado": bool(job.cancelar_solicitado),
+        "resultado": job.resultado,
+        "historico_id": job.historico_id,
+        "dono": job.dono,
+        "batimento_em": job.batimento_em.isoformat() if job.batimento_em else None,
+        "criado_em": job.criado_em.isoformat() if job.criado_em else None,
+        "iniciado_em": job.iniciado_em.isoformat() if job.iniciado_em else None,
+        "finalizado_em": job.finalizado_em.isoformat() if job.finalizado_em else None,
+    }
@@ -0,0 +1,134 @@
+import json
+from typing import Iterable, Iterator, List, Optional
+
+TAMANHO_BLOCO = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_ESPACOS = " \t\n\r"
+
+
+# =======================================================
+# LEITOR INCREMENTAL DE JSON
+# =======================================================
+class LeitorJson:
+    """
+    Lê um JSON que chega em pedaços (resposta HTTP em stream ou arquivo)
+    e devolve os elementos de um array um a um, sem montar o documento
+    inteiro em memória. Só o elemento da vez fica decodificado.
+    """
+
+    def __init__(self, blocos: Iterable[str]):
+        self.blocos = iter(blocos)
+        self.buffer = ""
+        self.pos = 0
+        self.fim = False
+
+    def _ler_mais(self) -> bool:
+        if self.fim:
+            return False
+        for bloco in self.blocos:
+            if bloco:
+                # descarta o que já foi consumido antes de crescer o buffer
+                self.buffer = self.buffer[self.pos:] + bloco
+                self.pos = 0
+                return True
+        self.fim = True
+        return False
+
+    def _pular_espacos(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _ESPACOS:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._ler_mais():
+                return
+
+    def _espiar(self) -> str:
+        self._pular_espacos()
+        if self.pos >= len(self.buffer):
+            raise ValueError("JSON terminou antes do esperado")
+        return self.buffer[self.pos]
+
+    def _consumir(self, esperado: str):
+        if self._espiar() != esperado:
+            raise ValueError(f"JSON inválido: esperava '{esperado}' na posição {self.pos}")
+        self.pos += 1
+
+    def _valor(self):
+        self._pular_espacos()
+        while True:
+            try:
+                valor, fim = _decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                # valor ainda incompleto no buffer
+                if not self._ler_mais():
+                    raise
+                continue
+            # um número no fim do buffer pode continuar no próximo bloco
+            if fim == len(self.buffer) and self._ler_mais():
+                continue
+            self.pos = fim
+            return valor
+
+    def vazio(self) -> bool:
+        """True se a fonte não tem nada além de espaços."""
+        self._pular_espacos()
+        return self.pos >= len(self.buffer)
+
+    def iterar_array(self) -> Iterator:
+        self._consumir("[")
+        if self._espiar() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self._valor()
+            if self._espiar() == ",":
+                self.pos += 1
+                continue
+            self._consumir("]")
+            return
+
+    def iterar_array_da_chave(self, chave: str, meta: Optional[dict] = None) -> Iterator:
+        """
+        Para um objeto {..., chave: [...], ...}: devolve os elementos do
+        array `chave` em stream. As demais chaves do topo vão para `meta`
+        (ficam completas só depois que o iterador termina).
+        """
+        meta = meta if meta is not None else {}
+        self._consumir("{")
+        if self._espiar() == "}":
+            self.pos += 1
+            return
+        while True:
+            nome = self._valor()
+            self._consumir(":")
+            if nome == chave and self._espiar() == "[":
+                yield from self.iterar_array()
+            else:
+                meta[nome] = self._valor()
+            if self._espiar() == ",":
+                self.pos += 1
+                continue
+            self._consumir("}")
+            return
+
+
+# =======================================================
+# ATALHOS
+# =======================================================
+def iterar_arquivo_json(caminho: str, tamanho_bloco: int = TAMANHO_BLOCO) -> Iterator[dict]:
+    """Elementos de um arquivo que contém um array JSON, um por vez."""
+    with open(caminho, "r", encoding="utf-8") as f:
+        leitor = LeitorJson(iter(lambda: f.read(tamanho_bloco), ""))
+        if not leitor.vazio():
+            yield from leitor.iterar_array()
+
+
+def em_lotes(itens: Iterable, tamanho: int) -> Iterator[List]:
+    lote = []
+    for item in itens:
+        lote.append(item)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
@@ -2,11 +2,19 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from database import engine, Base
+from migracoes import aplicar_migracoes
+from busca_textual import preparar_busca
+from contagens import preparar_contagens
+from prazos import preparar_prazos
+from orcamento_sql import instalar_contador, instalar_middleware
+from compressao import instalar_compressao
 from routes import router as api_router
 from routes_editoras import router as editoras_router
 from routes_licitacoes import router as licitacoes_router
 from routes_dashboard import router as dashboard_router
 from routes_notificacoes import router as notificacoes_router
+from routes_coletas import router as coletas_router
+from jobs_coleta import iniciar_supervisor
 
 # Instancia a aplicação FastAPI
 app = FastAPI(title="Radar Inteligente - MVP")
@@ -25,8 +33,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip nas respostas grandes. Vem antes do middleware abaixo para
+# ver a resposta original (e seu tamanho), não o stream que ele repassa
+instalar_compressao(app)
+
+# Quantas consultas SQL cada requisição fez (cabeçalho X-Consultas-SQL)
+instalar_contador(engine)
+instalar_middleware(app)
+
 # Criar todas as tabelas
 Base.metadata.create_all(bind=engine)
+aplicar_migracoes(engine)
+preparar_busca(engine)
+preparar_contagens()
+preparar_prazos()
 
 # Rotas
 app.include_router(api_router)
@@ -34,6 +54,11 @@ app.include_router(editoras_router)
 app.include_router(licitacoes_router)
 app.include_router(dashboard_router)
 app.include_router(notificacoes_router)
+app.include_router(coletas_router)
+
+# Jobs pendentes entram na fila; os de um processo que caiu (sem sinal de
+# vida além do prazo) são retomados, os de outros workers vivos não
+iniciar_supervisor()
 
 @app.get("/")
 def root():
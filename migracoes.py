@@ -0,0 +1,143 @@
+from sqlalchemy import delete, inspect, select, text, update
+
+from database import Base
+
+# create_all() só cria tabelas que não existem; colunas novas em tabelas
+# que já existem no banco do Render entram por aqui.
+# (tabela, coluna) — o tipo e os índices vêm do próprio models.py
+COLUNAS_NOVAS = [
+    ("licitacoes", "hash_conteudo"),
+    ("coletas_jobs", "inalterados"),
+    ("coletas_historico", "paginas_esperadas"),
+    ("coletas_historico", "paginas_coletadas"),
+    ("coletas_historico", "detalhes"),
+    ("licitacoes", "publicado_em"),
+    ("licitacoes", "abertura_em"),
+    ("licitacoes", "encerramento_em"),
+    ("licitacoes", "valor_total_estimado"),
+    ("licitacoes", "esfera"),
+    ("licitacoes", "situacao"),
+    ("coletas_jobs", "dono"),
+    ("coletas_jobs", "batimento_em"),
+]
+
+# Índices que saíram do models.py (trocados por outro) e ficaram para trás
+# nos bancos existentes
+INDICES_REMOVIDOS = [
+    "ix_licitacoes_publicado_em",  # virou (publicado_em, id)
+    "ix_licitacoes_publicacao_id",  # listagem: virou ix_licitacoes_listagem (publicado_em)
+]
+
+# Índices únicos novos em tabelas que já existem: antes de criar, a função
+# junta as linhas repetidas que impediriam o índice (e devolve quantas saíram)
+def _juntar_orgaos_repetidos(conn) -> int:
+    """
+    Um órgão por (nome, uf, municipio), como o uq_orgaos_chave compara
+    (NULL = ""): fica o de menor id e as licitações dos outros passam
+    para ele.
+    """
+    orgaos = Base.metadata.tables["orgaos"]
+    licitacoes = Base.metadata.tables["licitacoes"]
+
+    mantidos = {}
+    repetidos = {}  # id que sai → id que fica
+    linhas = conn.execute(
+        select(orgaos.c.id, orgaos.c.nome, orgaos.c.uf, orgaos.c.municipio).order_by(orgaos.c.id)
+    )
+    for orgao_id, nome, uf, municipio in linhas:
+        chave = (nome, uf or "", municipio or "")
+        if chave in mantidos:
+            repetidos[orgao_id] = mantidos[chave]
+        else:
+            mantidos[chave] = orgao_id
+
+    for saiu, ficou in repetidos.items():
+        conn.execute(update(licitacoes).where(licitacoes.c.orgao_id == saiu).values(orgao_id=ficou))
+    ids = list(repetidos)
+    for i in range(0, len(ids), 500):
+        conn.execute(delete(orgaos).where(orgaos.c.id.in_(ids[i:i + 500])))
+    return len(repetidos)
+
+
+def _indice_existe(conn, nome: str) -> bool:
+    # direto no catálogo: o inspector do SQLite não enxerga índice de expressão
+    if conn.dialect.name == "postgresql":
+        consulta = "SELECT 1 FROM pg_indexes WHERE indexname = :nome"
+    else:
+        consulta = "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :nome"
+    return conn.execute(text(consulta), {"nome": nome}).first() is not None
+
+
+UNICOS_NOVOS = {
+    ("orgaos", "uq_orgaos_chave"): _juntar_orgaos_repetidos,
+}
+
+# Depois de juntar repetidos, o que precisa ser refeito (preenchimento.py):
+# as contagens por órgão apontavam para os ids que saíram
+PREENCHIMENTOS_UNICOS = {
+    ("orgaos", "uq_orgaos_chave"): "contagens",
+}
+
+# Coluna nova calculada a partir das linhas que já existem: ao ser criada,
+# roda o preenchimento correspondente (preenchimento.py)
+PREENCHIMENTOS = {
+    ("licitacoes", "publicado_em"): "campos_pncp",
+    ("licitacoes", "abertura_em"): "campos_pncp",
+    ("licitacoes", "encerramento_em"): "campos_pncp",
+    ("licitacoes", "valor_total_estimado"): "campos_pncp",
+    ("licitacoes", "esfera"): "campos_pncp",
+    ("licitacoes", "situacao"): "campos_pncp",
+}
+
+
+def aplicar_migracoes(engine):
+    """
+    Adiciona as colunas de COLUNAS_NOVAS que ainda não existem
+    (com os índices declarados no models) e preenche as que estão em
+    PREENCHIMENTOS; cria os índices de UNICOS_NOVOS depois de juntar as
+    linhas repetidas. Idempotente: pode rodar a cada subida da aplicação.
+    """
+    import models  # noqa: F401  (registra as tabelas no Base.metadata)
+
+    inspector = inspect(engine)
+    criadas = []
+
+    with engine.begin() as conn:
+        tabelas = set()
+
+        for tabela, coluna in COLUNAS_NOVAS:
+            existentes = {c["name"] for c in inspector.get_columns(tabela)}
+            tabelas.add(tabela)
+
+            if coluna not in existentes:
+                col = Base.metadata.tables[tabela].c[coluna]
+                tipo = col.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}"))
+                print(f"🛠 Migração: coluna {tabela}.{coluna} criada")
+                criadas.append((tabela, coluna))
+
+        for tabela in tabelas:
+            for indice in Base.metadata.tables[tabela].indexes:
+                indice.create(conn, checkfirst=True)
+
+        for nome in INDICES_REMOVIDOS:
+            conn.execute(text(f"DROP INDEX IF EXISTS {nome}"))
+
+        juntados = []
+        for (tabela, nome), juntar in UNICOS_NOVOS.items():
+            if _indice_existe(conn, nome):
+                continue
+            removidas = juntar(conn)
+            if removidas:
+                print(f"🛠 Migração: {removidas} linhas repetidas juntadas em {tabela}")
+                juntados.append((tabela, nome))
+            indice = next(i for i in Base.metadata.tables[tabela].indexes if i.name == nome)
+            indice.create(conn)
+            print(f"🛠 Migração: índice único {nome} criado")
+
+    # depois do commit: o preenchimento usa a própria sessão, em lotes
+    pendentes = {PREENCHIMENTOS[c] for c in criadas if c in PREENCHIMENTOS}
+    pendentes |= {PREENCHIMENTOS_UNICOS[u] for u in juntados if u in PREENCHIMENTOS_UNICOS}
+    if pendentes:
+        from preenchimento import rodar_preenchimentos
+        rodar_preenchimentos(pendentes, engine)
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Text, Numeric
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Text, Numeric, UniqueConstraint, Index, func
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from database import Base
 
@@ -43,6 +43,13 @@ class Orgao(Base):
 
     licitacoes = relationship("Licitacao", back_populates="orgao")
 
+    __table_args__ = (
+        # um órgão por (nome, uf, municipio), entre todos os processos
+        # (cache_orgaos.py cria com ON CONFLICT DO NOTHING). NULL e "" contam
+        # como o mesmo valor: sem o coalesce, linhas sem UF nunca colidiriam
+        Index("uq_orgaos_chave", nome, func.coalesce(uf, ""), func.coalesce(municipio, ""), unique=True),
+    )
+
 
 class Licitacao(Base):
     __tablename__ = "licitacoes"
@@ -58,8 +65,19 @@ class Licitacao(Base):
     # datas ficam como texto para não depender do formato exato de retorno
     data_publicacao = Column(String, nullable=True)
     data_abertura = Column(String, nullable=True)
+    # campos do json_raw já convertidos na ingestão (campos_pncp.CAMPOS_PNCP):
+    # filtros, ordenações e agregações usam o índice em vez de abrir o JSON
+    publicado_em = Column(DateTime, nullable=True)  # índice (publicado_em, id) abaixo
+    abertura_em = Column(DateTime, nullable=True, index=True)
+    encerramento_em = Column(DateTime, nullable=True, index=True)
+    valor_total_estimado = Column(Numeric, nullable=True, index=True)
+    esfera = Column(String(20), nullable=True, index=True)  # federal, estadual, municipal, distrital
+    situacao = Column(String(100), nullable=True, index=True)  # situacaoCompraNome
     url_externa = Column(Text, nullable=True)
-    json_raw = Column(JSON, nullable=True)
+    # item bruto do PNCP (grande): só é lido do banco quando acessado
+    json_raw = deferred(Column(JSON, nullable=True))
+    # sha256 do item do PNCP: se não mudou, a recoleta nem toca na linha
+    hash_conteudo = Column(String(64), nullable=True, index=True)
     criado_em = Column(DateTime, default=datetime.utcnow)
 
     orgao = relationship("Orgao", back_populates="licitacoes")
@@ -68,6 +86,16 @@ class Licitacao(Base):
     interesses = relationship("LicitacaoInteresse", back_populates="licitacao", cascade="all, delete-orphan")
     notificacoes = relationship("Notificacao", back_populates="licitacao", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # ordem da listagem paginada por cursor (/licitacoes/listar_banco):
+        # publicado_em DESC NULLS LAST, id DESC. O SQLite não aceita NULLS
+        # LAST em índice, mas lá o NULL já é o menor valor (fica no fim em DESC)
+        Index("ix_licitacoes_listagem", publicado_em.desc().nullslast(), id.desc()).ddl_if(dialect="postgresql"),
+        Index("ix_licitacoes_listagem", publicado_em.desc(), id.desc()).ddl_if(dialect="sqlite"),
+        # janelas de publicação e "mais recentes" (desempate por id sem sort extra)
+        Index("ix_licitacoes_publicado_em_id", "publicado_em", "id"),
+    )
+
 
 class LicitacaoItem(Base):
     __tablename__ = "licitacao_itens"
@@ -142,4 +170,107 @@ class ColetaHistorico(Base):
     fonte = Column(String(255), nullable=False)
     url = Column(Text, nullable=False)
     quantidade = Column(Integer, nullable=False)
+    # cobertura: páginas que o PNCP informou x páginas gravadas
+    paginas_esperadas = Column(Integer, nullable=True)
+    paginas_coletadas = Column(Integer, nullable=True)
+    # coletas com várias modalidades: cobertura e contagens de cada uma
+    detalhes = Column(JSON, nullable=True)
+    criado_em = Column(DateTime, default=datetime.utcnow)
+
+
+class ColetaJob(Base):
+    __tablename__ = "coletas_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    # multiplo, periodo_completo, cache_local
+    tipo = Column(String(50), nullable=False)
+    parametros = Column(JSON, nullable=False)
+    # pendente, executando, concluido, erro, cancelado
+    status = Column(String(30), default="pendente", index=True)
+    paginas_concluidas = Column(Integer, default=0)
+    inseridos = Column(Integer, default=0)
+    atualizados = Column(Integer, default=0)
+    inalterados = Column(Integer, default=0)
+    erros = Column(JSON, nullable=True)
+    resultado = Column(JSON, nullable=True)
+    cancelar_solicitado = Column(Boolean, default=False)
+    # processo que está executando o job e a última vez que deu sinal de vida
+    dono = Column(String(100), nullable=True)
+    batimento_em = Column(DateTime, nullable=True)
+    historico_id = Column(Integer, ForeignKey("coletas_historico.id"), nullable=True)
     criado_em = Column(DateTime, default=datetime.utcnow)
+    iniciado_em = Column(DateTime, nullable=True)
+    finalizado_em = Column(DateTime, nullable=True)
+
+    historico = relationship("ColetaHistorico")
+
+
+# Marca d'água por (dia, modalidade): até qual página a coleta já gravou
+class SincronizacaoPncp(Base):
+    __tablename__ = "sincronizacao_pncp"
+    __table_args__ = (UniqueConstraint("data", "modalidade", name="uq_sincronizacao_dia_modalidade"),)
+    id = Column(Integer, primary_key=True, index=True)
+    data = Column(String(8), nullable=False, index=True)  # AAAAMMDD
+    modalidade = Column(Integer, nullable=False)
+    # as páginas só valem para o mesmo tamanhoPagina
+    tamanho_pagina = Column(Integer, nullable=False)
+    ultima_pagina = Column(Integer, default=0)
+    # totais informados pelo PNCP na última página lida
+    total_paginas = Column(Integer, nullable=True)
+    total_registros = Column(Integer, nullable=True)
+    concluido = Column(Boolean, default=False)
+    atualizado_em = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# Prazos (abertura, encerramento) num índice só, para "próximos prazos" ser
+# um range scan em instante. Refeita a cada ingestão da licitação (prazos.py).
+class LicitacaoPrazo(Base):
+    __tablename__ = "licitacao_prazos"
+    __table_args__ = (
+        UniqueConstraint("licitacao_id", "tipo", name="uq_prazo_licitacao_tipo"),
+        Index("ix_licitacao_prazos_instante", "instante", "id"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    licitacao_id = Column(Integer, ForeignKey("licitacoes.id", ondelete="CASCADE"), nullable=False)
+    tipo = Column(String(20), nullable=False)  # abertura, encerramento
+    instante = Column(DateTime, nullable=False)
+
+    licitacao = relationship("Licitacao")
+
+
+# Contagens pré-agregadas do dashboard (contagens.py).
+# Licitações por dia de publicação × UF × modalidade. Mantida pela ingestão;
+# "" = sem data/UF/modalidade, para a chave única valer em todas as linhas.
+class ContagemLicitacoes(Base):
+    __tablename__ = "contagem_licitacoes"
+    __table_args__ = (UniqueConstraint("dia", "uf", "modalidade", name="uq_contagem_dia_uf_modalidade"),)
+    id = Column(Integer, primary_key=True, index=True)
+    dia = Column(String(8), nullable=False, index=True)  # AAAAMMDD (publicado_em)
+    uf = Column(String(2), nullable=False, default="")
+    modalidade = Column(String(255), nullable=False, default="")
+    total = Column(Integer, nullable=False, default=0)
+
+
+# Licitações por dia de publicação × órgão (orgao_id 0 = sem órgão), para a
+# série temporal por órgão (/dashboard/serie_temporal).
+class ContagemOrgaos(Base):
+    __tablename__ = "contagem_orgaos"
+    __table_args__ = (UniqueConstraint("dia", "orgao_id", name="uq_contagem_dia_orgao"),)
+    id = Column(Integer, primary_key=True, index=True)
+    dia = Column(String(8), nullable=False)  # AAAAMMDD (publicado_em)
+    orgao_id = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+
+
+# Acompanhamentos por status. Mantida pelas rotas de interesse/acompanhamento.
+class ContagemInteresses(Base):
+    __tablename__ = "contagem_interesses"
+    status = Column(String(50), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+
+
+# Versão dos dados do dashboard (uma linha só): sobe em cada commit que
+# altera o que o dashboard mostra, em qualquer processo (cache_dashboard.py)
+class VersaoDados(Base):
+    __tablename__ = "versao_dados"
+    id = Column(Integer, primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
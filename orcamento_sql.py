@@ -0,0 +1,77 @@
+import threading
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from sqlalchemy import event
+
+_contador: ContextVar[Optional[list]] = ContextVar("contador_sql", default=None)
+# /dashboard/completo conta consultas de várias threads no mesmo contador
+_lock_contador = threading.Lock()
+
+
+# =======================================================
+# ORÇAMENTO DE CONSULTAS SQL POR REQUISIÇÃO
+# =======================================================
+def orcamento_sql(maximo: int) -> Callable:
+    """
+    Declara quantas consultas SQL a rota pode fazer por requisição:
+
+        @router.get("/interesses/listar")
+        @orcamento_sql(2)
+        def listar_interesses(...):
+
+    Uma consulta por linha (N+1) estoura o orçamento já com poucos
+    registros: tests/test_orcamento_sql.py chama cada rota com orçamento
+    e falha; em produção só aparece o aviso no log.
+    """
+    def decorar(funcao):
+        funcao.orcamento_sql = maximo
+        return funcao
+    return decorar
+
+
+def instalar_contador(engine):
+    """Conta cada comando enviado ao banco dentro da requisição em andamento."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        contador = _contador.get()
+        if contador is not None:
+            with _lock_contador:
+                contador[0] += 1
+
+
+def instalar_middleware(app):
+    """
+    Toda resposta sai com o cabeçalho X-Consultas-SQL. Rotas com
+    @orcamento_sql são conferidas contra o máximo declarado quando o corpo
+    termina de sair: numa resposta em stream (ndjson) as consultas rodam
+    depois dos cabeçalhos, e o cabeçalho só conta as de antes dele.
+    """
+
+    @app.middleware("http")
+    async def medir_consultas(request, call_next):
+        # lista mutável: a rota síncrona (e o gerador do stream) roda noutra
+        # thread com uma cópia do contexto, mas incrementa este mesmo objeto
+        contador = [0]
+        token = _contador.set(contador)
+        try:
+            resposta = await call_next(request)
+        finally:
+            _contador.reset(token)
+
+        resposta.headers["X-Consultas-SQL"] = str(contador[0])
+        resposta.body_iterator = _conferir_no_fim(resposta.body_iterator, request, contador)
+        return resposta
+
+
+async def _conferir_no_fim(corpo, request, contador: list):
+    async for pedaco in corpo:
+        yield pedaco
+
+    consultas = contador[0]
+    endpoint = request.scope.get("endpoint")
+    maximo = getattr(endpoint, "orcamento_sql", None)
+    if maximo is not None and consultas > maximo:
+        mensagem = f"{request.method} {request.url.path} fez {consultas} consultas SQL (orçamento: {maximo})"
+        print(f"⚠ Orçamento SQL estourado: {mensagem}")
@@ -0,0 +1,70 @@
+import base64
+import json
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+
+
+# =======================================================
+# CURSOR OPACO (PAGINAÇÃO POR CHAVE)
+# =======================================================
+def codificar_cursor(publicado_em: Optional[datetime], id_: int) -> str:
+    data = publicado_em.isoformat() if publicado_em is not None else None
+    bruto = json.dumps([data, id_], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """Levanta ValueError se o token não for um cursor válido."""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data, id_ = json.loads(bruto)
+        publicado_em = datetime.fromisoformat(data) if data is not None else None
+    except Exception:
+        raise ValueError("cursor inválido")
+    if not isinstance(id_, int):
+        raise ValueError("cursor inválido")
+    return publicado_em, id_
+
+
+def ramos_do_cursor(query, coluna_data, coluna_id, cursor: Optional[Tuple[Optional[datetime], int]]) -> list:
+    """
+    A ordem coluna_data DESC NULLS LAST, coluna_id DESC em dois ramos, cada
+    um uma faixa contínua do índice (coluna_data DESC NULLS LAST, id DESC):
+    primeiro as linhas com data, depois o bloco sem data. A posição do
+    cursor é uma comparação de linha (data, id) < (x, y), que o banco
+    resolve descendo o índice a partir dela, sem OFFSET nem sort.
+    """
+    sem_data = query.filter(coluna_data.is_(None))
+
+    if cursor is None:
+        com_data = query.filter(coluna_data.isnot(None))
+    else:
+        data, id_ = cursor
+        if data is None:
+            # já estamos no bloco das linhas sem data (o fim da lista)
+            return [sem_data.filter(coluna_id < id_).order_by(coluna_id.desc())]
+        com_data = query.filter(tuple_(coluna_data, coluna_id) < tuple_(data, id_))
+
+    return [
+        com_data.order_by(coluna_data.desc().nullslast(), coluna_id.desc()),
+        sem_data.order_by(coluna_id.desc()),
+    ]
+
+
+def percorrer_ramos(ramos: List, limite: Optional[int] = None) -> Iterator:
+    """
+    As linhas dos ramos em ordem, até `limite`. O ramo seguinte só é
+    consultado quando o anterior acabou antes de completar o limite.
+    """
+    restante = limite
+    for ramo in ramos:
+        if restante is not None:
+            if restante <= 0:
+                return
+            ramo = ramo.limit(restante)
+        for linha in ramo:
+            yield linha
+            if restante is not None:
+                restante -= 1
@@ -0,0 +1,77 @@
+from typing import Dict
+
+from sqlalchemy import insert, literal, select
+from sqlalchemy.orm import Session
+
+from cache_dashboard import marcar_alteracao
+from database import SessionLocal
+from models import Licitacao, LicitacaoPrazo
+
+# ids por DELETE ... IN (...)
+TAMANHO_LOTE = 500
+
+# tipo do prazo → coluna de Licitacao de onde ele vem
+TIPOS_PRAZO = {
+    "abertura": "abertura_em",
+    "encerramento": "encerramento_em",
+}
+
+
+# =======================================================
+# GRAVAÇÃO (NA INGESTÃO)
+# =======================================================
+def gravar_prazos(db: Session, linhas_por_id: Dict[int, dict]):
+    """
+    Troca os prazos das licitações gravadas agora ({licitacao.id: linha
+    de montar_linha_licitacao}) pelos da versão nova. Não faz commit.
+    """
+    if not linhas_por_id:
+        return
+
+    ids = list(linhas_por_id)
+    for inicio in range(0, len(ids), TAMANHO_LOTE):
+        db.query(LicitacaoPrazo).filter(
+            LicitacaoPrazo.licitacao_id.in_(ids[inicio:inicio + TAMANHO_LOTE])
+        ).delete(synchronize_session=False)
+
+    novos = [
+        {"licitacao_id": licitacao_id, "tipo": tipo, "instante": linha[coluna]}
+        for licitacao_id, linha in linhas_por_id.items()
+        for tipo, coluna in TIPOS_PRAZO.items()
+        if linha.get(coluna)
+    ]
+    if novos:
+        db.execute(insert(LicitacaoPrazo), novos)
+
+
+# =======================================================
+# RECÁLCULO COMPLETO
+# =======================================================
+def recalcular_prazos(db: Session):
+    """Refaz licitacao_prazos a partir das colunas de data (INSERT ... SELECT). Não faz commit."""
+    marcar_alteracao(db)
+    db.query(LicitacaoPrazo).delete(synchronize_session=False)
+    for tipo, coluna in TIPOS_PRAZO.items():
+        instante = getattr(Licitacao, coluna)
+        db.execute(
+            insert(LicitacaoPrazo).from_select(
+                ["licitacao_id", "tipo", "instante"],
+                select(Licitacao.id, literal(tipo), instante).where(instante.isnot(None)),
+            )
+        )
+
+
+def preparar_prazos():
+    """Na subida: tabela vazia num banco que já tem licitações com prazo → preenche uma vez."""
+    db = SessionLocal()
+    try:
+        vazia = db.query(LicitacaoPrazo.id).first() is None
+        com_prazos = db.query(Licitacao.id).filter(
+            (Licitacao.abertura_em.isnot(None)) | (Licitacao.encerramento_em.isnot(None))
+        ).first() is not None
+        if vazia and com_prazos:
+            recalcular_prazos(db)
+            db.commit()
+            print("🛠 Prazos das licitações indexados")
+    finally:
+        db.close()
@@ -0,0 +1,143 @@
+import sys
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from database import engine as engine_padrao
+from cache_dashboard import marcar_alteracao
+from campos_pncp import CAMPOS_PNCP, converter_data, extrair_campos
+from contagens import recalcular_contagens
+from models import ContagemLicitacoes, Licitacao, LicitacaoPrazo
+from prazos import recalcular_prazos
+
+# Preenche colunas derivadas em licitações gravadas antes delas existirem.
+# Roda sozinho pela migração quando a coluna é criada; para refazer à mão
+# (ex.: a subida caiu no meio):
+#
+#     python preenchimento.py                        # todos
+#     python preenchimento.py campos_pncp            # só um (e o que depende dele)
+#     python preenchimento.py campos_pncp --todas    # recalcula mesmo as já preenchidas
+#     python preenchimento.py contagens              # refaz as contagens do dashboard
+#     python preenchimento.py prazos                 # refaz o índice de prazos
+
+# Linhas lidas e regravadas por vez (cada lote tem seu commit)
+TAMANHO_LOTE = 1000
+
+
+# =======================================================
+# CAMPOS DO PNCP (campos_pncp.CAMPOS_PNCP)
+# =======================================================
+def preencher_campos_pncp(engine=None, todas: bool = False, tamanho_lote: int = TAMANHO_LOTE) -> int:
+    """
+    Extrai do json_raw as colunas de CAMPOS_PNCP (as datas caem para
+    data_publicacao/data_abertura quando o JSON não tem). Por padrão só
+    linhas com alguma dessas colunas vazia; todas=True recalcula tudo
+    (ex.: depois de mudar um conversor). Percorre por id, então pode ser
+    interrompido e rodado de novo. Retorna quantas linhas foram gravadas.
+    """
+    db = Session(bind=engine or engine_padrao)
+    colunas = [getattr(Licitacao, coluna) for coluna in CAMPOS_PNCP]
+    gravadas = 0
+    ultimo_id = 0
+    try:
+        while True:
+            query = (
+                db.query(Licitacao.id, Licitacao.data_publicacao, Licitacao.data_abertura, Licitacao.json_raw)
+                .filter(Licitacao.id > ultimo_id)
+            )
+            if not todas:
+                query = query.filter(or_(*(coluna.is_(None) for coluna in colunas)))
+            linhas = query.order_by(Licitacao.id).limit(tamanho_lote).all()
+            if not linhas:
+                break
+
+            mudancas = []
+            for linha in linhas:
+                campos = extrair_campos(linha.json_raw)
+                campos["publicado_em"] = campos["publicado_em"] or converter_data(linha.data_publicacao)
+                campos["abertura_em"] = campos["abertura_em"] or converter_data(linha.data_abertura)
+                if todas or any(valor is not None for valor in campos.values()):
+                    mudancas.append({"id": linha.id, **campos})
+
+            if mudancas:
+                db.execute(update(Licitacao), mudancas)
+                marcar_alteracao(db)
+                db.commit()
+                gravadas += len(mudancas)
+
+            ultimo_id = linhas[-1].id
+    finally:
+        db.close()
+
+    print(f"🛠 Preenchimento dos campos do PNCP: {gravadas} licitações")
+    return gravadas
+
+
+# =======================================================
+# CONTAGENS DO DASHBOARD (contagens.py)
+# =======================================================
+def preencher_contagens(engine=None, todas: bool = True) -> int:
+    """Recalcula as tabelas de contagem do zero (sempre todas). Retorna quantas faixas ficaram."""
+    db = Session(bind=engine or engine_padrao)
+    try:
+        recalcular_contagens(db)
+        db.commit()
+        faixas = db.query(ContagemLicitacoes.id).count()
+    finally:
+        db.close()
+
+    print(f"🛠 Contagens do dashboard recalculadas: {faixas} faixas dia × UF × modalidade")
+    return faixas
+
+
+# =======================================================
+# PRAZOS (prazos.py)
+# =======================================================
+def preencher_prazos(engine=None, todas: bool = True) -> int:
+    """Refaz licitacao_prazos a partir de abertura_em/encerramento_em (sempre todas)."""
+    db = Session(bind=engine or engine_padrao)
+    try:
+        recalcular_prazos(db)
+        db.commit()
+        total = db.query(LicitacaoPrazo.id).count()
+    finally:
+        db.close()
+
+    print(f"🛠 Prazos das licitações reindexados: {total}")
+    return total
+
+
+# nome (linha de comando) → função, na ordem em que rodam
+PREENCHIMENTOS = {
+    "campos_pncp": preencher_campos_pncp,
+    "contagens": preencher_contagens,
+    "prazos": preencher_prazos,
+}
+
+# O que é calculado a partir das colunas que cada preenchimento grava:
+# se ele mudou alguma linha, esses rodam logo depois (contagens por dia
+# de publicado_em, prazos de abertura_em/encerramento_em)
+DEPENDENTES = {
+    "campos_pncp": ("contagens", "prazos"),
+}
+
+
+def rodar_preenchimentos(nomes, engine=None, todas: bool = False):
+    """
+    Roda os preenchimentos pedidos na ordem de PREENCHIMENTOS, mais os
+    DEPENDENTES dos que gravaram alguma linha; cada um uma vez só.
+    """
+    a_rodar = set(nomes)
+    for nome, preencher in PREENCHIMENTOS.items():
+        if nome in a_rodar and preencher(engine, todas=todas):
+            a_rodar.update(DEPENDENTES.get(nome, ()))
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    todas = "--todas" in argumentos
+    nomes = [a for a in argumentos if a != "--todas"] or list(PREENCHIMENTOS)
+    for nome in nomes:
+        if nome not in PREENCHIMENTOS:
+            sys.exit(f"preenchimento desconhecido: {nome} (disponíveis: {', '.join(PREENCHIMENTOS)})")
+    rodar_preenchimentos(nomes, todas=todas)
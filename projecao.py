@@ -0,0 +1,77 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy import Text, cast
+
+from models import Licitacao, Orgao
+from respostas import JsonBruto
+
+# Campos que as listagens sabem devolver → coluna de origem.
+# "orgao" exige o JOIN com orgaos; "json_raw" só vem quando pedido, e
+# como texto: vai para a resposta sem ser decodificado (respostas.JsonBruto).
+CAMPOS_LICITACAO = {
+    "id": Licitacao.id,
+    "id_externo": Licitacao.id_externo,
+    "numero": Licitacao.numero,
+    "objeto": Licitacao.objeto,
+    "modalidade": Licitacao.modalidade,
+    "orgao": Orgao.nome,
+    "uf": Licitacao.uf,
+    "municipio": Licitacao.municipio,
+    "data_publicacao": Licitacao.data_publicacao,
+    "data_abertura": Licitacao.data_abertura,
+    "url_externa": Licitacao.url_externa,
+    "publicado_em": Licitacao.publicado_em,
+    "abertura_em": Licitacao.abertura_em,
+    "encerramento_em": Licitacao.encerramento_em,
+    "valor_total_estimado": Licitacao.valor_total_estimado,
+    "esfera": Licitacao.esfera,
+    "situacao": Licitacao.situacao,
+    "json_raw": cast(Licitacao.json_raw, Text),
+}
+
+# campos que o banco já entrega como JSON pronto
+CAMPOS_JSON_BRUTO = {"json_raw"}
+
+CAMPOS_PADRAO_LICITACAO = [campo for campo in CAMPOS_LICITACAO if campo != "json_raw"]
+
+
+# =======================================================
+# PROJEÇÃO (?fields=) DAS LISTAGENS
+# =======================================================
+def interpretar_campos(fields: Optional[str], disponiveis: Dict[str, object], padrao: List[str]) -> List[str]:
+    """
+    "id,objeto,uf" → ["id", "objeto", "uf"]; vazio → `padrao`; "*" → todos
+    (inclusive json_raw). Levanta ValueError para campo desconhecido.
+    """
+    if not fields:
+        return list(padrao)
+
+    campos = []
+    for campo in fields.split(","):
+        campo = campo.strip()
+        if not campo:
+            continue
+        if campo == "*":
+            return list(disponiveis)
+        if campo not in disponiveis:
+            raise ValueError(f"campo desconhecido: {campo} (disponíveis: {', '.join(disponiveis)})")
+        if campo not in campos:
+            campos.append(campo)
+
+    return campos or list(padrao)
+
+
+def colunas(campos: List[str], disponiveis: Dict[str, object]) -> list:
+    """Só as colunas pedidas entram no SELECT, cada uma com o nome do campo."""
+    return [disponiveis[campo].label(campo) for campo in campos]
+
+
+def linha_para_dict(linha, campos: List[str]) -> dict:
+    """Linha do SELECT → dict; json_raw vira JsonBruto (serializar com respostas.RespostaJson)."""
+    mapa = linha._mapping
+    dados = {campo: mapa[campo] for campo in campos}
+    for campo in CAMPOS_JSON_BRUTO.intersection(dados):
+        if dados[campo] is not None:
+            dados[campo] = JsonBruto(dados[campo])
+    return dados
+
@@ -0,0 +1,82 @@
+import json
+import re
+import secrets
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, List, Union
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # sem orjson: json da biblioteca padrão (mais lento, mesmo resultado)
+    orjson = None
+
+
+class JsonBruto:
+    """
+    JSON já serializado (ex.: o json_raw como texto, direto do banco).
+    Entra na resposta como está, sem json.loads + dumps de novo.
+    """
+
+    __slots__ = ("texto",)
+
+    def __init__(self, texto: Union[str, bytes]):
+        self.texto = texto.encode("utf-8") if isinstance(texto, str) else texto
+
+
+# =======================================================
+# SERIALIZAÇÃO
+# =======================================================
+def serializar(conteudo) -> bytes:
+    """
+    Objeto → JSON compacto em UTF-8 (orjson quando instalado).
+    Datas em ISO (como o encoder do FastAPI), Decimal como número e
+    JsonBruto copiado byte a byte para a saída.
+    """
+    brutos: List[bytes] = []
+    # marcador trocado depois pelo JSON pronto; o sorteio impede que um
+    # texto qualquer do conteúdo coincida com ele
+    chave = secrets.token_hex(8)
+
+    def padrao(valor):
+        if isinstance(valor, JsonBruto):
+            brutos.append(valor.texto)
+            return f"\x00{chave}:{len(brutos) - 1}\x00"
+        if isinstance(valor, Decimal):
+            return float(valor)
+        if isinstance(valor, (datetime, date)):
+            return valor.isoformat()
+        return str(valor)
+
+    if orjson is not None:
+        corpo = orjson.dumps(conteudo, default=padrao, option=orjson.OPT_NON_STR_KEYS)
+    else:
+        # o \x00 do marcador sai como \u0000, igual ao orjson
+        corpo = json.dumps(conteudo, default=padrao, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    if not brutos:
+        return corpo
+    # uma passada só pelo corpo, qualquer que seja o número de JsonBruto
+    marca = re.compile(rb'"\\u0000' + chave.encode() + rb':(\d+)\\u0000"')
+    return marca.sub(lambda m: brutos[int(m.group(1))], corpo)
+
+
+def juntar_array(itens_json: Iterable[Union[str, bytes]]) -> JsonBruto:
+    """Vários JSON prontos (um por item) → um array JSON pronto."""
+    return JsonBruto(b"[" + b",".join(
+        item.encode("utf-8") if isinstance(item, str) else item for item in itens_json
+    ) + b"]")
+
+
+class RespostaJson(Response):
+    """
+    Resposta JSON pelo serializar() acima. A rota devolve
+    RespostaJson(conteudo) direto, e o FastAPI pula o jsonable_encoder
+    (que percorre e copia o payload inteiro antes de serializar).
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return serializar(content)
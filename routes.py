@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from database import get_db
 from models import Editora
 from pydantic import BaseModel
-import requests
+from cliente_pncp import cliente_pncp
 
 router = APIRouter()
 
@@ -25,5 +25,4 @@ def create_editora(editora: EditoraSchema, db: Session = Depends(get_db)):
 def get_licitacoes():
     url = "https://pncp.gov.br/api/search"
     params = {"termo": "livro", "pagina": 1}
-    r = requests.get(url, params=params)
-    return r.json()
+    return cliente_pncp.get_json(url, params=params)
@@ -0,0 +1,129 @@
+import json
+import time
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from database import get_db, SessionLocal
+from models import ColetaJob
+from jobs_coleta import serializar_job, STATUS_FINAIS
+from cliente_pncp import cliente_pncp
+
+router = APIRouter(prefix="/coletas", tags=["Coletas"])
+
+
+# ==========================
+# 1) LISTAR JOBS
+# ==========================
+@router.get("/jobs")
+def listar_jobs(
+    status: str = "",
+    limite: int = 50,
+    db: Session = Depends(get_db),
+):
+    query = db.query(ColetaJob).order_by(ColetaJob.id.desc())
+
+    if status:
+        query = query.filter(ColetaJob.status == status)
+
+    jobs = query.limit(limite).all()
+
+    return {"total": len(jobs), "dados": [serializar_job(job) for job in jobs]}
+
+
+# ==========================
+# 2) CONSULTAR 1 JOB
+# ==========================
+@router.get("/jobs/{job_id}")
+def consultar_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+):
+    job = db.query(ColetaJob).filter(ColetaJob.id == job_id).first()
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+
+    return serializar_job(job)
+
+
+# ==========================
+# 3) ACOMPANHAR AO VIVO (SSE)
+# ==========================
+@router.get("/jobs/{job_id}/eventos")
+def eventos_job(job_id: int):
+    """
+    Server-Sent Events: envia o estado do job sempre que ele muda
+    e encerra quando o job termina.
+    """
+    db = SessionLocal()
+    try:
+        if not db.query(ColetaJob.id).filter(ColetaJob.id == job_id).first():
+            raise HTTPException(status_code=404, detail="Job não encontrado.")
+    finally:
+        db.close()
+
+    def gerar():
+        ultimo = None
+        while True:
+            db = SessionLocal()
+            try:
+                job = db.query(ColetaJob).filter(ColetaJob.id == job_id).first()
+                estado = serializar_job(job)
+            finally:
+                db.close()
+
+            if estado != ultimo:
+                yield f"data: {json.dumps(estado, ensure_ascii=False)}\n\n"
+                ultimo = estado
+
+            if estado["status"] in STATUS_FINAIS:
+                break
+            time.sleep(1)
+
+    return StreamingResponse(gerar(), media_type="text/event-stream")
+
+
+# ==========================
+# 4) CANCELAR JOB
+# ==========================
+@router.post("/jobs/{job_id}/cancelar")
+def cancelar_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+):
+    job = db.query(ColetaJob).filter(ColetaJob.id == job_id).first()
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+
+    if job.status in STATUS_FINAIS:
+        return {"status": "ja_finalizado", "mensagem": f"Job já está '{job.status}'."}
+
+    job.cancelar_solicitado = True
+    # job ainda na fila: nem chega a rodar
+    (
+        db.query(ColetaJob)
+        .filter(ColetaJob.id == job_id, ColetaJob.status == "pendente")
+        .update(
+            {"status": "cancelado", "finalizado_em": datetime.utcnow()},
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+
+    return {"status": "ok", "mensagem": "Cancelamento solicitado."}
+
+
+# ==========================
+# 5) SAÚDE DO CLIENTE PNCP
+# ==========================
+@router.get("/pncp/estatisticas")
+def estatisticas_pncp():
+    """
+    Latência das últimas chamadas ao PNCP, falhas, novas tentativas,
+    429 recebidos e a taxa que o limitador está usando agora.
+    """
+    return cliente_pncp.estatisticas()
@@ -1,120 +1,128 @@
 # routes_dashboard.py
-from fastapi import APIRouter, Depends
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import and_, func, desc, or_, select
 from datetime import datetime, timedelta
 
-from database import get_db
-from models import Licitacao, LicitacaoInteresse
+from database import SessionLocal, get_db
+from models import ContagemInteresses, ContagemLicitacoes, Licitacao, LicitacaoInteresse, LicitacaoPrazo, Orgao
+from orcamento_sql import orcamento_sql
+from cache_dashboard import cache_dashboard, em_cache
+from campos_pncp import agora_pncp
+from serie_temporal import ler_dia, montar_serie
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
+STATUS_ACOMPANHAMENTO = (
+    "interessado",
+    "estudando_editais",
+    "documentacao_pronta",
+    "proposta_enviada",
+    "aguardando_resultado",
+    "encerrado",
+)
+
+
+# =======================================================
+# CONSULTAS DOS WIDGETS (usadas pelas rotas e por /completo)
+# =======================================================
+def _janelas(agora: datetime):
+    """Início das janelas de 24h e 7 dias."""
+    return agora - timedelta(days=1), agora - timedelta(days=7)
+
+
+def _contagens_por_uf(db: Session, agora: datetime):
+    """
+    Uma linha por UF das contagens pré-agregadas (contagens.py): total e
+    soma dos dias inteiros entre o dia em que cada janela começa e hoje
+    (os dois de fora). Dias depois de hoje (data no futuro, erro na
+    origem) não entram nas janelas. Serve ao resumo (somando tudo) e às
+    estatísticas por UF.
+    """
+    inicio_24h, inicio_7d = _janelas(agora)
+    dia_24h = inicio_24h.strftime("%Y%m%d")
+    dia_7d = inicio_7d.strftime("%Y%m%d")
+    dia_hoje = agora.strftime("%Y%m%d")
+    return (
+        db.query(
+            ContagemLicitacoes.uf,
+            func.coalesce(func.sum(ContagemLicitacoes.total), 0),
+            func.coalesce(
+                func.sum(ContagemLicitacoes.total).filter(
+                    ContagemLicitacoes.dia > dia_7d, ContagemLicitacoes.dia < dia_hoje
+                ),
+                0,
+            ),
+            func.coalesce(
+                func.sum(ContagemLicitacoes.total).filter(
+                    ContagemLicitacoes.dia > dia_24h, ContagemLicitacoes.dia < dia_hoje
+                ),
+                0,
+            ),
+        )
+        .group_by(ContagemLicitacoes.uf)
+        .all()
+    )
 
-# ============================
-# 1) RESUMO GERAL
-# ============================
-@router.get("/resumo")
-def dashboard_resumo(db: Session = Depends(get_db)):
-    agora = datetime.utcnow()
-    dia_24h = agora - timedelta(days=1)
-    dia_7d = agora - timedelta(days=7)
 
-    # Total geral: conta direto no banco (leve)
-    total_licitacoes = db.query(func.count(Licitacao.id)).scalar()
+def _pedacos_do_dia(db: Session, agora: datetime):
+    """
+    O que as contagens diárias não cobrem: do início de cada janela até a
+    meia-noite, e de hoje só até agora, contados no índice (publicado_em,
+    id) — no máximo dois dias de linhas.
+    """
+    inicio_24h, inicio_7d = _janelas(agora)
+    hoje = datetime.combine(agora.date(), datetime.min.time())
+
+    def pedaco_do_dia(inicio):
+        meia_noite = datetime.combine(inicio.date() + timedelta(days=1), datetime.min.time())
+        return and_(Licitacao.publicado_em >= inicio, Licitacao.publicado_em < meia_noite)
+
+    ate_agora = and_(Licitacao.publicado_em >= hoje, Licitacao.publicado_em <= agora)
+
+    return (
+        db.query(
+            func.count(Licitacao.id).filter(or_(pedaco_do_dia(inicio_7d), ate_agora)),
+            func.count(Licitacao.id).filter(or_(pedaco_do_dia(inicio_24h), ate_agora)),
+        )
+        .filter(or_(pedaco_do_dia(inicio_7d), pedaco_do_dia(inicio_24h), ate_agora))
+        .one()
+    )
 
-    # Para não depender do tipo da coluna data_publicacao (string x datetime),
-    # vamos fazer igual você fazia antes, mas NUM SUBCONJUNTO do banco, não em tudo.
 
-    # Pegamos, por exemplo, as 10.000 licitações mais recentes.
-    # Se quiser deixar mais baixo (5.000), também funciona.
-    limite_amostra = 10000
+def _linhas_status(db: Session):
+    """(status, total) dos acompanhamentos, já contados (contagem_interesses)."""
+    return db.query(ContagemInteresses.status, ContagemInteresses.total).all()
 
-    candidatos = (
-        db.query(Licitacao)
-        .order_by(desc(Licitacao.id))   # ou desc(Licitacao.data_publicacao) se tiver índice
-        .limit(limite_amostra)
-        .all()
-    )
 
-    def parse_data_publicacao(lic):
-        raw = lic.json_raw or {}
-
-        dt = raw.get("dataPublicacaoPncp") or lic.data_publicacao
-        if not dt:
-            return None
-
-        # dt pode ser string ou datetime
-        try:
-            if isinstance(dt, str):
-                return datetime.fromisoformat(dt.replace("Z", ""))
-            return dt
-        except Exception:
-            return None
-
-    total_24h = 0
-    total_7dias = 0
-
-    for lic in candidatos:
-        dt = parse_data_publicacao(lic)
-        if not dt:
-            continue
-
-        if dt >= dia_24h:
-            total_24h += 1
-        if dt >= dia_7d:
-            total_7dias += 1
-
-    # ===== Status dos acompanhamentos (agora por GROUP BY) =====
-    status_agregado = {
-        "interessado": 0,
-        "estudando_editais": 0,
-        "documentacao_pronta": 0,
-        "proposta_enviada": 0,
-        "aguardando_resultado": 0,
-        "encerrado": 0,
-    }
-
-    status_rows = (
-        db.query(LicitacaoInteresse.status, func.count(LicitacaoInteresse.id))
-        .group_by(LicitacaoInteresse.status)
-        .all()
-    )
+def _montar_resumo(por_uf, pedacos, status_rows) -> dict:
+    pedaco_7d, pedaco_24h = pedacos
 
+    status_agregado = {status: 0 for status in STATUS_ACOMPANHAMENTO}
+    acompanhamentos_total = 0
     for status, qtd in status_rows:
+        acompanhamentos_total += qtd
         if status in status_agregado:
             status_agregado[status] = qtd
 
-    acompanhamentos_total = db.query(func.count(LicitacaoInteresse.id)).scalar()
-
     return {
-        "total_licitacoes": total_licitacoes,
-        "novas_24h": total_24h,
-        "novas_7dias": total_7dias,
+        "total_licitacoes": sum(total for _, total, _, _ in por_uf),
+        "novas_24h": sum(dias_24h for _, _, _, dias_24h in por_uf) + pedaco_24h,
+        "novas_7dias": sum(dias_7d for _, _, dias_7d, _ in por_uf) + pedaco_7d,
         "acompanhamentos": acompanhamentos_total,
         "status_acompanhamentos": status_agregado,
     }
 
 
-# ============================
-# 2) LICITAÇÕES POR UF
-# ============================
-@router.get("/estatisticas_uf")
-def estatisticas_uf(db: Session = Depends(get_db)):
-    # Versão leve: agrupa direto pela coluna uf no banco.
-    # Obs.: isso NÃO usa o json_raw pra corrigir UF, mas para fins de estatística
-    # de dashboard é mais seguro do que dar .all() em tudo.
-    rows = (
-        db.query(Licitacao.uf, func.count(Licitacao.id))
-        .filter(Licitacao.uf != None)
-        .filter(Licitacao.uf != "—")
-        .group_by(Licitacao.uf)
-        .all()
-    )
-
+def _montar_estatisticas_uf(por_uf) -> dict:
     lista = [
         {"uf": uf, "total": total}
-        for uf, total in rows
-        if uf
+        for uf, total, _, _ in por_uf
+        if uf and uf != "—" and total
     ]
 
     lista.sort(key=lambda x: x["total"], reverse=True)
@@ -122,147 +130,271 @@ def estatisticas_uf(db: Session = Depends(get_db)):
     return {"total_estados": len(lista), "dados": lista}
 
 
+def _montar_status(status_rows) -> dict:
+    return {status: qtd for status, qtd in status_rows if qtd > 0}
+
+
+def _proximos_prazos(
+    db: Session,
+    agora: datetime,
+    uf: str = "",
+    modalidade: str = "",
+    editora_id: int | None = None,
+    limite: int = 10,
+) -> dict:
+    # Aberturas e encerramentos de todas as licitações num índice só
+    # (licitacao_prazos.instante): o banco desce pela ordem do índice a
+    # partir de agora e para no N-ésimo prazo que passa nos filtros
+    query = (
+        db.query(
+            LicitacaoPrazo.licitacao_id.label("id"),
+            Licitacao.objeto,
+            LicitacaoPrazo.tipo,
+            LicitacaoPrazo.instante,
+        )
+        .join(Licitacao, Licitacao.id == LicitacaoPrazo.licitacao_id)
+        .filter(LicitacaoPrazo.instante > agora)
+    )
+    if uf:
+        query = query.filter(Licitacao.uf == uf.upper())
+    if modalidade:
+        query = query.filter(Licitacao.modalidade == modalidade)
+    if editora_id is not None:
+        query = query.filter(
+            Licitacao.id.in_(
+                select(LicitacaoInteresse.licitacao_id).where(LicitacaoInteresse.editora_id == editora_id)
+            )
+        )
+
+    proximas = query.order_by(LicitacaoPrazo.instante, LicitacaoPrazo.id).limit(limite).all()
+
+    return {
+        "proximos_prazos": [
+            {
+                "id": item.id,
+                "objeto": item.objeto,
+                "tipo": item.tipo,
+                "data": item.instante.isoformat(),
+            }
+            for item in proximas
+        ]
+    }
+
+
+def _oportunidades_recentes(db: Session, agora: datetime) -> dict:
+    # As 10 publicadas mais recentemente: o banco desce o índice
+    # (publicado_em, id) a partir de agora e para na décima. Data de
+    # publicação no futuro (erro na origem) não passa na frente.
+    lista = (
+        db.query(
+            Licitacao.id,
+            Licitacao.objeto,
+            Orgao.nome.label("orgao"),
+            Licitacao.publicado_em,
+        )
+        .outerjoin(Orgao, Licitacao.orgao_id == Orgao.id)
+        .filter(Licitacao.publicado_em <= agora)
+        .order_by(desc(Licitacao.publicado_em), desc(Licitacao.id))
+        .limit(10)
+        .all()
+    )
+
+    return {
+        "total": len(lista),
+        "dados": [
+            {
+                "id": lic.id,
+                "objeto": lic.objeto,
+                "orgao": lic.orgao,
+                "data_publicacao": lic.publicado_em.isoformat(),
+            }
+            for lic in lista
+        ],
+    }
+
+
+# ============================
+# 1) RESUMO GERAL
+# ============================
+@router.get("/resumo")
+@orcamento_sql(3)
+@em_cache
+def dashboard_resumo(db: Session = Depends(get_db)):
+    # mesmo relógio das datas gravadas (Brasília), senão a janela sai 3h torta
+    agora = agora_pncp()
+
+    # Total e janelas exatos sem varrer licitacoes: os dias inteiros vêm
+    # das contagens pré-agregadas e só o pedaço do primeiro dia e o de
+    # hoje (até agora) são contados
+    return _montar_resumo(
+        _contagens_por_uf(db, agora),
+        _pedacos_do_dia(db, agora),
+        _linhas_status(db),
+    )
+
+
+# ============================
+# 2) LICITAÇÕES POR UF
+# ============================
+@router.get("/estatisticas_uf")
+@orcamento_sql(1)
+@em_cache
+def estatisticas_uf(db: Session = Depends(get_db)):
+    # Soma as contagens pré-agregadas por UF (contagens.py): o tamanho da
+    # consulta não depende de quantas licitações existem
+    return _montar_estatisticas_uf(_contagens_por_uf(db, agora_pncp()))
+
+
 # ============================
 # 3) ACOMPANHAMENTOS POR STATUS
 # ============================
 @router.get("/status_acompanhamentos")
+@orcamento_sql(1)
+@em_cache
 def status_acompanhamentos(db: Session = Depends(get_db)):
     # Mesmo que o anterior, mas devolvendo direto o dicionário.
-    rows = (
-        db.query(LicitacaoInteresse.status, func.count(LicitacaoInteresse.id))
-        .group_by(LicitacaoInteresse.status)
-        .all()
-    )
-
-    contagem = {status: qtd for status, qtd in rows}
-
-    return contagem
+    return _montar_status(_linhas_status(db))
 
 
 # ============================
 # 4) PRÓXIMOS PRAZOS (abertura + encerramento)
 # ============================
 @router.get("/proximos_prazos")
-def proximos_prazos(db: Session = Depends(get_db)):
-    hoje = datetime.utcnow()
-
-    # Pra evitar dar .all() numa tabela enorme, a ideia é:
-    # - pegar um conjunto razoável de licitações mais recentes (por data_publicacao),
-    #   por exemplo as últimas 1000
-    # - em cima desse subconjunto, aplicar a lógica de data_abertura / json_raw
-    # Isso é mais que suficiente pra achar os próximos 10 prazos pro dashboard.
-
-    candidatos = (
-        db.query(Licitacao)
-        .order_by(desc(Licitacao.data_publicacao))
-        .limit(1000)
-        .all()
-    )
-
-    proximas = []
-
-    for lic in candidatos:
-        # tenta data de abertura (ISO string)
-        if lic.data_abertura:
-            try:
-                dt = datetime.fromisoformat(lic.data_abertura.replace("Z", ""))
-                if dt > hoje:
-                    proximas.append(
-                        {
-                            "id": lic.id,
-                            "objeto": lic.objeto,
-                            "data": dt,
-                            "tipo": "abertura",
-                        }
-                    )
-            except Exception:
-                pass
-
-        # tenta encerramento no json_raw
-        raw = lic.json_raw or {}
-        enc = raw.get("dataEncerramentoProposta")
-        if enc:
-            try:
-                dt2 = datetime.fromisoformat(enc.replace("Z", ""))
-                if dt2 > hoje:
-                    proximas.append(
-                        {
-                            "id": lic.id,
-                            "objeto": lic.objeto,
-                            "data": dt2,
-                            "tipo": "encerramento",
-                        }
-                    )
-            except Exception:
-                pass
-
-    # ordena por data mais próxima e corta os 10 primeiros
-    proximas.sort(key=lambda x: x["data"])
-
-    return {
-        "proximos_prazos": [
-            {
-                "id": item["id"],
-                "objeto": item["objeto"],
-                "tipo": item["tipo"],
-                "data": item["data"].isoformat(),
-            }
-            for item in proximas[:10]
-        ]
-    }
+@orcamento_sql(1)
+@em_cache
+def proximos_prazos(
+    uf: str = "",
+    modalidade: str = Query("", description="código da modalidade (ex: 6)"),
+    editora_id: int | None = Query(None, description="só licitações nos interesses desta editora"),
+    limite: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    return _proximos_prazos(db, agora_pncp(), uf=uf, modalidade=modalidade, editora_id=editora_id, limite=limite)
 
 
 # ============================
 # 5) OPORTUNIDADES RECENTES
 # ============================
 @router.get("/oportunidades_recentes")
+@orcamento_sql(1)
+@em_cache
 def oportunidades_recentes(db: Session = Depends(get_db)):
-    # Mesma ideia: não vamos varrer a tabela inteira.
-    # Pegamos as últimas N licitações e, dentro delas, calculamos a "data real"
-    # usando json_raw + data_publicacao.
-
-    def get_data_pub(lic):
-        raw = lic.json_raw or {}
-        dt = raw.get("dataPublicacaoPncp") or lic.data_publicacao
-        if not dt:
-            return None
-        try:
-            # dt pode ser string ou datetime; tratamos os dois casos
-            if isinstance(dt, str):
-                return datetime.fromisoformat(dt.replace("Z", ""))
-            return dt
-        except Exception:
-            return None
-
-    # Subconjunto: últimas 1000 por data_publicacao
-    candidatos = (
-        db.query(Licitacao)
-        .order_by(desc(Licitacao.data_publicacao))
-        .limit(1000)
-        .all()
-    )
+    return _oportunidades_recentes(db, agora_pncp())
 
-    lista = []
-    for lic in candidatos:
-        dt = get_data_pub(lic)
-        if dt:
-            lista.append((lic, dt))
 
-    # Ordena pela data real de publicação
-    lista.sort(key=lambda x: x[1], reverse=True)
+# ============================
+# 6) SÉRIE TEMPORAL (dia / semana / mês)
+# ============================
+@router.get("/serie_temporal")
+@orcamento_sql(1)
+@em_cache
+def serie_temporal(
+    granularidade: str = Query("dia", pattern="^(dia|semana|mes)$"),
+    por: str | None = Query(None, pattern="^(uf|modalidade|orgao)$", description="uma série por UF, modalidade ou órgão"),
+    inicio: str | None = Query(None, description="AAAAMMDD (padrão: 1 ano antes do fim)"),
+    fim: str | None = Query(None, description="AAAAMMDD (padrão: hoje)"),
+    uf: str = "",
+    modalidade: str = Query("", description="código da modalidade (ex: 6)"),
+    max_series: int = Query(10, ge=1, le=100, description="com 'por': as N maiores; o resto vira 'outros'"),
+    db: Session = Depends(get_db),
+):
+    # Lê só as contagens diárias mantidas pela ingestão (serie_temporal.py)
+    try:
+        data_fim = ler_dia(fim) if fim else agora_pncp().date()
+        data_inicio = ler_dia(inicio) if inicio else data_fim - timedelta(days=365)
+    except ValueError:
+        raise HTTPException(400, "Datas no formato AAAAMMDD")
+
+    if data_inicio > data_fim:
+        raise HTTPException(400, "inicio depois do fim")
+    if (data_fim - data_inicio).days > 366 * 5:
+        raise HTTPException(400, "Período máximo: 5 anos")
+    if por == "orgao" and modalidade:
+        raise HTTPException(400, "Filtro de modalidade não disponível na série por órgão")
+
+    return montar_serie(
+        db, data_inicio, data_fim,
+        granularidade=granularidade, por=por, uf=uf, modalidade=modalidade, max_series=max_series,
+    )
 
-    # Top 10
-    lista = lista[:10]
 
-    return {
-        "total": len(lista),
-        "dados": [
-            {
-                "id": lic.id,
-                "objeto": lic.objeto,
-                "orgao": lic.orgao.nome if lic.orgao else None,
-                "data_publicacao": dt.isoformat(),
-            }
-            for lic, dt in lista
-        ],
+# ============================
+# 7) DASHBOARD COMPLETO (uma chamada só)
+# ============================
+# Consultas de /completo rodando ao mesmo tempo, somando todas as requisições
+# do processo (cada uma usa uma conexão do pool)
+CONCORRENCIA_DASHBOARD = int(os.getenv("DASHBOARD_CONCORRENCIA", "4"))
+
+_executor = ThreadPoolExecutor(max_workers=CONCORRENCIA_DASHBOARD)
+
+# widget → consultas de que ele precisa (as comuns rodam uma vez só)
+WIDGETS = {
+    "resumo": ("por_uf", "pedacos", "status"),
+    "estatisticas_uf": ("por_uf",),
+    "status_acompanhamentos": ("status",),
+    "proximos_prazos": ("prazos",),
+    "oportunidades_recentes": ("recentes",),
+}
+
+CONSULTAS_WIDGETS = {
+    "por_uf": _contagens_por_uf,
+    "pedacos": _pedacos_do_dia,
+    "status": lambda db, agora: _linhas_status(db),
+    "prazos": _proximos_prazos,
+    "recentes": _oportunidades_recentes,
+}
+
+
+def _em_sessao_propria(consulta, agora):
+    db = SessionLocal()
+    try:
+        return consulta(db, agora)
+    finally:
+        db.close()
+
+
+@router.get("/completo")
+@orcamento_sql(5)
+@em_cache
+def dashboard_completo(
+    widgets: str = Query("", description="separados por vírgula (padrão: todos)"),
+    db: Session = Depends(get_db),
+):
+    pedidos = [w.strip() for w in widgets.split(",") if w.strip()] or list(WIDGETS)
+    desconhecidos = [w for w in pedidos if w not in WIDGETS]
+    if desconhecidos:
+        raise HTTPException(400, f"Widgets desconhecidos: {', '.join(desconhecidos)}. Use: {', '.join(WIDGETS)}")
+
+    # um "agora" só para todos os widgets
+    agora = agora_pncp()
+    nomes = list(dict.fromkeys(nome for widget in pedidos for nome in WIDGETS[widget]))
+
+    # Uma consulta fica com a sessão da requisição; as outras vão ao mesmo
+    # tempo para o pool, cada uma com a sua sessão. copy_context: as
+    # consultas das threads também entram no X-Consultas-SQL.
+    futuros = {
+        nome: _executor.submit(
+            contextvars.copy_context().run, _em_sessao_propria, CONSULTAS_WIDGETS[nome], agora
+        )
+        for nome in nomes[1:]
+    }
+    resultados = {nomes[0]: CONSULTAS_WIDGETS[nomes[0]](db, agora)}
+    resultados.update({nome: futuro.result() for nome, futuro in futuros.items()})
+
+    montar = {
+        "resumo": lambda: _montar_resumo(resultados["por_uf"], resultados["pedacos"], resultados["status"]),
+        "estatisticas_uf": lambda: _montar_estatisticas_uf(resultados["por_uf"]),
+        "status_acompanhamentos": lambda: _montar_status(resultados["status"]),
+        "proximos_prazos": lambda: resultados["prazos"],
+        "oportunidades_recentes": lambda: resultados["recentes"],
     }
+    return {widget: montar[widget]() for widget in dict.fromkeys(pedidos)}
+
+
+# ============================
+# 8) CACHE DO DASHBOARD
+# ============================
+@router.get("/cache")
+def estatisticas_cache():
+    # acertos/falhas, versão dos dados e ocupação do cache das rotas acima
+    return cache_dashboard.estatisticas()
@@ -1,18 +1,41 @@
 from fastapi import APIRouter, Query, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 import requests
-import json
-import os
-import time
-from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-
-from database import get_db
-from models import Licitacao, Orgao, ColetaHistorico
+from sqlalchemy.orm import Session, selectinload
+
+from database import get_db, SessionLocal
+from models import Licitacao, ColetaHistorico, Orgao
+from cliente_pncp import cliente_pncp
+from ingestao import salvar_lote_no_banco, TAMANHO_LOTE
+from leitura_json import em_lotes
+from cache_local import cache_local
+from indice_cache import indice_cache
+from coletas import (
+    gerar_dias,
+    interpretar_modalidades,
+    somar_contagem,
+    salvar_cache_arquivo,
+    coletar_multiplo,
+    coletar_periodo_completo as coletar_periodo,
+)
+from jobs_coleta import submeter_job
+from sincronizacao import carregar_estados
+from paginacao import codificar_cursor, decodificar_cursor, ramos_do_cursor, percorrer_ramos
+from busca_textual import RECURSOS, filtrar_por_busca, buscar_ranqueado
+from orcamento_sql import orcamento_sql
+from projecao import CAMPOS_LICITACAO, CAMPOS_PADRAO_LICITACAO, interpretar_campos, colunas, linha_para_dict
+from respostas import RespostaJson, juntar_array, serializar
+from contagens import somar_interesses
 
 router = APIRouter()
 
-# Caminho do arquivo de cache local
-CACHE_FILE = "licitacoes_cache.json"
+
+def resposta_job_agendado(job_id: int) -> dict:
+    return {
+        "status": "AGENDADO",
+        "job_id": job_id,
+        "acompanhar_em": f"/coletas/jobs/{job_id}",
+    }
 
 
 # =======================================================
@@ -40,9 +63,7 @@ def coletar_licitacoes(
     }
 
     try:
-        r = requests.get(url, params=params, timeout=180)
-        r.raise_for_status()
-        data = r.json()
+        data = cliente_pncp.get_json(url, params=params)
 
         return {
             "parametros_enviados": params,
@@ -59,57 +80,26 @@ def coletar_licitacoes(
 
 
 # =======================================================
-# 2) SALVAR CACHE LOCAL EM ARQUIVO JSON
+# 2) SALVAR CACHE LOCAL (SEGMENTOS NDJSON)
 # =======================================================
 @router.get("/licitacoes/salvar")
 def salvar_cache(
     paginas: int = Query(20, ge=1, le=50, description="Quantas páginas buscar no PNCP"),
-    tamanho_pagina: int = Query(50, ge=1, le=500)
+    tamanho_pagina: int = Query(50, ge=1, le=500),
+    substituir: bool = Query(False, description="Esvazia o cache antes (padrão: acrescenta)"),
+    em_segundo_plano: bool = Query(False, description="Devolve um job_id na hora e coleta em background")
 ):
     """
-    Coleta VÁRIAS páginas do PNCP e salva um arquivo local com TODAS as licitações.
+    Coleta VÁRIAS páginas do PNCP e acrescenta ao cache local
+    (segmentos NDJSON em licitacoes_cache/).
     Ideal pra ter 500–2000 licitações reais para testes locais.
     """
-    url = "https://pncp.gov.br/api/consulta/v1/contratacoes/publicacao"
-    todas = []
-
-    for pagina in range(1, paginas + 1):
-        params = {
-            "dataInicial": "20250101",
-            "dataFinal": "20251231",
-            "codigoModalidadeContratacao": 6,
-            "pagina": pagina,
-            "tamanhoPagina": tamanho_pagina
-        }
-
-        try:
-            r = requests.get(url, params=params, timeout=180)
-            r.raise_for_status()
-            data = r.json().get("data", []) or []
-
-            if not data:
-                break
-
-            todas.extend(data)
-        except Exception as e:
-            return {
-                "erro": str(e),
-                "pagina": pagina,
-                "dados_parciais": len(todas)
-            }
-
-    # Remove duplicados por idCompra
-    unicos = {item.get("idCompra"): item for item in todas if item.get("idCompra")}
+    parametros = {"paginas": paginas, "tamanho_pagina": tamanho_pagina, "substituir": substituir}
 
-    # Salvar JSON
-    with open(CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(list(unicos.values()), f, indent=2, ensure_ascii=False)
+    if em_segundo_plano:
+        return resposta_job_agendado(submeter_job("cache_local", parametros))
 
-    return {
-        "status": "OK",
-        "salvo_em": CACHE_FILE,
-        "quantidade": len(unicos)
-    }
+    return salvar_cache_arquivo(**parametros)
 
 
 # =======================================================
@@ -120,16 +110,38 @@ def listar_cache():
     """
     Retorna o JSON salvo localmente (apenas para testes).
     """
-    if not os.path.exists(CACHE_FILE):
+    if not cache_local.existe():
         return {"erro": "Nenhum cache encontrado. Execute /licitacoes/salvar primeiro."}
 
-    with open(CACHE_FILE, "r", encoding="utf-8") as f:
-        dados = json.load(f)
+    # as linhas do índice em memória já estão em JSON: vão coladas na resposta
+    dados = indice_cache.filtrar_json()
 
-    return {
+    return RespostaJson({
         "total": len(dados),
-        "dados": dados
-    }
+        "dados": juntar_array(dados)
+    })
+
+
+# =======================================================
+# 3.1) MANIFESTO / COMPACTAÇÃO DO CACHE LOCAL
+# =======================================================
+@router.get("/licitacoes/cache/manifesto")
+def manifesto_cache():
+    """
+    Segmentos do cache local, com registros, tamanho e resumo de cada um.
+    """
+    cache_local.existe()
+    return {**cache_local.manifesto(), "indice_em_memoria": indice_cache.estatisticas()}
+
+
+@router.post("/licitacoes/cache/compactar")
+def compactar_cache():
+    """
+    Reescreve o cache deixando só a versão mais nova de cada licitação.
+    """
+    if not cache_local.existe():
+        raise HTTPException(400, "Nenhum cache encontrado. Execute /licitacoes/salvar primeiro.")
+    return cache_local.compactar()
 
 
 # =======================================================
@@ -140,105 +152,24 @@ def filtrar_cache(
     busca: str = "",
     uf: str = "",
     modalidade: str = "",
+    trecho: bool = Query(False, description="busca em qualquer parte da palavra ('ivro' acha 'livros'); mais lento"),
 ):
     """
-    Filtra o JSON salvo localmente (apenas para testes).
+    Filtra o cache local (apenas para testes).
+    A busca no objeto ignora acentos ("licitacao" acha "licitação") e cada
+    termo casa com o começo de uma palavra, em qualquer ordem ("livro
+    didatico" acha "Aquisição de livros didáticos").
     """
-    if not os.path.exists(CACHE_FILE):
+    if not cache_local.existe():
         return {"erro": "Nenhum cache encontrado. Execute /licitacoes/salvar primeiro."}
 
-    with open(CACHE_FILE, "r", encoding="utf-8") as f:
-        dados = json.load(f)
-
-    resultado = []
-
-    for item in dados:
-        objeto = (item.get("objetoCompra") or item.get("descricao") or "").lower()
-        uf_item = item.get("orgaoEntidade", {}).get("uf", "").lower()
-        modalidade_item = str(item.get("modalidadeLicitacao") or "").lower()
-
-        if busca and busca.lower() not in objeto:
-            continue
-        if uf and uf.lower() != uf_item:
-            continue
-        if modalidade and modalidade.lower() not in modalidade_item:
-            continue
-
-        resultado.append(item)
+    # índice em memória (indice_cache.py), recarregado quando o cache muda
+    resultado = indice_cache.filtrar_json(busca=busca, uf=uf, modalidade=modalidade, trecho=trecho)
 
-    return {
+    return RespostaJson({
         "filtrados": len(resultado),
-        "dados": resultado
-    }
-
-
-# =======================================================
-# FUNÇÃO AUXILIAR: SALVAR UMA LICITAÇÃO NO BANCO
-# =======================================================
-def salvar_licitacao_no_banco(item: dict, db: Session) -> bool:
-    """
-    Converte o item do PNCP → tabela 'licitacoes'.
-    Retorna True se criou novo registro, False se atualizou.
-    """
-
-    id_externo = item.get("idCompra") or item.get("numeroControlePNCP")
-    if not id_externo:
-        return False
-
-    # --------------------
-    # ORGÃO
-    # --------------------
-    orgao_nome = item.get("orgaoEntidade", {}).get("razaoSocial")
-    uf = item.get("orgaoEntidade", {}).get("uf")
-    municipio = item.get("orgaoEntidade", {}).get("municipio")
-
-    orgao = None
-    if orgao_nome:
-        orgao = db.query(Orgao).filter(
-            Orgao.nome == orgao_nome,
-            Orgao.uf == uf,
-            Orgao.municipio == municipio
-        ).first()
-        if not orgao:
-            orgao = Orgao(nome=orgao_nome, uf=uf, municipio=municipio)
-            db.add(orgao)
-            db.flush()
-
-    # --------------------
-    # LICITAÇÃO
-    # --------------------
-    existente = db.query(Licitacao).filter(Licitacao.id_externo == id_externo).first()
-
-    if not existente:
-        nova = Licitacao(
-            id_externo=id_externo,
-            numero=item.get("numeroCompra"),
-            objeto=item.get("objetoCompra") or item.get("descricao"),
-            modalidade=str(item.get("modalidadeLicitacao")),
-            orgao_id=orgao.id if orgao else None,
-            uf=uf,
-            municipio=municipio,
-            data_publicacao=item.get("dataPublicacaoPncp"),
-            data_abertura=item.get("dataAberturaProposta"),
-            url_externa=item.get("linkSistemaOrigem"),
-            json_raw=item,
-        )
-        db.add(nova)
-        return True
-
-    # Atualiza existente
-    existente.numero = item.get("numeroCompra")
-    existente.objeto = item.get("objetoCompra") or item.get("descricao")
-    existente.modalidade = str(item.get("modalidadeLicitacao"))
-    existente.orgao_id = orgao.id if orgao else None
-    existente.uf = uf
-    existente.municipio = municipio
-    existente.data_publicacao = item.get("dataPublicacaoPncp")
-    existente.data_abertura = item.get("dataAberturaProposta")
-    existente.url_externa = item.get("linkSistemaOrigem")
-    existente.json_raw = item
-
-    return False
+        "dados": juntar_array(resultado)
+    })
 
 
 # =======================================================
@@ -247,103 +178,212 @@ def salvar_licitacao_no_banco(item: dict, db: Session) -> bool:
 @router.post("/licitacoes/salvar_no_banco")
 def salvar_cache_no_banco(db: Session = Depends(get_db)):
     """
-    Lê o arquivo licitacoes_cache.json e grava todas as licitações no banco.
+    Lê o cache local e grava todas as licitações no banco.
     Útil só em ambiente local.
     """
-    if not os.path.exists(CACHE_FILE):
+    if not cache_local.existe():
         raise HTTPException(400, "Nenhum cache encontrado. Execute /licitacoes/salvar primeiro.")
 
-    with open(CACHE_FILE, "r", encoding="utf-8") as f:
-        dados = json.load(f)
-
-    inseridos = 0
-    atualizados = 0
+    # lido em stream e gravado em lotes: a memória não cresce com o arquivo.
+    # Commit a cada lote (como a coleta faz por página): órgãos novos são
+    # criados numa transação à parte (cache_orgaos.py), que no SQLite
+    # esperaria para sempre por uma transação aberta desde o primeiro lote
+    total = 0
+    contagem = {"inseridos": 0, "atualizados": 0, "inalterados": 0}
 
-    for item in dados:
-        criado = salvar_licitacao_no_banco(item, db)
-        if criado:
-            inseridos += 1
-        else:
-            atualizados += 1
+    for lote in em_lotes(cache_local.iterar(), TAMANHO_LOTE):
+        somar_contagem(contagem, salvar_lote_no_banco(lote, db))
+        db.commit()
+        total += len(lote)
 
     historico = ColetaHistorico(
         fonte="CACHE_LOCAL",
         url="arquivo local",
-        quantidade=len(dados)
+        quantidade=total
     )
     db.add(historico)
     db.commit()
 
     return {
-        "total_processados": len(dados),
-        "inseridos": inseridos,
-        "atualizados": atualizados
+        "total_processados": total,
+        "inseridos": contagem["inseridos"],
+        "atualizados": contagem["atualizados"],
+        "inalterados": contagem["inalterados"]
     }
 
 
 # =======================================================
-# 6) LISTAR LICITAÇÕES DO BANCO (AGORA COM LIMITE 5000)
+# 6) LISTAR LICITAÇÕES DO BANCO (PAGINADO POR CURSOR)
 # =======================================================
+def consulta_listagem(db: Session, campos: list, filtros: dict):
+    """
+    Filtros (busca, uf, modalidade e os campos do PNCP promovidos a
+    coluna), sem ordem: a ordem e o cursor vêm de ramos_listagem().
+    Só as colunas de `campos` vão no SELECT (json_raw fica no banco se
+    não for pedido); id e publicado_em vão sempre, para o cursor.
+    """
+    query = db.query(
+        Licitacao.id.label("_id"),
+        Licitacao.publicado_em.label("_publicado_em"),
+        *colunas(campos, CAMPOS_LICITACAO),
+    )
+
+    if "orgao" in campos:
+        # nome do órgão vem no mesmo SELECT (sem uma consulta por linha)
+        query = query.outerjoin(Orgao, Licitacao.orgao_id == Orgao.id)
+
+    if filtros.get("busca"):
+        # índice de busca textual (busca_textual.py), não mais ILIKE na tabela toda
+        query = filtrar_por_busca(query, filtros["busca"])
+
+    if filtros.get("uf"):
+        query = query.filter(Licitacao.uf == filtros["uf"].upper())
+
+    if filtros.get("modalidade"):
+        query = query.filter(Licitacao.modalidade.ilike(f"%{filtros['modalidade']}%"))
+
+    # colunas indexadas (campos_pncp.py): nada de abrir o json_raw
+    if filtros.get("esfera"):
+        query = query.filter(Licitacao.esfera == filtros["esfera"].lower())
+
+    if filtros.get("situacao"):
+        query = query.filter(Licitacao.situacao == filtros["situacao"])
+
+    if filtros.get("valor_minimo") is not None:
+        query = query.filter(Licitacao.valor_total_estimado >= filtros["valor_minimo"])
+
+    if filtros.get("valor_maximo") is not None:
+        query = query.filter(Licitacao.valor_total_estimado <= filtros["valor_maximo"])
+
+    return query
+
+
+def ramos_listagem(db: Session, campos: list, filtros: dict, cursor: str | None) -> list:
+    """
+    Ordem publicado_em DESC NULLS LAST, id DESC a partir do cursor
+    (paginacao.py), no índice ix_licitacoes_listagem: as com data e
+    depois as sem data, cada uma numa consulta.
+    """
+    posicao = decodificar_cursor(cursor) if cursor else None
+    return ramos_do_cursor(consulta_listagem(db, campos, filtros), Licitacao.publicado_em, Licitacao.id, posicao)
+
+
+def gerar_ndjson(campos: list, filtros: dict, cursor: str | None, limite: int | None):
+    """
+    Uma licitação por linha, escrita conforme sai do cursor do banco
+    (yield_per: no Postgres é um cursor do lado do servidor).
+    Sessão própria: a do Depends já foi fechada quando o stream começa.
+    """
+    db = SessionLocal()
+    try:
+        ramos = [ramo.yield_per(TAMANHO_LOTE) for ramo in ramos_listagem(db, campos, filtros, cursor)]
+
+        for linha in percorrer_ramos(ramos, limite):
+            yield serializar(linha_para_dict(linha, campos)) + b"\n"
+    finally:
+        db.close()
+
 
 @router.get("/licitacoes/listar_banco")
+@orcamento_sql(2)  # a página em que acabam as com data lê também as sem data
 def listar_licitacoes_banco(
     id: int | None = None,
     busca: str = "",
     uf: str = "",
     modalidade: str = "",
-    limite: int = 5000,
+    esfera: str = Query("", description="federal, estadual, municipal ou distrital"),
+    situacao: str = Query("", description="situação da compra no PNCP (ex: Divulgada no PNCP)"),
+    valor_minimo: float | None = Query(None, ge=0, description="valor total estimado mínimo"),
+    valor_maximo: float | None = Query(None, ge=0, description="valor total estimado máximo"),
+    limite: int | None = Query(None, ge=1, le=5000, description="Tamanho da página (json: padrão 5000; ndjson: vazio = tudo)"),
+    cursor: str | None = Query(None, description="proximo_cursor devolvido pela página anterior"),
+    formato: str = Query("json", pattern="^(json|ndjson)$", description="ndjson = uma licitação por linha, em stream"),
+    fields: str | None = Query(None, description="Campos separados por vírgula (ex: id,objeto,uf). json_raw só vem se pedido; * = todos"),
     db: Session = Depends(get_db),
 ):
     """
     Lista licitações já salvas no banco (versão persistente e filtrável).
     Se 'id' for informado, retorna apenas aquela licitação.
+    Paginação por cursor em (publicado_em, id): a resposta traz
+    'proximo_cursor' enquanto houver mais páginas.
     """
-    base_query = db.query(Licitacao)
+    try:
+        campos = interpretar_campos(fields, CAMPOS_LICITACAO, CAMPOS_PADRAO_LICITACAO)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
 
-    # Se for busca por ID específico, ignora os demais filtros
     if id is not None:
-        lic = base_query.filter(Licitacao.id == id).first()
-        if not lic:
+        linha = consulta_listagem(db, campos, {}).filter(Licitacao.id == id).first()
+        if not linha:
             raise HTTPException(status_code=404, detail="Licitação não encontrada")
-        dados = [lic]
-        total = 1
-    else:
-        query = base_query
+        return RespostaJson({"total": 1, "proximo_cursor": None, "dados": [linha_para_dict(linha, campos)]})
+
+    if cursor:
+        try:
+            decodificar_cursor(cursor)
+        except ValueError:
+            raise HTTPException(400, "cursor inválido")
+
+    filtros = {
+        "busca": busca,
+        "uf": uf,
+        "modalidade": modalidade,
+        "esfera": esfera,
+        "situacao": situacao,
+        "valor_minimo": valor_minimo,
+        "valor_maximo": valor_maximo,
+    }
+
+    if formato == "ndjson":
+        return StreamingResponse(
+            gerar_ndjson(campos, filtros, cursor, limite),
+            media_type="application/x-ndjson",
+        )
+
+    limite = limite or 5000
+    # uma a mais só para saber se existe próxima página
+    linhas = list(percorrer_ramos(ramos_listagem(db, campos, filtros, cursor), limite + 1))
+    tem_mais = len(linhas) > limite
+    linhas = linhas[:limite]
 
-        if busca:
-            query = query.filter(Licitacao.objeto.ilike(f"%{busca}%"))
+    proximo_cursor = None
+    if tem_mais:
+        ultima = linhas[-1]
+        proximo_cursor = codificar_cursor(ultima._publicado_em, ultima._id)
 
-        if uf:
-            query = query.filter(Licitacao.uf == uf.upper())
+    return RespostaJson({
+        "total": len(linhas),
+        "proximo_cursor": proximo_cursor,
+        "dados": [linha_para_dict(linha, campos) for linha in linhas],
+    })
 
-        if modalidade:
-            query = query.filter(Licitacao.modalidade.ilike(f"%{modalidade}%"))
 
-        query = query.order_by(
-            Licitacao.data_publicacao.desc(), Licitacao.id.desc()
-        ).limit(limite)
-        dados = query.all()
-        total = len(dados)
+# =======================================================
+# 6.1) BUSCA TEXTUAL (RELEVÂNCIA + DESTAQUE)
+# =======================================================
+@router.get("/licitacoes/buscar")
+@orcamento_sql(2)
+def buscar_licitacoes(
+    q: str = Query(..., min_length=2, description="Termos de busca no objeto (acentos e plural não importam)"),
+    uf: str = "",
+    modalidade: str = "",
+    limite: int = Query(20, ge=1, le=100),
+    pagina: int = Query(1, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    """
+    Busca no objeto das licitações ordenada por relevância, com os termos
+    encontrados marcados em 'destaque' (<mark>…</mark>).
+    Postgres: tsvector em português + trigramas; SQLite: FTS5.
+    """
+    dados = buscar_ranqueado(db, q, uf=uf, modalidade=modalidade, limite=limite, pagina=pagina)
 
     return {
-        "total": total,
-        "dados": [
-            {
-                "id": lic.id,
-                "id_externo": lic.id_externo,
-                "numero": lic.numero,
-                "objeto": lic.objeto,
-                "modalidade": lic.modalidade,
-                "orgao": lic.orgao.nome if lic.orgao else None,
-                "uf": lic.uf,
-                "municipio": lic.municipio,
-                "data_publicacao": lic.data_publicacao,
-                "data_abertura": lic.data_abertura,
-                "url_externa": lic.url_externa,
-                "json_raw": lic.json_raw,
-            }
-            for lic in dados
-        ],
+        "busca": q,
+        "pagina": pagina,
+        "total": len(dados),
+        "motor": RECURSOS["dialeto"] if RECURSOS["fts"] else "ilike",
+        "dados": dados,
     }
 
 
@@ -373,45 +413,40 @@ def coletar_e_salvar(
         "tamanhoPagina": tamanho_pagina
     }
 
+    # os itens vão sendo gravados em lotes conforme a resposta é
+    # decodificada: a página não fica inteira em memória
+    total = 0
+    contagem = {"inseridos": 0, "atualizados": 0, "inalterados": 0}
     try:
-        r = requests.get(url, params=params, timeout=180)
-        r.raise_for_status()
-        data = r.json()
+        for lote in em_lotes(cliente_pncp.iterar_itens(url, params=params), TAMANHO_LOTE):
+            somar_contagem(contagem, salvar_lote_no_banco(lote, db))
+            db.commit()
+            total += len(lote)
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail=f"Erro ao coletar PNCP: {e}")
 
-    itens = data.get("data", []) or []
-
-    if not itens:
+    if not total:
         return {
             "status": "SEM_DADOS",
             "mensagem": "A API retornou 0 registros.",
             "parametros": params
         }
 
-    inseridos = 0
-    atualizados = 0
-
-    for item in itens:
-        criado = salvar_licitacao_no_banco(item, db)
-        if criado:
-            inseridos += 1
-        else:
-            atualizados += 1
-
     historico = ColetaHistorico(
         fonte="PNCP_DIRETO",
-        url=r.url,
-        quantidade=len(itens)
+        url=requests.Request("GET", url, params=params).prepare().url,
+        quantidade=total
     )
     db.add(historico)
     db.commit()
 
     return {
         "status": "OK",
-        "coletados": len(itens),
-        "inseridos": inseridos,
-        "atualizados": atualizados,
+        "coletados": total,
+        "inseridos": contagem["inseridos"],
+        "atualizados": contagem["atualizados"],
+        "inalterados": contagem["inalterados"],
         "parametros": params
     }
 
@@ -424,71 +459,41 @@ def coletar_e_salvar_multiplo(
     data_inicial: str = Query(..., description="AAAAMMDD"),
     data_final: str = Query(..., description="AAAAMMDD"),
     codigo_modalidade: int = Query(6),
-    paginas: int = Query(20, ge=1, le=50),
+    paginas: int | None = Query(None, ge=1, description="Limite de páginas (vazio = todas as que o PNCP informar)"),
     tamanho_pagina: int = Query(50, ge=1, le=500),
+    concorrencia: int = Query(4, ge=1, le=16, description="Páginas buscadas ao mesmo tempo"),
+    requisicoes_por_segundo: float = Query(4.0, gt=0, le=20, description="Limite de chamadas ao PNCP nesta coleta"),
+    modalidades: str | None = Query(None, description="Várias de uma vez: \"6,8,9\" ou \"todas\" (substitui codigo_modalidade)"),
+    em_segundo_plano: bool = Query(False, description="Devolve um job_id na hora e coleta em background"),
     db: Session = Depends(get_db)
 ):
     """
-    Coleta várias páginas (ex: 20) de um mesmo período e salva no banco.
-    Usa a MESMA lógica do /coletar_e_salvar, mas automatizando as páginas.
-    """
-    total_inseridos = 0
-    total_atualizados = 0
-    total_paginas_coletadas = 0
-
-    for p in range(1, paginas + 1):
-        url = "https://pncp.gov.br/api/consulta/v1/contratacoes/publicacao"
-        params = {
-            "dataInicial": data_inicial,
-            "dataFinal": data_final,
-            "codigoModalidadeContratacao": codigo_modalidade,
-            "pagina": p,
-            "tamanhoPagina": tamanho_pagina
-        }
-
-        try:
-            r = requests.get(url, params=params, timeout=180)
-            r.raise_for_status()
-            data = r.json()
-            itens = data.get("data", []) or []
-
-            if not itens:
-                break
-
-            for item in itens:
-                criado = salvar_licitacao_no_banco(item, db)
-                if criado:
-                    total_inseridos += 1
-                else:
-                    total_atualizados += 1
-
-            total_paginas_coletadas += 1
-            time.sleep(1)  # pequena pausa entre páginas
-
-        except Exception as e:
-            # 🚨 Em vez de parar tudo, registra falha e segue
-            print(f"⚠ Erro ao coletar página {p}: {e}")
-            continue  # pula para a próxima página
-
-    # Registrar histórico apenas do que deu certo
-    db.add(ColetaHistorico(
-        fonte="PNCP_MULTIPLO",
-        url="interno /coletar_e_salvar_multiplo",
-        quantidade=total_inseridos
-    ))
-    db.commit()
+    Coleta várias páginas de um mesmo período e salva no banco.
+    Usa a MESMA lógica do /coletar_e_salvar, mas automatizando as páginas:
+    a página 1 diz quantas existem (totalPaginas) e as demais são buscadas
+    em paralelo.
+    """
+    try:
+        lista_modalidades = interpretar_modalidades(modalidades, codigo_modalidade)
+    except ValueError as e:
+        raise HTTPException(400, f"modalidades inválidas: {e}")
 
-    return {
-        "status": "OK",
+    parametros = {
         "data_inicial": data_inicial,
         "data_final": data_final,
-        "paginas_processadas": total_paginas_coletadas,
-        "paginas_totais_configuradas": paginas,
-        "inseridos": total_inseridos,
-        "atualizados": total_atualizados,
-        "mensagem": f"Coleta finalizada com {total_paginas_coletadas}/{paginas} páginas processadas com sucesso."
+        "codigo_modalidade": codigo_modalidade,
+        "paginas": paginas,
+        "tamanho_pagina": tamanho_pagina,
+        "concorrencia": concorrencia,
+        "requisicoes_por_segundo": requisicoes_por_segundo,
+        "modalidades": lista_modalidades,
     }
 
+    if em_segundo_plano:
+        return resposta_job_agendado(submeter_job("multiplo", parametros))
+
+    return coletar_multiplo(db, **parametros)
+
 
 # =======================================================
 # 9) COLETAR PERÍODO COMPLETO (DIA POR DIA, PÁGINA POR PÁGINA)
@@ -498,84 +503,98 @@ def coletar_periodo_completo(
     data_inicial: str = Query(..., description="AAAAMMDD"),
     data_final: str = Query(..., description="AAAAMMDD"),
     codigo_modalidade: int = Query(6),
-    paginas_por_dia: int = Query(20, ge=1, le=50),
+    paginas_por_dia: int | None = Query(None, ge=1, description="Limite de páginas por dia (vazio = todas)"),
     tamanho_pagina: int = Query(50, ge=1, le=500),
+    concorrencia: int = Query(4, ge=1, le=16, description="Páginas buscadas ao mesmo tempo"),
+    requisicoes_por_segundo: float = Query(4.0, gt=0, le=20, description="Limite de chamadas ao PNCP nesta coleta"),
+    incremental: bool = Query(False, description="Pula dias já sincronizados e retoma dias pela metade"),
+    dias_reprocessar: int = Query(3, ge=0, le=60, description="No modo incremental, refaz sempre os últimos N dias"),
+    modalidades: str | None = Query(None, description="Várias de uma vez: \"6,8,9\" ou \"todas\" (substitui codigo_modalidade)"),
+    em_segundo_plano: bool = Query(False, description="Devolve um job_id na hora e coleta em background"),
     db: Session = Depends(get_db)
 ):
     """
     Coleta automaticamente um período inteiro (ex: outubro+novembro),
     dia por dia, página por página, e salva tudo no banco.
+    As páginas são buscadas em paralelo; a gravação no banco continua
+    sendo feita por um único escritor.
+    Com incremental=true, só busca o que falta desde a última sincronização.
+    Com modalidades=todas (ou uma lista), todas as modalidades dividem a
+    mesma concorrência e o mesmo limite de taxa numa coleta só.
     """
     try:
-        di = datetime.strptime(data_inicial, "%Y%m%d")
-        df = datetime.strptime(data_final, "%Y%m%d")
+        gerar_dias(data_inicial, data_final)
     except ValueError:
         raise HTTPException(400, "Datas devem estar no formato AAAAMMDD.")
 
-    dia_atual = di
-    total_dias = 0
-    total_paginas = 0
-    total_inseridos = 0
-    total_atualizados = 0
-
-    while dia_atual <= df:
-        data_str = dia_atual.strftime("%Y%m%d")
-
-        for p in range(1, paginas_por_dia + 1):
-            url = "https://pncp.gov.br/api/consulta/v1/contratacoes/publicacao"
-            params = {
-                "dataInicial": data_str,
-                "dataFinal": data_str,
-                "codigoModalidadeContratacao": codigo_modalidade,
-                "pagina": p,
-                "tamanhoPagina": tamanho_pagina
-            }
-
-            try:
-                r = requests.get(url, params=params, timeout=180)
-                r.raise_for_status()
-                data = r.json()
-                itens = data.get("data", []) or []
-
-                if not itens:
-                    break
-
-                for item in itens:
-                    criado = salvar_licitacao_no_banco(item, db)
-                    if criado:
-                        total_inseridos += 1
-                    else:
-                        total_atualizados += 1
-
-                total_paginas += 1
-                time.sleep(1)
-
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Erro no dia {data_str}, página {p}: {e}")
-
-        total_dias += 1
-        dia_atual += timedelta(days=1)
-
-    db.add(ColetaHistorico(
-        fonte="PNCP_PERIODO_COMPLETO",
-        url="interno /coletar_periodo_completo",
-        quantidade=total_inseridos
-    ))
-    db.commit()
+    try:
+        lista_modalidades = interpretar_modalidades(modalidades, codigo_modalidade)
+    except ValueError as e:
+        raise HTTPException(400, f"modalidades inválidas: {e}")
+
+    parametros = {
+        "data_inicial": data_inicial,
+        "data_final": data_final,
+        "codigo_modalidade": codigo_modalidade,
+        "paginas_por_dia": paginas_por_dia,
+        "tamanho_pagina": tamanho_pagina,
+        "concorrencia": concorrencia,
+        "requisicoes_por_segundo": requisicoes_por_segundo,
+        "incremental": incremental,
+        "dias_reprocessar": dias_reprocessar,
+        "modalidades": lista_modalidades,
+    }
+
+    if em_segundo_plano:
+        return resposta_job_agendado(submeter_job("periodo_completo", parametros))
+
+    return coletar_periodo(db, **parametros)
+
+
+# =======================================================
+# 9.1) ESTADO DA SINCRONIZAÇÃO (CHECKPOINTS POR DIA)
+# =======================================================
+@router.get("/licitacoes/sincronizacao")
+def estado_sincronizacao(
+    data_inicial: str = Query(..., description="AAAAMMDD"),
+    data_final: str = Query(..., description="AAAAMMDD"),
+    codigo_modalidade: int = Query(6),
+    db: Session = Depends(get_db)
+):
+    """
+    Mostra, dia a dia, até onde a coleta já chegou no período.
+    """
+    try:
+        dias = gerar_dias(data_inicial, data_final)
+    except ValueError:
+        raise HTTPException(400, "Datas devem estar no formato AAAAMMDD.")
+
+    estados = carregar_estados(db, dias, codigo_modalidade)
+
+    dados = []
+    for data_str in dias:
+        estado = estados.get(data_str)
+        dados.append({
+            "data": data_str,
+            "concluido": bool(estado and estado.concluido),
+            "ultima_pagina": estado.ultima_pagina if estado else 0,
+            "total_paginas": estado.total_paginas if estado else None,
+            "total_registros": estado.total_registros if estado else None,
+            "atualizado_em": estado.atualizado_em.isoformat() if estado and estado.atualizado_em else None,
+        })
 
     return {
-        "status": "OK",
-        "periodo": f"{data_inicial} → {data_final}",
-        "dias_processados": total_dias,
-        "paginas_processadas": total_paginas,
-        "inseridos": total_inseridos,
-        "atualizados": total_atualizados
+        "dias": len(dados),
+        "dias_concluidos": sum(1 for d in dados if d["concluido"]),
+        "dados": dados,
     }
+
+
 # =======================================================
 # 10) INTERESSES (FAVORITOS DE LICITAÇÕES)
 # =======================================================
 
-from models import LicitacaoInteresse  # já existe no seu models
+from models import LicitacaoInteresse, AcompanhamentoTarefa  # já existe no seu models
 
 # ADD FAVORITO
 @router.post("/interesses/adicionar")
@@ -600,6 +619,7 @@ def adicionar_interesse(
         status="interessado"
     )
     db.add(novo)
+    somar_interesses(db, novo.status, 1)
     db.commit()
 
     return {"status": "ok", "mensagem": "Licitação adicionada aos interesses."}
@@ -622,6 +642,7 @@ def remover_interesse(
         raise HTTPException(404, "Interesse não encontrado")
 
     db.delete(interesse)
+    somar_interesses(db, interesse.status, -1)
     db.commit()
 
     return {"status": "ok", "mensagem": "Licitação removida dos interesses."}
@@ -644,33 +665,37 @@ def verificar_interesse(
 
 
 # LISTAR TODOS OS FAVORITOS
+CAMPOS_INTERESSE = {**CAMPOS_LICITACAO, "status": LicitacaoInteresse.status}
+CAMPOS_PADRAO_INTERESSE = ["id", "orgao", "objeto", "municipio", "uf", "data_publicacao", "status"]
+
+
 @router.get("/interesses/listar")
+@orcamento_sql(1)
 def listar_interesses(
+    fields: str | None = Query(None, description="Campos separados por vírgula; json_raw só vem se pedido; * = todos"),
     db: Session = Depends(get_db)
 ):
     EDITORA_FIXA = 1
 
-    interesses = (
-        db.query(LicitacaoInteresse)
+    try:
+        campos = interpretar_campos(fields, CAMPOS_INTERESSE, CAMPOS_PADRAO_INTERESSE)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    # um SELECT só, com apenas as colunas pedidas
+    query = (
+        db.query(*colunas(campos, CAMPOS_INTERESSE))
+        .select_from(LicitacaoInteresse)
+        .join(Licitacao, LicitacaoInteresse.licitacao_id == Licitacao.id)
         .filter(LicitacaoInteresse.editora_id == EDITORA_FIXA)
-        .all()
+        .order_by(LicitacaoInteresse.id)
     )
+    if "orgao" in campos:
+        query = query.outerjoin(Orgao, Licitacao.orgao_id == Orgao.id)
 
-    lista = []
-    for inter in interesses:
-        lic = inter.licitacao
-        if lic:
-            lista.append({
-                "id": lic.id,
-                "orgao": lic.orgao.nome if lic.orgao else None,
-                "objeto": lic.objeto,
-                "municipio": lic.municipio,
-                "uf": lic.uf,
-                "data_publicacao": lic.data_publicacao,
-                "status": inter.status,
-            })
-
-    return {"total": len(lista), "dados": lista}
+    lista = [linha_para_dict(linha, campos) for linha in query.all()]
+
+    return RespostaJson({"total": len(lista), "dados": lista})
 
 
 # =======================================================
@@ -703,6 +728,7 @@ def iniciar_acompanhamento(
         status="interessado"
     )
     db.add(novo)
+    somar_interesses(db, novo.status, 1)
     db.commit()
     db.refresh(novo)
 
@@ -728,6 +754,9 @@ def atualizar_status(
     if not acomp:
         raise HTTPException(404, "Acompanhamento não encontrado.")
 
+    if acomp.status != status:
+        somar_interesses(db, acomp.status, -1)
+        somar_interesses(db, status, 1)
     acomp.status = status
     db.commit()
 
@@ -806,13 +835,15 @@ def remover_tarefa(
 
 
 @router.get("/acompanhamento/tarefas")
+@orcamento_sql(2)
 def listar_tarefas(
     licitacao_id: int,
     db: Session = Depends(get_db)
 ):
     EDITORA_FIXA = 1
 
-    acomp = db.query(LicitacaoInteresse).filter(
+    # tarefas carregadas junto, numa consulta só para todas
+    acomp = db.query(LicitacaoInteresse).options(selectinload(LicitacaoInteresse.tarefas)).filter(
         LicitacaoInteresse.editora_id == EDITORA_FIXA,
         LicitacaoInteresse.licitacao_id == licitacao_id
     ).first()
@@ -0,0 +1,151 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import ContagemLicitacoes, ContagemOrgaos, Orgao
+
+GRANULARIDADES = ("dia", "semana", "mes")
+RECORTES = ("uf", "modalidade", "orgao")
+
+# chave da série que junta as que ficaram fora do limite
+OUTROS = "outros"
+
+
+def ler_dia(valor: str) -> date:
+    """"20250110" ou "2025-01-10" → date. Levanta ValueError se inválido."""
+    return datetime.strptime(valor.replace("-", ""), "%Y%m%d").date()
+
+
+def inicio_do_balde(dia: date, granularidade: str) -> date:
+    """Dia → primeiro dia do seu balde (a própria data, a segunda-feira ou o dia 1)."""
+    if granularidade == "semana":
+        return dia - timedelta(days=dia.weekday())
+    if granularidade == "mes":
+        return dia.replace(day=1)
+    return dia
+
+
+def baldes_do_periodo(inicio: date, fim: date, granularidade: str) -> List[date]:
+    """Todos os baldes entre inicio e fim, inclusive os sem nenhuma licitação."""
+    baldes = []
+    atual = inicio_do_balde(inicio, granularidade)
+    while atual <= fim:
+        baldes.append(atual)
+        if granularidade == "semana":
+            atual += timedelta(days=7)
+        elif granularidade == "mes":
+            atual = (atual.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            atual += timedelta(days=1)
+    return baldes
+
+
+# =======================================================
+# SÉRIE A PARTIR DAS CONTAGENS DIÁRIAS
+# =======================================================
+def montar_serie(
+    db: Session,
+    inicio: date,
+    fim: date,
+    granularidade: str = "dia",
+    por: Optional[str] = None,
+    uf: str = "",
+    modalidade: str = "",
+    max_series: int = 10,
+) -> dict:
+    """
+    Licitações publicadas por dia/semana/mês, numa série só ou uma por
+    UF, modalidade ou órgão. Lê as contagens diárias (contagem_licitacoes
+    / contagem_orgaos, mantidas pela ingestão) e soma semana e mês a
+    partir delas: nada aqui percorre a tabela licitacoes.
+
+    Com `por`, ficam as `max_series` séries de maior total; o resto é
+    somado em "outros".
+    """
+    dia_inicio = inicio.strftime("%Y%m%d")
+    dia_fim = fim.strftime("%Y%m%d")
+
+    if por == "orgao":
+        fatia = ContagemOrgaos.orgao_id
+        query = (
+            db.query(ContagemOrgaos.dia, fatia, Orgao.nome, func.sum(ContagemOrgaos.total))
+            .outerjoin(Orgao, Orgao.id == ContagemOrgaos.orgao_id)
+            .filter(ContagemOrgaos.dia >= dia_inicio, ContagemOrgaos.dia <= dia_fim)
+        )
+        if uf:
+            query = query.filter(Orgao.uf == uf.upper())
+        query = query.group_by(ContagemOrgaos.dia, fatia, Orgao.nome)
+    else:
+        colunas = [ContagemLicitacoes.dia]
+        if por:
+            colunas.append(getattr(ContagemLicitacoes, por))
+        query = (
+            db.query(*colunas, func.sum(ContagemLicitacoes.total))
+            .filter(ContagemLicitacoes.dia >= dia_inicio, ContagemLicitacoes.dia <= dia_fim)
+        )
+        if uf:
+            query = query.filter(ContagemLicitacoes.uf == uf.upper())
+        if modalidade:
+            query = query.filter(ContagemLicitacoes.modalidade == modalidade)
+        query = query.group_by(*colunas)
+
+    # (série → balde → total) e nome de cada série
+    valores: Dict[str, Dict[date, int]] = defaultdict(lambda: defaultdict(int))
+    nomes: Dict[str, Optional[str]] = {}
+    for linha in query.all():
+        dia, total = linha[0], linha[-1]
+        if not total:
+            # faixa que zerou (licitação que mudou de órgão/UF/modalidade):
+            # não vira série
+            continue
+        if por == "orgao":
+            chave = str(linha[1]) if linha[1] else ""
+            nomes[chave] = linha[2]
+        elif por:
+            chave = linha[1] or ""
+            nomes[chave] = chave or None
+        else:
+            chave = "total"
+            nomes[chave] = None
+        valores[chave][inicio_do_balde(ler_dia(dia), granularidade)] += total
+
+    if not por:
+        # sem nada no período: a série única sai zerada, não some
+        valores["total"]
+        nomes.setdefault("total", None)
+
+    baldes = baldes_do_periodo(inicio, fim, granularidade)
+    totais = {chave: sum(por_balde.values()) for chave, por_balde in valores.items()}
+    ordem = sorted(totais, key=lambda chave: (-totais[chave], chave))
+
+    mantidas = ordem[:max_series] if por else ordem
+    series = [
+        {
+            "chave": chave or None,
+            "nome": nomes.get(chave),
+            "total": totais[chave],
+            "valores": [valores[chave].get(balde, 0) for balde in baldes],
+        }
+        for chave in mantidas
+    ]
+
+    restantes = ordem[len(mantidas):]
+    if restantes:
+        series.append({
+            "chave": OUTROS,
+            "nome": f"{len(restantes)} outras",
+            "total": sum(totais[chave] for chave in restantes),
+            "valores": [sum(valores[chave].get(balde, 0) for chave in restantes) for balde in baldes],
+        })
+
+    return {
+        "granularidade": granularidade,
+        "por": por,
+        "inicio": inicio.isoformat(),
+        "fim": fim.isoformat(),
+        "baldes": [balde.isoformat() for balde in baldes],
+        "series": series,
+    }
@@ -0,0 +1,138 @@
+from datetime import timedelta
+from typing import Dict, List
+
+from sqlalchemy.orm import Session
+
+from campos_pncp import agora_pncp
+from models import SincronizacaoPncp
+
+
+# =======================================================
+# ESTADO DA SINCRONIZAÇÃO POR (DIA, MODALIDADE)
+# =======================================================
+def carregar_estados(db: Session, dias: List[str], modalidade: int) -> Dict[str, SincronizacaoPncp]:
+    if not dias:
+        return {}
+
+    estados = (
+        db.query(SincronizacaoPncp)
+        .filter(
+            SincronizacaoPncp.modalidade == modalidade,
+            SincronizacaoPncp.data >= min(dias),
+            SincronizacaoPncp.data <= max(dias),
+        )
+        .all()
+    )
+    return {estado.data: estado for estado in estados}
+
+
+def planejar_inicio(
+    dias: List[str],
+    estados: Dict[str, SincronizacaoPncp],
+    tamanho_pagina: int,
+    incremental: bool,
+    dias_reprocessar: int,
+) -> Dict[str, int]:
+    """
+    Decide por qual página cada dia começa.
+
+    - Modo normal: todos os dias desde a página 1.
+    - Modo incremental: dias já concluídos ficam de fora, dias pela metade
+      continuam da página seguinte à última gravada e os últimos
+      `dias_reprocessar` dias (até hoje) são refeitos inteiros, para pegar
+      as retificações tardias do PNCP.
+    """
+    if not incremental:
+        return {data_str: 1 for data_str in dias}
+
+    # "hoje" no relógio do PNCP (Brasília): em UTC, das 21h à meia-noite
+    # já seria amanhã e a janela sairia um dia adiantada
+    limite_reprocessar = (agora_pncp() - timedelta(days=dias_reprocessar)).strftime("%Y%m%d")
+    inicio = {}
+
+    for data_str in dias:
+        estado = estados.get(data_str)
+
+        if data_str >= limite_reprocessar or not estado or estado.tamanho_pagina != tamanho_pagina:
+            inicio[data_str] = 1
+        elif not estado.concluido:
+            inicio[data_str] = (estado.ultima_pagina or 0) + 1
+
+    return inicio
+
+
+def registrar_pagina(
+    db: Session,
+    estados: Dict[str, SincronizacaoPncp],
+    data_str: str,
+    modalidade: int,
+    pagina: int,
+    tamanho_pagina: int,
+    meta: dict,
+    gravadas: Dict[str, set],
+):
+    """
+    Avança a marca d'água do dia. Deve rodar na MESMA transação que grava
+    as licitações da página, assim checkpoint e dados nunca se desencontram.
+    As páginas chegam fora de ordem (são buscadas em paralelo), então
+    `gravadas` guarda as já gravadas nesta coleta e a marca só anda de
+    forma contígua: se uma página falhou, as seguintes não pulam por cima dela.
+    """
+    estado = estados.get(data_str)
+    if not estado:
+        estado = SincronizacaoPncp(
+            data=data_str,
+            modalidade=modalidade,
+            tamanho_pagina=tamanho_pagina,
+            ultima_pagina=0,
+            concluido=False,
+        )
+        db.add(estado)
+        estados[data_str] = estado
+
+    if pagina == 1 or estado.tamanho_pagina != tamanho_pagina:
+        # dia recomeçado do zero
+        estado.tamanho_pagina = tamanho_pagina
+        estado.ultima_pagina = 0
+        estado.concluido = False
+        gravadas[data_str] = set()
+
+    gravadas.setdefault(data_str, set()).add(pagina)
+    while (estado.ultima_pagina or 0) + 1 in gravadas[data_str]:
+        estado.ultima_pagina = (estado.ultima_pagina or 0) + 1
+
+    if meta.get("totalPaginas") is not None:
+        estado.total_paginas = meta.get("totalPaginas")
+    if meta.get("totalRegistros") is not None:
+        estado.total_registros = meta.get("totalRegistros")
+
+
+def marcar_dia_concluido(
+    db: Session,
+    estados: Dict[str, SincronizacaoPncp],
+    data_str: str,
+    modalidade: int,
+    tamanho_pagina: int,
+    ultima_pagina: int,
+):
+    """
+    `ultima_pagina` é a última página com dados que o PNCP tem para o dia
+    (0 se o dia veio vazio).
+    """
+    estado = estados.get(data_str)
+    if not estado:
+        # dia sem nenhuma licitação
+        estado = SincronizacaoPncp(
+            data=data_str,
+            modalidade=modalidade,
+            tamanho_pagina=tamanho_pagina,
+            ultima_pagina=0,
+            total_paginas=0,
+            total_registros=0,
+        )
+        db.add(estado)
+        estados[data_str] = estado
+
+    # só conclui se nenhuma página do meio ficou para trás
+    if (estado.ultima_pagina or 0) >= ultima_pagina:
+        estado.concluido = True
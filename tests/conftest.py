@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+import pytest
+
+# Banco SQLite descartável: precisa estar no ambiente antes de qualquer
+# import do projeto (database.py lê DATABASE_PUBLIC_URL na importação)
+PASTA_TESTES = tempfile.mkdtemp(prefix="radar-testes-")
+os.environ["DATABASE_PUBLIC_URL"] = "sqlite:///" + os.path.join(PASTA_TESTES, "testes.sqlite")
+
+
+@pytest.fixture(scope="session")
+def app():
+    import main  # cria as tabelas, índices de busca e contagens
+    return main.app
+
+
+@pytest.fixture
+def db(app, tmp_path, monkeypatch):
+    """Sessão num banco vazio; o cache local (pasta relativa) fica em tmp_path."""
+    from database import Base, SessionLocal
+    from cache_dashboard import cache_dashboard
+    from cache_orgaos import cache_orgaos
+
+    monkeypatch.chdir(tmp_path)
+
+    sessao = SessionLocal()
+    for tabela in reversed(Base.metadata.sorted_tables):
+        sessao.execute(tabela.delete())
+    sessao.commit()
+    cache_orgaos.limpar()
+    cache_dashboard.limpar()
+
+    yield sessao
+    sessao.close()
+
+
+@pytest.fixture
+def cliente(app, db):
+    from fastapi.testclient import TestClient
+    return TestClient(app)
@@ -0,0 +1,22 @@
+def item_pncp(i: int, data: str = "20250110", **extra) -> dict:
+    """Item no formato da API de consulta do PNCP."""
+    item = {
+        "numeroControlePNCP": f"6-{data}-{i}",
+        "idCompra": f"6-{data}-{i}",
+        "numeroCompra": str(i),
+        "objetoCompra": f"Aquisição de livros didáticos {i}",
+        "modalidadeLicitacao": 6,
+        "orgaoEntidade": {
+            "razaoSocial": f"Prefeitura {i % 5}",
+            "uf": ["SP", "MG", "RJ"][i % 3],
+            "municipio": f"Cidade {i % 5}",
+            "esferaId": "M",
+        },
+        "dataPublicacaoPncp": f"{data[:4]}-{data[4:6]}-{data[6:]}T10:00:00",
+        "dataAberturaProposta": "2030-01-01T09:00:00",
+        "dataEncerramentoProposta": "2030-02-01T09:00:00",
+        "valorTotalEstimado": 1000 + i,
+        "situacaoCompraNome": "Divulgada no PNCP",
+    }
+    item.update(extra)
+    return item
@@ -0,0 +1,152 @@
+import re
+from contextlib import contextmanager
+
+import pytest
+
+from sqlalchemy.dialects import postgresql
+
+import busca_textual
+from busca_textual import RECURSOS, consulta_ranqueada_postgres, destacar, filtrar_por_busca
+from ingestao import salvar_lote_no_banco
+from models import Licitacao
+
+from tests.itens import item_pncp
+
+OBJETO_MALICIOSO = 'Livros <img src=x onerror="alert(1)"> & <script>alert(2)</script> didáticos'
+
+
+def test_destacar_escapa_o_texto_e_so_marca_os_termos():
+    destaque = destacar(OBJETO_MALICIOSO, ["livro", "script"])
+    assert "<img" not in destaque and "<script>" not in destaque
+    assert destaque.startswith("<mark>Livros</mark> &lt;img src=x onerror=&quot;alert(1)&quot;&gt; &amp; &lt;")
+    assert "&lt;<mark>script</mark>&gt;" in destaque
+    # termo que casaria com a entidade do escape (&amp;) não a quebra
+    assert destacar("A & B", ["amp"]) == "A &amp; B"
+
+
+def test_busca_no_sqlite_devolve_destaque_escapado(cliente, db):
+    salvar_lote_no_banco([item_pncp(1, objetoCompra=OBJETO_MALICIOSO), item_pncp(2)], db)
+    db.commit()
+
+    dados = cliente.get("/licitacoes/buscar", params={"q": "livros"}).json()["dados"]
+    destaques = {linha["id"]: linha["destaque"] for linha in dados}
+    malicioso = next(linha["id"] for linha in dados if linha["objeto"] == OBJETO_MALICIOSO)
+
+    assert "<img" not in destaques[malicioso] and "<script>" not in destaques[malicioso]
+    assert "&lt;script&gt;" in destaques[malicioso]
+    assert "<mark>Livros</mark>" in destaques[malicioso]
+    assert all("\x02" not in d and "\x03" not in d for d in destaques.values())
+
+
+# =======================================================
+# POSTGRES (SEM SERVIDOR: COMPILAÇÃO E SEQUÊNCIA DE DDL)
+# =======================================================
+def test_consultas_do_postgres_compilam(db, monkeypatch):
+    monkeypatch.setitem(RECURSOS, "dialeto", "postgresql")
+    monkeypatch.setitem(RECURSOS, "fts", True)
+    monkeypatch.setitem(RECURSOS, "trigram", True)
+    monkeypatch.setitem(RECURSOS, "config", busca_textual.CONFIG_PT)
+    dialeto = postgresql.dialect()
+
+    ranqueada = str(consulta_ranqueada_postgres(db, ["livros", "didat"]).statement.compile(dialect=dialeto))
+    assert "ts_rank_cd(licitacoes.busca_vetor, to_tsquery(" in ranqueada
+    assert "ts_headline(" in ranqueada
+    assert "licitacoes.busca_vetor @@ to_tsquery(" in ranqueada
+
+    filtrada = str(filtrar_por_busca(db.query(Licitacao.id), "livros").statement.compile(dialect=dialeto))
+    assert "licitacoes.busca_vetor @@ to_tsquery(" in filtrada
+    assert "licitacoes.objeto ILIKE" in filtrada
+
+
+class EngineGravador:
+    """Engine de mentira: guarda cada SQL e responde que nada existe ainda."""
+
+    def __init__(self, falhar_em=(), coluna_existente=None):
+        self.comandos = []
+        self.falhar_em = falhar_em
+        # expressão de um busca_vetor criado numa subida anterior
+        self.coluna_existente = coluna_existente
+
+    @contextmanager
+    def begin(self):
+        yield self
+
+    def execute(self, sql, parametros=None):
+        comando = " ".join(str(sql).split())
+        self.comandos.append(comando)
+        if any(trecho in comando for trecho in self.falhar_em):
+            raise RuntimeError("sem permissão")
+        return self
+
+    def first(self):
+        return None
+
+    def scalar(self):
+        # pg_get_expr: a coluna que já existia ou a que este preparo criou
+        if self.coluna_existente:
+            return self.coluna_existente
+        gerada = next((c for c in self.comandos if "GENERATED ALWAYS AS" in c), "")
+        return gerada[gerada.find("to_tsvector"):] or None
+
+
+def test_preparo_do_postgres_cria_configuracao_coluna_gerada_e_indices(monkeypatch):
+    monkeypatch.setattr(busca_textual, "RECURSOS", dict(RECURSOS))
+    engine = EngineGravador()
+    busca_textual._preparar_postgres(engine)
+
+    comandos = engine.comandos
+    assert comandos[0] == "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+    assert comandos[1] == "CREATE EXTENSION IF NOT EXISTS unaccent"
+    assert comandos[3].startswith("CREATE TEXT SEARCH CONFIGURATION pt_sem_acento (COPY = portuguese);")
+    assert "WITH unaccent, portuguese_stem;" in comandos[3]
+    assert comandos[4] == (
+        "ALTER TABLE licitacoes ADD COLUMN IF NOT EXISTS busca_vetor tsvector GENERATED ALWAYS AS "
+        "(to_tsvector('pt_sem_acento'::regconfig, coalesce(objeto, ''))) STORED"
+    )
+    assert "USING gin (busca_vetor)" in comandos[5]
+    assert "USING gin (objeto gin_trgm_ops)" in comandos[6]
+    recursos = busca_textual.RECURSOS
+    assert (recursos["fts"], recursos["trigram"], recursos["config"]) == (True, True, "pt_sem_acento")
+
+
+def test_preparo_do_postgres_sem_unaccent_usa_portuguese(monkeypatch):
+    monkeypatch.setattr(busca_textual, "RECURSOS", dict(RECURSOS))
+    engine = EngineGravador(falhar_em=("unaccent",))
+    busca_textual._preparar_postgres(engine)
+
+    assert not any("TEXT SEARCH CONFIGURATION" in comando for comando in engine.comandos)
+    assert "to_tsvector('portuguese'::regconfig" in engine.comandos[2]
+    assert busca_textual.RECURSOS["config"] == "portuguese"
+
+
+def configs_das_consultas(db) -> set:
+    """Configurações usadas em to_tsquery e ts_headline, como o Postgres as recebe."""
+    compilada = consulta_ranqueada_postgres(db, ["livros"]).statement.compile(dialect=postgresql.dialect())
+    parametros = re.findall(r"(to_tsquery|ts_headline)\(%\((\w+)\)s", str(compilada))
+    assert {funcao for funcao, _ in parametros} == {"to_tsquery", "ts_headline"}
+    return {compilada.params[nome] for _, nome in parametros}
+
+
+def config_do_vetor(engine) -> str:
+    ddl = next(c for c in engine.comandos if "GENERATED ALWAYS AS" in c)
+    return re.search(r"to_tsvector\('([^']+)'::regconfig", ddl).group(1)
+
+
+@pytest.mark.parametrize("falhar_em", [(), ("unaccent",)])
+def test_consultas_usam_a_configuracao_da_coluna(db, monkeypatch, falhar_em):
+    monkeypatch.setattr(busca_textual, "RECURSOS", dict(RECURSOS, dialeto="postgresql"))
+    engine = EngineGravador(falhar_em=falhar_em)
+    busca_textual._preparar_postgres(engine)
+
+    assert configs_das_consultas(db) == {config_do_vetor(engine)}
+
+
+def test_coluna_de_subida_anterior_manda_na_configuracao(db, monkeypatch):
+    # criada quando ainda não havia unaccent; agora há, mas a coluna não muda
+    monkeypatch.setattr(busca_textual, "RECURSOS", dict(RECURSOS, dialeto="postgresql"))
+    engine = EngineGravador(coluna_existente="to_tsvector('portuguese'::regconfig, COALESCE(objeto, ''::text))")
+    busca_textual._preparar_postgres(engine)
+
+    assert config_do_vetor(engine) == "pt_sem_acento"  # o DDL pedido, que não teve efeito
+    assert busca_textual.RECURSOS["config"] == "portuguese"
+    assert configs_das_consultas(db) == {"portuguese"}
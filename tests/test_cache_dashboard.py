@@ -0,0 +1,59 @@
+from sqlalchemy import update
+
+import cache_dashboard
+from cache_dashboard import cache_dashboard as cache, marcar_alteracao
+from database import SessionLocal
+from models import VersaoDados
+
+ROTA = "/dashboard/status_acompanhamentos"
+
+
+def versao_no_banco(db) -> int:
+    db.expire_all()
+    return db.query(VersaoDados.versao).filter(VersaoDados.id == 1).scalar() or 0
+
+
+def test_commit_marcado_sobe_a_versao_no_banco(db):
+    marcar_alteracao(db)
+    db.commit()
+    marcar_alteracao(db)
+    db.commit()
+    assert versao_no_banco(db) == 2
+    assert cache.versao >= 2
+
+    # sem marca, ou desfeito: nada muda
+    db.commit()
+    marcar_alteracao(db)
+    db.rollback()
+    assert versao_no_banco(db) == 2
+
+
+def test_escrita_de_outro_processo_invalida_o_cache(db, cliente, monkeypatch):
+    monkeypatch.setattr(cache, "checagem", 0)
+    marcar_alteracao(db)
+    db.commit()
+
+    assert cliente.get(ROTA).headers["X-Consultas-SQL"] == "1"
+    assert cliente.get(ROTA).headers["X-Consultas-SQL"] == "0"
+
+    # outro processo sobe a versão direto no banco: a versão local não muda
+    versao_local = cache.versao
+    with SessionLocal() as outra:
+        outra.execute(update(VersaoDados).values(versao=VersaoDados.versao + 1))
+        outra.commit()
+    assert cache.versao == versao_local
+
+    assert cliente.get(ROTA).headers["X-Consultas-SQL"] == "1"
+    assert cliente.get(ROTA).headers["X-Consultas-SQL"] == "0"
+
+
+def test_versao_relida_no_maximo_a_cada_checagem(db, monkeypatch):
+    leituras = []
+    original = cache._ler_versao_do_banco
+    monkeypatch.setattr(cache, "_ler_versao_do_banco", lambda: leituras.append(1) or original())
+    monkeypatch.setattr(cache, "checagem", 60)
+
+    for _ in range(5):
+        cache.versao_atual()
+    assert len(leituras) == 1
+    assert cache_dashboard.cache_dashboard.estatisticas()["atraso_maximo_outros_processos_segundos"] == 60
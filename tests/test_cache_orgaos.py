@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy import func, text
+from sqlalchemy.exc import IntegrityError
+
+from cache_orgaos import CacheOrgaos
+from contagens import recalcular_contagens
+from database import engine
+from migracoes import aplicar_migracoes
+from models import ContagemOrgaos, Licitacao, Orgao
+
+
+def contar_orgaos(db):
+    db.expire_all()
+    return db.query(func.count(Orgao.id)).scalar()
+
+
+def test_indice_unico_trata_null_e_vazio_como_iguais(db):
+    db.add(Orgao(nome="Prefeitura", uf=None, municipio=None))
+    db.commit()
+    db.add(Orgao(nome="Prefeitura", uf="", municipio=""))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+
+def test_orgao_criado_por_outro_processo_no_meio_tempo(db, monkeypatch):
+    cache = CacheOrgaos()
+    cache.aquecido = True  # aquecido antes do outro processo criar o órgão
+    chave = ("Secretaria de Educação", "SP", "Campinas")
+
+    # o outro processo criou o órgão depois da nossa primeira leitura
+    outro = Orgao(nome=chave[0], uf=chave[1], municipio=chave[2])
+    db.add(outro)
+    db.commit()
+    buscar = cache._buscar_banco
+    leituras = []
+
+    def buscar_sem_ver_o_outro(conn, chaves):
+        leituras.append(list(chaves))
+        return {} if len(leituras) == 1 else buscar(conn, chaves)
+
+    monkeypatch.setattr(cache, "_buscar_banco", buscar_sem_ver_o_outro)
+
+    assert cache.resolver([chave], db) == {chave: outro.id}
+    assert contar_orgaos(db) == 1
+    assert len(leituras) == 2  # o INSERT não criou nada: releu pela chave
+
+
+def test_chaves_com_null_ou_vazio_viram_o_mesmo_orgao(db):
+    cache = CacheOrgaos()
+    sem_uf, vazio = ("Ministério", None, None), ("Ministério", "", "")
+
+    ids = cache.resolver([sem_uf, vazio], db)
+
+    assert ids[sem_uf] == ids[vazio]
+    assert contar_orgaos(db) == 1
+    assert CacheOrgaos().resolver([vazio], db) == {vazio: ids[sem_uf]}
+
+
+def test_migracao_junta_repetidos_antes_de_criar_o_indice(db):
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX uq_orgaos_chave"))
+
+    orgaos = [Orgao(nome="Prefeitura", uf="MG", municipio="Uberaba") for _ in range(2)]
+    orgaos.append(Orgao(nome="Prefeitura", uf="MG", municipio="Uberaba"))
+    orgaos.append(Orgao(nome="Câmara", uf=None, municipio=None))
+    orgaos.append(Orgao(nome="Câmara", uf="", municipio=""))
+    db.add_all(orgaos)
+    db.flush()
+    for i, orgao in enumerate(orgaos):
+        db.add(Licitacao(id_externo=f"x-{i}", objeto="teste", orgao_id=orgao.id, data_publicacao="2025-01-10"))
+    recalcular_contagens(db)
+    db.commit()
+    mantido_prefeitura, mantido_camara = orgaos[0].id, orgaos[3].id
+
+    aplicar_migracoes(engine)
+
+    assert contar_orgaos(db) == 2
+    por_orgao = dict(db.query(Licitacao.id_externo, Licitacao.orgao_id).all())
+    assert por_orgao == {
+        "x-0": mantido_prefeitura, "x-1": mantido_prefeitura, "x-2": mantido_prefeitura,
+        "x-3": mantido_camara, "x-4": mantido_camara,
+    }
+    # contagens por órgão refeitas com os ids que ficaram
+    assert {o for o, in db.query(ContagemOrgaos.orgao_id)} <= {mantido_prefeitura, mantido_camara}
+    with pytest.raises(IntegrityError):
+        db.add(Orgao(nome="Prefeitura", uf="MG", municipio="Uberaba"))
+        db.commit()
+    db.rollback()
@@ -0,0 +1,72 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from campos_pncp import converter_data, converter_esfera, converter_texto, converter_valor, extrair_campos
+
+from tests.itens import item_pncp
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("2025-01-10", datetime(2025, 1, 10)),
+    ("2025-01-10T10:00:00", datetime(2025, 1, 10, 10, 0)),
+    ("2025-01-10T10:00:00.123", datetime(2025, 1, 10, 10, 0, 0, 123000)),
+    # com fuso: trazido para o horário de Brasília
+    ("2025-01-10T13:00:00Z", datetime(2025, 1, 10, 10, 0)),
+    ("2025-01-10T10:00:00-03:00", datetime(2025, 1, 10, 10, 0)),
+    ("2025-01-11T01:30:00+00:00", datetime(2025, 1, 10, 22, 30)),
+    (datetime(2025, 1, 10, 8, 0), datetime(2025, 1, 10, 8, 0)),
+])
+def test_converter_data(texto, esperado):
+    assert converter_data(texto) == esperado
+
+
+@pytest.mark.parametrize("texto", [None, "", "   ", "10/01/2025", "2025-13-01", "2025-02-30T10:00:00", "amanhã", "2025-01-10T25:00"])
+def test_data_malformada_vira_none(texto):
+    assert converter_data(texto) is None
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    (1000, Decimal("1000")),
+    (1000.1, Decimal("1000.1")),
+    ("2500.75", Decimal("2500.75")),
+    ("1.234,56", Decimal("1234.56")),
+    ("1.234.567,8", Decimal("1234567.8")),
+    ("0,5", Decimal("0.5")),
+    (" 42 ", Decimal("42")),
+])
+def test_converter_valor(valor, esperado):
+    assert converter_valor(valor) == esperado
+
+
+@pytest.mark.parametrize("valor", [None, "", True, False, "R$ mil", "1,2,3", "NaN", "Infinity", "-inf"])
+def test_valor_invalido_vira_none(valor):
+    assert converter_valor(valor) is None
+
+
+def test_esfera_e_texto():
+    assert converter_esfera("M") == "municipal"
+    assert converter_esfera("f") == "federal"
+    assert converter_esfera("Outra") == "outra"
+    assert converter_esfera("") is None
+    assert converter_texto("  Divulgada no PNCP ") == "Divulgada no PNCP"
+    assert converter_texto("   ") is None
+
+
+def test_extrair_campos_do_item():
+    assert extrair_campos(item_pncp(1, data="20250110")) == {
+        "publicado_em": datetime(2025, 1, 10, 10, 0),
+        "abertura_em": datetime(2030, 1, 1, 9, 0),
+        "encerramento_em": datetime(2030, 2, 1, 9, 0),
+        "valor_total_estimado": Decimal("1001"),
+        "esfera": "municipal",
+        "situacao": "Divulgada no PNCP",
+    }
+
+
+@pytest.mark.parametrize("item", [None, {}, {"orgaoEntidade": None}, {"orgaoEntidade": "texto"}, {"orgaoEntidade": {}}])
+def test_caminho_ausente_vira_none(item):
+    campos = extrair_campos(item)
+    assert campos["esfera"] is None
+    assert set(campos.values()) == {None}
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+import requests
+
+import cliente_pncp
+from cliente_pncp import ClientePncp
+
+from tests.itens import item_pncp
+
+
+class RespostaFalsa:
+    """Resposta em stream: o corpo sai em pedaços e pode cair no meio."""
+
+    def __init__(self, corpo: str = "", status_code: int = 200, pedaco: int = 7, cair_depois_de: int = None):
+        self.corpo = corpo
+        self.status_code = status_code
+        self.pedaco = pedaco
+        self.cair_depois_de = cair_depois_de
+        self.encoding = "utf-8"
+        self.fechada = False
+
+    def iter_content(self, chunk_size=None, decode_unicode=False):
+        for inicio in range(0, len(self.corpo), self.pedaco):
+            if self.cair_depois_de is not None and inicio >= self.cair_depois_de:
+                raise requests.exceptions.ChunkedEncodingError("conexão caiu")
+            yield self.corpo[inicio:inicio + self.pedaco]
+
+    def close(self):
+        self.fechada = True
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    monkeypatch.setattr(cliente_pncp, "ESPERA_BASE", 0)
+    return ClientePncp(requisicoes_por_segundo=1000)
+
+
+def responder(monkeypatch, cliente, *respostas):
+    fila = list(respostas)
+    monkeypatch.setattr(cliente, "get", lambda url, params=None, timeout=180, stream=False: fila.pop(0))
+    return fila
+
+
+def pagina(n: int) -> str:
+    return json.dumps({"data": [item_pncp(i) for i in range(n)], "totalPaginas": 3, "totalRegistros": 3 * n})
+
+
+def test_itens_saem_conforme_chegam(monkeypatch, cliente):
+    resposta = RespostaFalsa(pagina(5))
+    responder(monkeypatch, cliente, resposta)
+    meta = {}
+
+    itens = cliente.iterar_itens("url", meta=meta)
+    primeiro = next(itens)
+
+    assert primeiro["numeroCompra"] == "0"
+    assert meta == {}  # o resto da página ainda nem foi lido
+    assert [item["numeroCompra"] for item in itens] == ["1", "2", "3", "4"]
+    assert meta == {"totalPaginas": 3, "totalRegistros": 15}
+    assert resposta.fechada
+
+
+def test_queda_no_meio_recomeca_sem_repetir_itens(monkeypatch, cliente):
+    corpo = pagina(6)
+    metade = corpo.index('"numeroCompra": "3"')
+    responder(monkeypatch, cliente, RespostaFalsa(corpo, cair_depois_de=metade), RespostaFalsa(corpo))
+
+    itens, meta = cliente.get_itens("url")
+
+    assert [item["numeroCompra"] for item in itens] == ["0", "1", "2", "3", "4", "5"]
+    assert meta["totalPaginas"] == 3
+    assert cliente.novas_tentativas == 1
+
+
+def test_queda_em_todas_as_tentativas_propaga(monkeypatch, cliente):
+    corpo = pagina(3)
+    responder(monkeypatch, cliente, *[RespostaFalsa(corpo, cair_depois_de=10) for _ in range(cliente_pncp.MAX_TENTATIVAS)])
+
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        cliente.get_itens("url")
+
+
+def test_204_e_corpo_vazio(monkeypatch, cliente):
+    responder(monkeypatch, cliente, RespostaFalsa(status_code=204), RespostaFalsa(""))
+    assert cliente.get_itens("url") == ([], {})
+    assert cliente.get_itens("url") == ([], {})
+
+
+def test_abandonar_o_iterador_fecha_a_resposta(monkeypatch, cliente):
+    resposta = RespostaFalsa(pagina(5))
+    responder(monkeypatch, cliente, resposta)
+
+    itens = cliente.iterar_itens("url")
+    next(itens)
+    itens.close()
+
+    assert resposta.fechada
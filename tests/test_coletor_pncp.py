@@ -0,0 +1,213 @@
+import threading
+import time
+
+import pytest
+
+import coletor_pncp
+from coletor_pncp import coletar_unidades_concorrente
+
+TAMANHO = 10
+PREGAO = ("20250101", "20250131", 6)
+DISPENSA = ("20250101", "20250131", 8)
+
+
+class PncpFalso:
+    """
+    Substitui buscar_pagina: cada unidade tem `paginas` páginas cheias
+    (a última com `na_ultima` itens), informando ou não totalPaginas.
+    """
+
+    def __init__(self, paginas: dict, na_ultima: int = TAMANHO, com_total: bool = True, falhar: set = ()):
+        self.paginas = paginas
+        self.na_ultima = na_ultima
+        self.com_total = com_total
+        self.falhar = set(falhar)
+        self.chamadas = []
+        self.lock = threading.Lock()
+
+    def __call__(self, unidade, pagina, tamanho_pagina, limitador):
+        with self.lock:
+            self.chamadas.append((unidade, pagina))
+        if (unidade, pagina) in self.falhar:
+            raise ConnectionError(f"falhou a página {pagina}")
+        total = self.paginas[unidade]
+        if pagina > total:
+            return [], {}
+        quantos = self.na_ultima if pagina == total else tamanho_pagina
+        itens = [{"pagina": pagina, "i": i} for i in range(quantos)]
+        meta = {"totalPaginas": total, "totalRegistros": total * tamanho_pagina} if self.com_total else {}
+        return itens, meta
+
+    def paginas_pedidas(self, unidade):
+        return sorted(p for u, p in self.chamadas if u == unidade)
+
+
+@pytest.fixture
+def pncp(monkeypatch):
+    def instalar(*args, **kwargs):
+        falso = PncpFalso(*args, **kwargs)
+        monkeypatch.setattr(coletor_pncp, "buscar_pagina", falso)
+        return falso
+    return instalar
+
+
+def coletar(unidades, **opcoes):
+    recebidas, concluidas = [], []
+    resultado = coletar_unidades_concorrente(
+        unidades,
+        TAMANHO,
+        ao_receber_pagina=lambda unidade, pagina, itens, meta: recebidas.append((unidade, pagina, len(itens))),
+        ao_concluir_unidade=lambda unidade, ultima: concluidas.append((unidade, ultima)),
+        requisicoes_por_segundo=1000,
+        **opcoes,
+    )
+    return resultado, recebidas, concluidas
+
+
+def test_total_da_primeira_pagina_planeja_as_restantes(pncp):
+    falso = pncp({PREGAO: 4, DISPENSA: 2}, na_ultima=3)
+
+    resultado, recebidas, concluidas = coletar({PREGAO: 1, DISPENSA: 1})
+
+    # cada página pedida uma vez só, sem sondar a página depois da última
+    assert falso.paginas_pedidas(PREGAO) == [1, 2, 3, 4]
+    assert falso.paginas_pedidas(DISPENSA) == [1, 2]
+    assert sorted((u, p) for u, p, _ in recebidas) == sorted(
+        [(PREGAO, p) for p in range(1, 5)] + [(DISPENSA, p) for p in range(1, 3)]
+    )
+    assert resultado["paginas_esperadas"] == resultado["paginas_coletadas"] == 6
+    assert resultado["por_modalidade"][6]["paginas_coletadas"] == 4
+    assert resultado["por_modalidade"][8]["paginas_esperadas"] == 2
+    assert sorted(concluidas) == sorted([(PREGAO, 4), (DISPENSA, 2)])
+    assert resultado["erros"] == [] and not resultado["interrompido"]
+
+
+def test_retoma_do_checkpoint(pncp):
+    falso = pncp({PREGAO: 5})
+
+    resultado, _, concluidas = coletar({PREGAO: 3})
+
+    assert falso.paginas_pedidas(PREGAO) == [3, 4, 5]
+    assert resultado["paginas_esperadas"] == 3
+    assert concluidas == [(PREGAO, 5)]
+
+
+def test_sem_total_encadeia_enquanto_vier_cheia(pncp):
+    falso = pncp({PREGAO: 3}, na_ultima=4, com_total=False)
+
+    resultado, recebidas, concluidas = coletar({PREGAO: 1}, concorrencia=2)
+
+    assert falso.paginas_pedidas(PREGAO) == [1, 2, 3]
+    assert [(p, n) for _, p, n in sorted(recebidas)] == [(1, 10), (2, 10), (3, 4)]
+    assert resultado["paginas_esperadas"] == resultado["paginas_coletadas"] == 3
+    assert concluidas == [(PREGAO, 3)]
+
+
+def test_sem_total_e_ultima_cheia_termina_na_pagina_vazia(pncp):
+    falso = pncp({PREGAO: 2}, com_total=False)
+
+    resultado, _, concluidas = coletar({PREGAO: 1})
+
+    assert falso.paginas_pedidas(PREGAO) == [1, 2, 3]
+    assert resultado["paginas_coletadas"] == 2
+    assert concluidas == [(PREGAO, 2)]
+
+
+def test_limite_de_paginas_corta_e_conta_o_resto(pncp):
+    falso = pncp({PREGAO: 5, DISPENSA: 1})
+
+    resultado, _, concluidas = coletar({PREGAO: 1, DISPENSA: 1}, limite_paginas=2)
+
+    assert falso.paginas_pedidas(PREGAO) == [1, 2]
+    assert resultado["paginas_fora_do_limite"] == 3
+    assert resultado["por_modalidade"][6]["paginas_fora_do_limite"] == 3
+    assert resultado["por_modalidade"][8]["paginas_fora_do_limite"] == 0
+    # cortada não conta como concluída; a que coube inteira, sim
+    assert concluidas == [(DISPENSA, 1)]
+
+
+def test_limite_sem_total(pncp):
+    falso = pncp({PREGAO: 9}, com_total=False)
+
+    resultado, _, concluidas = coletar({PREGAO: 1}, limite_paginas=2)
+
+    assert falso.paginas_pedidas(PREGAO) == [1, 2]
+    assert resultado["paginas_coletadas"] == 2
+    assert concluidas == []
+
+
+def test_deve_parar_cancela_o_que_nao_foi_agendado(pncp):
+    falso = pncp({PREGAO: 50})
+
+    resultado, recebidas, concluidas = coletar({PREGAO: 1}, concorrencia=1, deve_parar=lambda: True)
+
+    assert resultado["interrompido"]
+    assert falso.paginas_pedidas(PREGAO) == [1]
+    assert [p for _, p, _ in recebidas] == [1]
+    assert concluidas == []
+
+
+def test_deve_parar_no_meio_sem_total_nao_encadeia_mais(pncp):
+    falso = pncp({PREGAO: 50}, com_total=False)
+    chamadas = []
+
+    def deve_parar():
+        chamadas.append(1)
+        return len(chamadas) >= 3
+
+    resultado, recebidas, concluidas = coletar({PREGAO: 1}, deve_parar=deve_parar)
+
+    assert resultado["interrompido"]
+    assert falso.paginas_pedidas(PREGAO) == [1, 2, 3]
+    assert [p for _, p, _ in recebidas] == [1, 2, 3]
+    assert concluidas == []
+
+
+def test_deve_parar_no_meio_descarta_as_paginas_na_fila(pncp, monkeypatch):
+    falso = pncp({PREGAO: 50})
+    buscar = coletor_pncp.buscar_pagina
+
+    def devagar(unidade, pagina, tamanho_pagina, limitador):
+        if pagina > 1:
+            time.sleep(0.01)
+        return buscar(unidade, pagina, tamanho_pagina, limitador)
+
+    monkeypatch.setattr(coletor_pncp, "buscar_pagina", devagar)
+
+    resultado, recebidas, concluidas = coletar({PREGAO: 1}, concorrencia=1, deve_parar=lambda: len(falso.chamadas) > 2)
+
+    assert resultado["interrompido"]
+    assert len(falso.chamadas) < 10
+    assert len(recebidas) < 10
+    assert concluidas == []
+
+
+def test_pagina_com_erro_avisa_e_a_coleta_continua(pncp):
+    pncp({PREGAO: 4}, falhar={(PREGAO, 2)})
+    avisos = []
+
+    resultado, recebidas, concluidas = coletar({PREGAO: 1}, ao_falhar=avisos.append)
+
+    assert sorted(p for _, p, _ in recebidas) == [1, 3, 4]
+    assert [(e["modalidade"], e["pagina"]) for e in resultado["erros"]] == [(6, 2)]
+    assert avisos == resultado["erros"]
+    assert "falhou a página 2" in avisos[0]["erro"]
+    assert resultado["por_modalidade"][6]["paginas_com_erro"] == 1
+    # unidade com falha não é marcada como concluída
+    assert concluidas == []
+
+
+def test_erro_ao_gravar_vira_erro_da_pagina(pncp):
+    pncp({PREGAO: 2})
+    avisos = []
+
+    def ao_receber(unidade, pagina, itens, meta):
+        if pagina == 2:
+            raise RuntimeError("banco fora")
+
+    resultado = coletar_unidades_concorrente(
+        {PREGAO: 1}, TAMANHO, ao_receber_pagina=ao_receber, ao_falhar=avisos.append, requisicoes_por_segundo=1000,
+    )
+
+    assert resultado["paginas_coletadas"] == 1
+    assert [e["pagina"] for e in avisos] == [2]
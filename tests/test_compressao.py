@@ -0,0 +1,18 @@
+from ingestao import salvar_lote_no_banco
+
+from tests.itens import item_pncp
+
+
+def test_resposta_grande_sai_em_gzip_e_pequena_nao(cliente, db):
+    salvar_lote_no_banco([item_pncp(i) for i in range(30)], db)
+    db.commit()
+
+    grande = cliente.get("/licitacoes/listar_banco", headers={"Accept-Encoding": "gzip"})
+    assert grande.headers["content-encoding"] == "gzip"
+    assert len(grande.json()["dados"]) == 30
+
+    pequena = cliente.get("/", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in pequena.headers
+
+    sem_gzip = cliente.get("/licitacoes/listar_banco", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in sem_gzip.headers
@@ -0,0 +1,88 @@
+from datetime import datetime
+
+import pytest
+
+import routes_dashboard
+from contagens import somar_interesses
+from ingestao import salvar_lote_no_banco
+
+from tests.itens import item_pncp
+
+AGORA = datetime(2025, 3, 10, 12, 0)
+
+
+@pytest.fixture
+def agora_fixo(monkeypatch):
+    monkeypatch.setattr(routes_dashboard, "agora_pncp", lambda: AGORA)
+    return AGORA
+
+
+def publicadas(db, *instantes):
+    itens = [
+        item_pncp(i, data=instante[:10].replace("-", ""), dataPublicacaoPncp=instante)
+        for i, instante in enumerate(instantes)
+    ]
+    salvar_lote_no_banco(itens, db)
+    db.commit()
+
+
+def test_janelas_do_resumo_param_em_agora(cliente, db, agora_fixo):
+    publicadas(
+        db,
+        "2025-03-10T11:00:00",  # hoje, antes de agora: 24h e 7 dias
+        "2025-03-10T13:00:00",  # hoje, depois de agora: nenhuma
+        "2025-03-09T13:00:00",  # ontem, dentro das 24h
+        "2025-03-09T11:00:00",  # ontem, antes das 24h: só 7 dias
+        "2025-03-05T10:00:00",  # dia inteiro no meio da janela de 7 dias
+        "2025-03-03T13:00:00",  # primeiro dia da janela, depois do início
+        "2025-03-03T11:00:00",  # primeiro dia, antes do início: nenhuma
+        "2025-03-11T10:00:00",  # amanhã (erro na origem): nenhuma
+        "2025-04-20T10:00:00",  # mês que vem: nenhuma
+    )
+
+    resumo = cliente.get("/dashboard/resumo").json()
+
+    assert resumo["total_licitacoes"] == 9
+    assert resumo["novas_24h"] == 2
+    assert resumo["novas_7dias"] == 5
+
+
+def test_completo_igual_as_rotas_separadas(cliente, db, agora_fixo):
+    publicadas(
+        db,
+        "2025-03-10T11:00:00",
+        "2025-03-09T13:00:00",
+        "2025-03-05T10:00:00",
+        "2025-02-01T10:00:00",
+        "2025-03-10T13:00:00",  # depois de agora
+    )
+    somar_interesses(db, "interessado", 2)
+    somar_interesses(db, "proposta_enviada", 1)
+    db.commit()
+
+    completo = cliente.get("/dashboard/completo")
+    assert completo.status_code == 200
+    # uma consulta por parte (as comuns aos widgets rodam uma vez só)
+    assert completo.headers["X-Consultas-SQL"] == "5"
+
+    separadas = {
+        widget: cliente.get(f"/dashboard/{widget}").json()
+        for widget in ("resumo", "estatisticas_uf", "status_acompanhamentos", "proximos_prazos", "oportunidades_recentes")
+    }
+    assert completo.json() == separadas
+    assert separadas["status_acompanhamentos"] == {"interessado": 2, "proposta_enviada": 1}
+    assert separadas["proximos_prazos"]["proximos_prazos"]
+    assert separadas["oportunidades_recentes"]
+
+
+def test_completo_so_com_os_widgets_pedidos(cliente, db, agora_fixo):
+    publicadas(db, "2025-03-10T11:00:00")
+
+    resposta = cliente.get("/dashboard/completo", params={"widgets": "estatisticas_uf,resumo"})
+    assert list(resposta.json()) == ["estatisticas_uf", "resumo"]
+    # por_uf é comum aos dois: 3 consultas, não 4
+    assert resposta.headers["X-Consultas-SQL"] == "3"
+
+    resposta = cliente.get("/dashboard/completo", params={"widgets": "resumo,grafico"})
+    assert resposta.status_code == 400
+    assert "grafico" in resposta.json()["detail"]
@@ -0,0 +1,56 @@
+from cache_local import CacheLocal
+from indice_cache import IndiceCache
+
+from tests.itens import item_pncp
+
+
+def montar_indice(tmp_path) -> IndiceCache:
+    cache = CacheLocal(diretorio=str(tmp_path / "cache"))
+    cache.anexar([
+        item_pncp(1, objetoCompra="Aquisição de livros didáticos"),
+        item_pncp(2, objetoCompra="Compra de LIVRO paradidático"),
+        item_pncp(3, objetoCompra="Serviço de limpeza"),
+        item_pncp(4, objetoCompra="Licitação para merenda escolar"),
+    ])
+    return IndiceCache(cache)
+
+
+def numeros(itens):
+    return sorted(int(item["numeroCompra"]) for item in itens)
+
+
+def test_busca_por_prefixo_sem_acento(tmp_path):
+    indice = montar_indice(tmp_path)
+    assert numeros(indice.filtrar(busca="livro")) == [1, 2]
+    assert numeros(indice.filtrar(busca="livros didat")) == [1]
+    assert numeros(indice.filtrar(busca="licitacao")) == [4]
+    assert numeros(indice.filtrar(busca="livro", uf="MG")) == [1]
+
+
+def test_pedaco_do_meio_da_palavra_so_com_trecho(tmp_path):
+    indice = montar_indice(tmp_path)
+    assert numeros(indice.filtrar(busca="didatico")) == [1]
+    assert numeros(indice.filtrar(busca="didatico", trecho=True)) == [1, 2]
+    assert numeros(indice.filtrar(busca="ivro", trecho=True)) == [1, 2]
+    assert indice.filtrar(busca="ivro") == []
+
+
+def test_vocabulario_ordenado_acompanha_o_indice(tmp_path):
+    indice = montar_indice(tmp_path)
+    dados = indice.atualizar()
+    assert dados.tokens_ordenados == sorted(dados.por_token)
+
+
+def test_varios_termos_em_qualquer_ordem_e_sem_acento(tmp_path):
+    indice = montar_indice(tmp_path)
+    assert numeros(indice.filtrar(busca="livro didatico")) == [1]
+    assert numeros(indice.filtrar(busca="didaticos livros")) == [1]
+    assert numeros(indice.filtrar(busca="DIDÁTICOS, Aquisição")) == [1]
+    assert numeros(indice.filtrar(busca="merenda licit")) == [4]
+    assert indice.filtrar(busca="livro limpeza") == []
+
+
+def test_trecho_confere_a_busca_inteira(tmp_path):
+    indice = montar_indice(tmp_path)
+    assert numeros(indice.filtrar(busca="livros didat", trecho=True)) == [1]
+    assert indice.filtrar(busca="didaticos livros", trecho=True) == []
@@ -0,0 +1,98 @@
+import threading
+from collections import Counter
+
+from sqlalchemy import func
+
+from cache_orgaos import cache_orgaos
+from contagens import recalcular_contagens
+from database import SessionLocal
+from ingestao import salvar_lote_no_banco
+from models import ContagemLicitacoes, ContagemOrgaos, Licitacao
+
+from tests.itens import item_pncp
+
+
+def contagens(db):
+    por_uf = Counter({
+        (dia, uf, modalidade): total
+        for dia, uf, modalidade, total in db.query(
+            ContagemLicitacoes.dia, ContagemLicitacoes.uf, ContagemLicitacoes.modalidade, ContagemLicitacoes.total
+        )
+        if total
+    })
+    por_orgao = Counter({
+        (dia, orgao_id): total
+        for dia, orgao_id, total in db.query(ContagemOrgaos.dia, ContagemOrgaos.orgao_id, ContagemOrgaos.total)
+        if total
+    })
+    return por_uf, por_orgao
+
+
+def contagens_recalculadas(db):
+    recalcular_contagens(db)
+    db.flush()
+    resultado = contagens(db)
+    db.rollback()
+    return resultado
+
+
+def test_insere_atualiza_e_ignora_iguais(db):
+    itens = [item_pncp(i) for i in range(12)]
+    assert salvar_lote_no_banco(itens, db) == {"inseridos": 12, "atualizados": 0, "inalterados": 0}
+    db.commit()
+
+    # 3 mudam de UF e de dia, o resto vem igual
+    for item in itens[:3]:
+        item["orgaoEntidade"] = {**item["orgaoEntidade"], "uf": "BA"}
+        item["dataPublicacaoPncp"] = "2025-02-01T08:00:00"
+    assert salvar_lote_no_banco(itens, db) == {"inseridos": 0, "atualizados": 3, "inalterados": 9}
+    db.commit()
+
+    assert db.query(func.count(Licitacao.id)).scalar() == 12
+    assert contagens(db) == contagens_recalculadas(db)
+
+
+def test_mesmo_item_repetido_no_lote_vale_a_ultima_versao(db):
+    itens = [item_pncp(1), item_pncp(1, objetoCompra="versão final")]
+    assert salvar_lote_no_banco(itens, db)["inseridos"] == 1
+    db.commit()
+    assert db.query(Licitacao.objeto).scalar() == "versão final"
+
+
+def test_duas_coletas_gravando_o_mesmo_item_contam_uma_vez(db):
+    # As duas passam pelo filtro de hash antes de qualquer uma gravar; a
+    # segunda espera a trava de escrita e encontra a linha da primeira
+    # (o encontro é na resolução dos órgãos, logo depois do filtro)
+    novos = [item_pncp(i) for i in range(5)]
+    barreira = threading.Barrier(2)
+    resultados = []
+
+    resolver_original = cache_orgaos.resolver
+
+    def resolver_sincronizado(chaves, sessao):
+        barreira.wait(timeout=10)
+        return resolver_original(chaves, sessao)
+
+    def coletar():
+        sessao = SessionLocal()
+        try:
+            resultados.append(salvar_lote_no_banco(novos, sessao))
+            sessao.commit()
+        finally:
+            sessao.close()
+
+    cache_orgaos.resolver = resolver_sincronizado
+    try:
+        threads = [threading.Thread(target=coletar) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        del cache_orgaos.resolver
+
+    assert sorted(r["inseridos"] for r in resultados) == [0, 5]
+    assert sum(r["inalterados"] for r in resultados) == 5
+    assert db.query(func.count(Licitacao.id)).scalar() == 5
+    assert sum(contagens(db)[0].values()) == 5
+    assert contagens(db) == contagens_recalculadas(db)
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import jobs_coleta
+from models import ColetaJob
+
+
+@pytest.fixture
+def agendados(monkeypatch):
+    """Captura o que seria entregue ao executor, sem rodar em segundo plano."""
+    ids = []
+    monkeypatch.setattr(jobs_coleta, "_agendar", ids.append)
+    return ids
+
+
+def criar_job(db, **campos) -> int:
+    job = ColetaJob(tipo="multiplo", parametros={}, **campos)
+    db.add(job)
+    db.commit()
+    return job.id
+
+
+def test_job_abandonado_volta_para_a_fila_e_recomeca_zerado(db, agendados, monkeypatch):
+    antigo = datetime.utcnow() - timedelta(seconds=jobs_coleta.PRAZO_BATIMENTO + 60)
+    job_id = criar_job(
+        db,
+        status="executando",
+        dono="outro-host:1:abc",
+        iniciado_em=antigo,
+        batimento_em=antigo,
+        paginas_concluidas=5,
+        inseridos=100,
+        atualizados=7,
+        inalterados=3,
+        erros=[{"pagina": 4, "erro": "timeout"}],
+    )
+
+    assert jobs_coleta.retomar_jobs_pendentes() == 1
+    assert agendados == [job_id]
+
+    def coleta_de_uma_pagina(db_job, progresso, **params):
+        progresso.pagina_concluida({"inseridos": 23})
+        return {"status": "ok"}
+
+    monkeypatch.setitem(jobs_coleta.TIPOS_JOB, "multiplo", coleta_de_uma_pagina)
+    jobs_coleta._executar_job(job_id)
+
+    db.expire_all()
+    job = db.get(ColetaJob, job_id)
+    assert job.status == "concluido"
+    assert job.dono == jobs_coleta.ID_PROCESSO
+    assert (job.paginas_concluidas, job.inseridos, job.atualizados, job.inalterados) == (1, 23, 0, 0)
+    assert job.erros == []
+
+
+def test_job_de_outro_worker_vivo_nao_e_retomado(db, agendados):
+    job_id = criar_job(
+        db,
+        status="executando",
+        dono="outro-host:2:def",
+        iniciado_em=datetime.utcnow() - timedelta(hours=3),
+        batimento_em=datetime.utcnow(),
+    )
+
+    assert jobs_coleta.retomar_jobs_pendentes() == 0
+    assert agendados == []
+    db.expire_all()
+    assert db.get(ColetaJob, job_id).status == "executando"
+
+
+def test_execucao_para_quando_outro_processo_retoma_o_job(db, monkeypatch):
+    job_id = criar_job(db, status="pendente")
+
+    def coleta_retomada_no_meio(db_job, progresso, **params):
+        # outro worker reservou o job depois que este ficou sem batimento
+        db.query(ColetaJob).filter(ColetaJob.id == job_id).update({"dono": "outro-host:3:ghi"})
+        db.commit()
+        assert progresso.deve_parar()
+        return {"status": "ok"}
+
+    monkeypatch.setitem(jobs_coleta.TIPOS_JOB, "multiplo", coleta_retomada_no_meio)
+    jobs_coleta._executar_job(job_id)
+
+    db.expire_all()
+    job = db.get(ColetaJob, job_id)
+    assert job.status == "executando"
+    assert job.dono == "outro-host:3:ghi"
+
+
+def test_job_pendente_so_e_reservado_uma_vez(db):
+    job_id = criar_job(db, status="pendente")
+    assert jobs_coleta._reservar_job(db, job_id)
+    assert not jobs_coleta._reservar_job(db, job_id)
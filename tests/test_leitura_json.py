@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from leitura_json import LeitorJson, em_lotes
+
+
+def em_pedacos(texto: str, tamanho: int):
+    return (texto[i:i + tamanho] for i in range(0, len(texto), tamanho))
+
+
+PAGINA = {
+    "data": [
+        {"id": 1, "objeto": 'Livros "didáticos" [volume 1]', "valor": 1234.5},
+        {"id": 2, "objeto": "barra \\ e chave } no texto, e ]", "itens": [1, [2, 3], {"a": "]"}]},
+        {"id": 3, "objeto": "Aquisição", "valor": 100000000},
+    ],
+    "totalRegistros": 3,
+    "totalPaginas": 1,
+}
+
+
+@pytest.mark.parametrize("tamanho", [1, 2, 3, 7, 64, 10_000])
+def test_itens_iguais_ao_json_load_em_qualquer_corte(tamanho):
+    texto = json.dumps(PAGINA, ensure_ascii=False, indent=1)
+    meta = {}
+
+    itens = list(LeitorJson(em_pedacos(texto, tamanho)).iterar_array_da_chave("data", meta))
+
+    assert itens == PAGINA["data"]
+    assert meta == {"totalRegistros": 3, "totalPaginas": 1}
+
+
+def test_numero_cortado_no_fim_do_bloco_nao_e_truncado():
+    assert list(LeitorJson(["[12", "34", "5, 6", "7]"]).iterar_array()) == [12345, 67]
+
+
+def test_chaves_do_topo_antes_e_depois_do_array():
+    meta = {}
+    texto = '{"totalPaginas": 4, "data": [{"id": 1}], "vazio": false}'
+    assert list(LeitorJson(em_pedacos(texto, 5)).iterar_array_da_chave("data", meta)) == [{"id": 1}]
+    assert meta == {"totalPaginas": 4, "vazio": False}
+
+
+def test_corpo_cortado_no_meio_levanta_erro():
+    texto = json.dumps(PAGINA)
+    cortado = texto[: len(texto) // 2]
+    with pytest.raises(ValueError):
+        list(LeitorJson(em_pedacos(cortado, 16)).iterar_array_da_chave("data"))
+
+
+def test_vazio_e_array_vazio():
+    assert LeitorJson(["", "  \n"]).vazio()
+    assert list(LeitorJson(["{", '"data": [ ]', "}"]).iterar_array_da_chave("data")) == []
+
+
+def test_em_lotes():
+    assert list(em_lotes(iter(range(5)), 2)) == [[0, 1], [2, 3], [4]]
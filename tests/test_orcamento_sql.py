@@ -0,0 +1,83 @@
+import pytest
+
+from ingestao import salvar_lote_no_banco
+
+from tests.itens import item_pncp
+
+# Parâmetros de cada rota com @orcamento_sql que tocam o caminho mais
+# caro (filtros, busca, itens relacionados). Rota nova com orçamento
+# precisa entrar aqui: test_todas_as_rotas_com_orcamento_estao_cobertas.
+CHAMADAS = {
+    "/licitacoes/listar_banco": [{}, {"limite": 5}, {"fields": "*"}, {"busca": "livros", "uf": "SP"}],
+    "/licitacoes/buscar": [{"q": "livros"}],
+    "/interesses/listar": [{}],
+    "/acompanhamento/tarefas": [{"licitacao_id": 3}],
+    "/dashboard/resumo": [{}],
+    "/dashboard/estatisticas_uf": [{}],
+    "/dashboard/status_acompanhamentos": [{}],
+    "/dashboard/proximos_prazos": [{}, {"uf": "SP", "editora_id": 1}],
+    "/dashboard/oportunidades_recentes": [{}],
+    "/dashboard/serie_temporal": [{}, {"por": "orgao", "granularidade": "mes"}],
+    "/dashboard/completo": [{}, {"widgets": "resumo,proximos_prazos"}],
+}
+
+
+def rotas_com_orcamento(app):
+    # direto dos routers que o main.py inclui (caminhos já com o prefixo)
+    import main
+    routers = [main.api_router, main.editoras_router, main.licitacoes_router,
+               main.dashboard_router, main.notificacoes_router, main.coletas_router]
+    return {
+        rota.path: rota.endpoint.orcamento_sql
+        for router in routers
+        for rota in router.routes
+        if hasattr(getattr(rota, "endpoint", None), "orcamento_sql")
+    }
+
+
+@pytest.fixture
+def banco_populado(cliente, db):
+    # várias linhas por órgão, interesse e tarefa: uma consulta por linha
+    # (N+1) estoura o orçamento já com este volume
+    salvar_lote_no_banco([item_pncp(i, data=f"202501{1 + i % 20:02d}") for i in range(40)], db)
+    db.commit()
+    for licitacao_id in (3, 5, 7, 9):
+        cliente.post("/interesses/adicionar", params={"licitacao_id": licitacao_id})
+    for titulo in ("edital", "documentos", "proposta"):
+        cliente.post("/acompanhamento/tarefas/adicionar", params={"licitacao_id": 3, "titulo": titulo})
+    return cliente
+
+
+def test_todas_as_rotas_com_orcamento_estao_cobertas(app):
+    assert set(rotas_com_orcamento(app)) == set(CHAMADAS)
+
+
+@pytest.mark.parametrize(
+    "caminho, params",
+    [(caminho, params) for caminho, lista in CHAMADAS.items() for params in lista],
+)
+def test_rota_dentro_do_orcamento(app, banco_populado, caminho, params):
+    from cache_dashboard import cache_dashboard
+    cache_dashboard.limpar()  # acerto no cache faria 0 consultas
+
+    resposta = banco_populado.get(caminho, params=params)
+
+    assert resposta.status_code == 200, resposta.text
+    consultas = int(resposta.headers["X-Consultas-SQL"])
+    maximo = rotas_com_orcamento(app)[caminho]
+    assert consultas <= maximo, f"{caminho} {params}: {consultas} consultas SQL (orçamento: {maximo})"
+
+
+def test_stream_ndjson_conta_as_consultas_do_corpo(app, banco_populado, monkeypatch, capsys):
+    import routes_licitacoes
+    capsys.readouterr()
+
+    # as 40 com data e depois as sem data: os dois ramos, depois dos cabeçalhos
+    params = {"formato": "ndjson", "fields": "id"}
+    resposta = banco_populado.get("/licitacoes/listar_banco", params=params)
+    assert len(resposta.text.splitlines()) == 40
+    assert "Orçamento SQL estourado" not in capsys.readouterr().out
+
+    monkeypatch.setattr(routes_licitacoes.listar_licitacoes_banco, "orcamento_sql", 1)
+    banco_populado.get("/licitacoes/listar_banco", params=params)
+    assert "fez 2 consultas SQL (orçamento: 1)" in capsys.readouterr().out
@@ -0,0 +1,103 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from ingestao import salvar_lote_no_banco
+from models import Licitacao
+from paginacao import codificar_cursor, decodificar_cursor
+from routes_licitacoes import ramos_listagem
+
+from tests.itens import item_pncp
+
+LISTAR = "/licitacoes/listar_banco"
+
+
+def salvar_datadas_e_sem_data(db, datadas=23, sem_data=3):
+    itens = [item_pncp(i, data=f"202501{1 + i % 9:02d}") for i in range(datadas)]
+    itens += [item_pncp(100 + i, dataPublicacaoPncp=None) for i in range(sem_data)]
+    salvar_lote_no_banco(itens, db)
+    db.commit()
+
+
+def percorrer(cliente, limite):
+    vistos, consultas = [], []
+    cursor = None
+    while True:
+        params = {"limite": limite, "fields": "id,publicado_em"}
+        if cursor:
+            params["cursor"] = cursor
+        resposta = cliente.get(LISTAR, params=params)
+        consultas.append(int(resposta.headers["X-Consultas-SQL"]))
+        corpo = resposta.json()
+        vistos += [(linha["publicado_em"], linha["id"]) for linha in corpo["dados"]]
+        cursor = corpo["proximo_cursor"]
+        if not cursor:
+            return vistos, consultas
+
+
+def test_cursor_ida_e_volta():
+    instante = datetime(2025, 1, 10, 10, 0)
+    assert decodificar_cursor(codificar_cursor(instante, 42)) == (instante, 42)
+    assert decodificar_cursor(codificar_cursor(None, 7)) == (None, 7)
+
+
+def test_listar_banco_percorre_todas_as_paginas_sem_repetir(cliente, db):
+    salvar_datadas_e_sem_data(db)
+
+    vistos, consultas = percorrer(cliente, 5)
+
+    assert len(vistos) == len(set(vistos)) == 26
+    com_data = [v for v in vistos if v[0]]
+    assert com_data == sorted(com_data, reverse=True)
+    # as sem data vêm no fim, por id decrescente
+    sem_data = vistos[len(com_data):]
+    assert all(data is None for data, _ in sem_data)
+    assert [id_ for _, id_ in sem_data] == sorted((id_ for _, id_ in sem_data), reverse=True)
+    # o ramo sem data só é lido na página em que as com data acabam
+    assert consultas == [1, 1, 1, 1, 2, 1]
+
+
+def test_ndjson_atravessa_os_dois_ramos(cliente, db):
+    salvar_datadas_e_sem_data(db, datadas=4, sem_data=3)
+
+    resposta = cliente.get(LISTAR, params={"formato": "ndjson", "limite": 6, "fields": "id,publicado_em"})
+    linhas = [json.loads(linha) for linha in resposta.text.splitlines()]
+
+    assert len(linhas) == 6
+    assert [linha["publicado_em"] is None for linha in linhas] == [False] * 4 + [True] * 2
+
+
+def test_ramos_usam_comparacao_de_linha_na_ordem_do_indice(db):
+    cursor = codificar_cursor(datetime(2025, 1, 10, 10, 0), 42)
+    com_data, sem_data = ramos_listagem(db, ["id"], {}, cursor)
+
+    sql = str(com_data.statement.compile(dialect=postgresql.dialect()))
+    assert "(licitacoes.publicado_em, licitacoes.id) < (" in sql
+    assert "ORDER BY licitacoes.publicado_em DESC NULLS LAST, licitacoes.id DESC" in sql
+    assert " OR " not in sql
+
+    sql = str(sem_data.statement.compile(dialect=postgresql.dialect()))
+    assert "licitacoes.publicado_em IS NULL" in sql
+    assert "ORDER BY licitacoes.id DESC" in sql
+
+    # cursor já no bloco sem data: só esse ramo
+    assert len(ramos_listagem(db, ["id"], {}, codificar_cursor(None, 7))) == 1
+
+
+def test_indice_da_listagem_no_postgres():
+    indices = [i for i in Licitacao.__table__.indexes if i.name == "ix_licitacoes_listagem"]
+    ddl = [
+        str(CreateIndex(i).compile(dialect=postgresql.dialect()))
+        for i in indices
+        if i._ddl_if.dialect == "postgresql"
+    ]
+    assert ddl == ["CREATE INDEX ix_licitacoes_listagem ON licitacoes (publicado_em DESC NULLS LAST, id DESC)"]
+
+
+def test_cursor_invalido_e_400(cliente):
+    assert cliente.get(LISTAR, params={"cursor": "xx"}).status_code == 400
+    data_em_texto = base64.urlsafe_b64encode(b'["10/01/2025",1]').decode().rstrip("=")
+    assert cliente.get(LISTAR, params={"cursor": data_em_texto}).status_code == 400
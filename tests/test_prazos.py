@@ -0,0 +1,85 @@
+from datetime import datetime
+
+from ingestao import salvar_lote_no_banco
+from models import Editora, Licitacao, LicitacaoInteresse, LicitacaoPrazo
+from routes_dashboard import _proximos_prazos
+
+from tests.itens import item_pncp
+
+AGORA = datetime(2025, 3, 10, 12, 0)
+
+
+def salvar(db, *itens):
+    salvar_lote_no_banco(list(itens), db)
+    db.commit()
+
+
+def prazos_de(db, numero: int) -> dict:
+    licitacao = db.query(Licitacao).filter(Licitacao.id_externo.like(f"%-{numero}")).one()
+    linhas = db.query(LicitacaoPrazo).filter(LicitacaoPrazo.licitacao_id == licitacao.id).all()
+    return {linha.tipo: linha.instante for linha in linhas}
+
+
+def proximos(db, **filtros):
+    resposta = _proximos_prazos(db, AGORA, **filtros)["proximos_prazos"]
+    return [(item["objeto"].rsplit(" ", 1)[1], item["tipo"], item["data"]) for item in resposta]
+
+
+def test_reingestao_troca_os_prazos(db):
+    salvar(db, item_pncp(1))
+    assert prazos_de(db, 1) == {
+        "abertura": datetime(2030, 1, 1, 9, 0),
+        "encerramento": datetime(2030, 2, 1, 9, 0),
+    }
+
+    # encerramento adiado na origem: o prazo antigo sai, não fica duplicado
+    salvar(db, item_pncp(1, dataEncerramentoProposta="2030-03-15T18:00:00"))
+    assert prazos_de(db, 1) == {
+        "abertura": datetime(2030, 1, 1, 9, 0),
+        "encerramento": datetime(2030, 3, 15, 18, 0),
+    }
+
+    # e sem encerramento nenhum, só a abertura fica
+    salvar(db, item_pncp(1, dataEncerramentoProposta=None))
+    assert prazos_de(db, 1) == {"abertura": datetime(2030, 1, 1, 9, 0)}
+    assert db.query(LicitacaoPrazo).count() == 1
+
+
+def test_ordem_mistura_aberturas_e_encerramentos(db):
+    salvar(
+        db,
+        item_pncp(1, dataAberturaProposta="2025-03-12T09:00:00", dataEncerramentoProposta="2025-04-01T09:00:00"),
+        item_pncp(2, dataAberturaProposta="2025-03-15T09:00:00", dataEncerramentoProposta="2025-03-20T09:00:00"),
+        # abertura já passou: só o encerramento conta
+        item_pncp(3, dataAberturaProposta="2025-03-01T09:00:00", dataEncerramentoProposta="2025-03-11T09:00:00"),
+    )
+
+    assert proximos(db) == [
+        ("3", "encerramento", "2025-03-11T09:00:00"),
+        ("1", "abertura", "2025-03-12T09:00:00"),
+        ("2", "abertura", "2025-03-15T09:00:00"),
+        ("2", "encerramento", "2025-03-20T09:00:00"),
+        ("1", "encerramento", "2025-04-01T09:00:00"),
+    ]
+    assert proximos(db, limite=2) == proximos(db)[:2]
+
+
+def test_filtros_de_uf_modalidade_e_editora(db):
+    # item_pncp: UF pela posição (SP, MG, RJ), modalidade 6
+    salvar(db, item_pncp(0), item_pncp(1), item_pncp(2, modalidadeLicitacao=8), item_pncp(3))
+    editora = Editora(nome="Editora", email="editora@exemplo.com", senha_hash="x")
+    db.add(editora)
+    db.flush()
+    acompanhada = db.query(Licitacao).filter(Licitacao.id_externo.like("%-1")).one()
+    db.add(LicitacaoInteresse(editora_id=editora.id, licitacao_id=acompanhada.id))
+    db.commit()
+
+    def numeros(**filtros):
+        return sorted({numero for numero, _, _ in proximos(db, **filtros)})
+
+    assert numeros() == ["0", "1", "2", "3"]
+    assert numeros(uf="sp") == ["0", "3"]
+    assert numeros(modalidade="8") == ["2"]
+    assert numeros(uf="SP", modalidade="8") == []
+    assert numeros(editora_id=editora.id) == ["1"]
+    assert numeros(editora_id=editora.id + 1) == []
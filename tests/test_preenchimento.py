@@ -0,0 +1,70 @@
+from datetime import datetime
+
+from sqlalchemy import update
+
+from campos_pncp import CAMPOS_PNCP
+from cache_dashboard import cache_dashboard
+from database import engine
+from ingestao import salvar_lote_no_banco
+from models import ContagemLicitacoes, Licitacao, LicitacaoPrazo, VersaoDados
+from preenchimento import rodar_preenchimentos
+
+from tests.itens import item_pncp
+
+
+def versao(db):
+    return db.query(VersaoDados.versao).filter(VersaoDados.id == 1).scalar() or 0
+
+
+def gravadas_antes_das_colunas(db, quantas=4):
+    """Licitações como ficavam antes de CAMPOS_PNCP: colunas, prazos e contagens vazios."""
+    salvar_lote_no_banco([item_pncp(i) for i in range(quantas)], db)
+    db.commit()
+    db.execute(update(Licitacao).values({coluna: None for coluna in CAMPOS_PNCP}))
+    db.query(LicitacaoPrazo).delete()
+    db.query(ContagemLicitacoes).delete()
+    db.commit()
+
+
+def test_campos_pncp_refaz_prazos_contagens_e_versao(db):
+    gravadas_antes_das_colunas(db)
+    versao_antes = versao(db)
+
+    rodar_preenchimentos(["campos_pncp"], engine)
+    db.expire_all()
+
+    assert db.query(Licitacao).filter(Licitacao.encerramento_em.is_(None)).count() == 0
+    prazos = db.query(LicitacaoPrazo.tipo, LicitacaoPrazo.instante).all()
+    assert sorted(prazos) == (
+        [("abertura", datetime(2030, 1, 1, 9, 0))] * 4
+        + [("encerramento", datetime(2030, 2, 1, 9, 0))] * 4
+    )
+    assert sum(total for (total,) in db.query(ContagemLicitacoes.total)) == 4
+    assert versao(db) > versao_antes
+
+
+def test_dashboard_em_cache_ve_o_preenchimento(cliente, db, monkeypatch):
+    monkeypatch.setattr(cache_dashboard, "checagem", 0)
+    gravadas_antes_das_colunas(db)
+    assert cliente.get("/dashboard/proximos_prazos").json()["proximos_prazos"] == []
+
+    rodar_preenchimentos(["campos_pncp"], engine)
+
+    # abertura e encerramento de cada uma
+    assert len(cliente.get("/dashboard/proximos_prazos").json()["proximos_prazos"]) == 8
+
+
+def test_sem_linhas_gravadas_nao_roda_os_dependentes(db, monkeypatch):
+    chamados = []
+    monkeypatch.setattr("preenchimento.PREENCHIMENTOS", {
+        "campos_pncp": lambda engine, todas: chamados.append("campos_pncp") or 0,
+        "contagens": lambda engine, todas: chamados.append("contagens") or 1,
+        "prazos": lambda engine, todas: chamados.append("prazos") or 1,
+    })
+
+    rodar_preenchimentos(["campos_pncp"])
+    assert chamados == ["campos_pncp"]
+
+    chamados.clear()
+    rodar_preenchimentos(["prazos", "campos_pncp"])
+    assert chamados == ["campos_pncp", "prazos"]
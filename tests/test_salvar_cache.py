@@ -0,0 +1,63 @@
+from sqlalchemy import func
+
+from cache_local import cache_local
+from ingestao import TAMANHO_LOTE
+from models import ColetaHistorico, Licitacao, Orgao
+
+from tests.itens import item_pncp
+
+
+def test_salvar_no_banco_com_varios_lotes_e_orgaos_novos(cliente, db):
+    total = TAMANHO_LOTE * 2 + 200
+    itens = []
+    for i in range(total):
+        item = item_pncp(i)
+        # cada lote traz órgãos que os anteriores não tinham
+        item["orgaoEntidade"] = {**item["orgaoEntidade"], "razaoSocial": f"Órgão {i // 100}"}
+        itens.append(item)
+    cache_local.anexar(itens)
+
+    resposta = cliente.post("/licitacoes/salvar_no_banco")
+
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json() == {"total_processados": total, "inseridos": total, "atualizados": 0, "inalterados": 0}
+    assert db.query(func.count(Licitacao.id)).scalar() == total
+    orgaos = {(o["razaoSocial"], o["uf"], o["municipio"]) for o in (item["orgaoEntidade"] for item in itens)}
+    assert db.query(func.count(Orgao.id)).scalar() == len(orgaos)
+    assert db.query(func.count(Licitacao.id)).filter(Licitacao.orgao_id.is_(None)).scalar() == 0
+    assert db.query(ColetaHistorico.quantidade).scalar() == total
+
+    # de novo: nada muda
+    assert cliente.post("/licitacoes/salvar_no_banco").json()["inalterados"] == total
+
+
+def test_coletar_e_salvar_grava_em_lotes_conforme_decodifica(cliente, db, monkeypatch):
+    import routes_licitacoes
+
+    eventos = []
+
+    def iterar_itens(url, params=None, meta=None, timeout=180):
+        for i in range(5):
+            eventos.append(("decodificado", i))
+            yield item_pncp(i)
+
+    salvar = routes_licitacoes.salvar_lote_no_banco
+
+    def salvar_lote(lote, sessao):
+        eventos.append(("gravado", len(lote)))
+        return salvar(lote, sessao)
+
+    monkeypatch.setattr(routes_licitacoes.cliente_pncp, "iterar_itens", iterar_itens)
+    monkeypatch.setattr(routes_licitacoes, "salvar_lote_no_banco", salvar_lote)
+    monkeypatch.setattr(routes_licitacoes, "TAMANHO_LOTE", 2)
+
+    corpo = cliente.get("/licitacoes/coletar_e_salvar").json()
+
+    assert corpo["coletados"] == corpo["inseridos"] == 5
+    # cada lote é gravado antes do item seguinte ser decodificado
+    assert eventos == [
+        ("decodificado", 0), ("decodificado", 1), ("gravado", 2),
+        ("decodificado", 2), ("decodificado", 3), ("gravado", 2),
+        ("decodificado", 4), ("gravado", 1),
+    ]
+    assert db.query(func.count(Licitacao.id)).scalar() == 5
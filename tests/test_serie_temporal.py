@@ -0,0 +1,88 @@
+from datetime import date
+
+from ingestao import salvar_lote_no_banco
+from models import ContagemOrgaos
+from serie_temporal import OUTROS, baldes_do_periodo, inicio_do_balde, montar_serie
+
+from tests.itens import item_pncp
+
+
+def salvar(db, *itens):
+    salvar_lote_no_banco(list(itens), db)
+    db.commit()
+
+
+def por_chave(serie):
+    return {s["chave"]: s for s in serie["series"]}
+
+
+def test_semana_comeca_na_segunda_iso():
+    # 2025-01-01 é quarta; a semana dela começa no ano anterior
+    assert inicio_do_balde(date(2025, 1, 1), "semana") == date(2024, 12, 30)
+    assert inicio_do_balde(date(2025, 1, 6), "semana") == date(2025, 1, 6)
+    assert inicio_do_balde(date(2025, 1, 12), "semana") == date(2025, 1, 6)
+    assert baldes_do_periodo(date(2025, 1, 1), date(2025, 1, 13), "semana") == [
+        date(2024, 12, 30), date(2025, 1, 6), date(2025, 1, 13),
+    ]
+
+
+def test_mes_atravessa_fim_de_mes_e_de_ano():
+    assert inicio_do_balde(date(2025, 1, 31), "mes") == date(2025, 1, 1)
+    assert baldes_do_periodo(date(2024, 11, 30), date(2025, 3, 1), "mes") == [
+        date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1),
+    ]
+    # 31 de janeiro + 1 mês não pula fevereiro
+    assert baldes_do_periodo(date(2025, 1, 31), date(2025, 2, 28), "mes") == [date(2025, 1, 1), date(2025, 2, 1)]
+    assert baldes_do_periodo(date(2025, 1, 30), date(2025, 2, 1), "dia") == [
+        date(2025, 1, 30), date(2025, 1, 31), date(2025, 2, 1),
+    ]
+
+
+def test_dias_somados_em_semanas_e_meses(db):
+    dias = ["20250105", "20250106", "20250112", "20250131", "20250201", "20250201"]
+    salvar(db, *(item_pncp(i, data=dia) for i, dia in enumerate(dias)))
+
+    semana = montar_serie(db, date(2025, 1, 5), date(2025, 2, 2), granularidade="semana")
+    assert semana["baldes"] == ["2024-12-30", "2025-01-06", "2025-01-13", "2025-01-20", "2025-01-27"]
+    assert semana["series"] == [{"chave": "total", "nome": None, "total": 6, "valores": [1, 2, 0, 0, 3]}]
+
+    mes = montar_serie(db, date(2025, 1, 5), date(2025, 2, 2), granularidade="mes")
+    assert mes["baldes"] == ["2025-01-01", "2025-02-01"]
+    assert mes["series"][0]["valores"] == [4, 2]
+
+    # o período corta o balde: dias fora dele não entram, mesmo na mesma semana
+    assert montar_serie(db, date(2025, 1, 6), date(2025, 1, 12), granularidade="semana")["series"][0]["valores"] == [2]
+
+
+def test_maiores_series_e_o_resto_em_outros(db):
+    # item_pncp: UF pela posição (SP, MG, RJ) → 4 SP, 3 MG, 3 RJ
+    salvar(db, *(item_pncp(i, data="20250110") for i in range(10)))
+
+    serie = montar_serie(db, date(2025, 1, 10), date(2025, 1, 11), por="uf", max_series=1)
+    assert [(s["chave"], s["total"], s["valores"]) for s in serie["series"]] == [
+        ("SP", 4, [4, 0]),
+        (OUTROS, 6, [6, 0]),
+    ]
+    assert serie["series"][1]["nome"] == "2 outras"
+
+    # empate no total: ordem pela chave
+    serie = montar_serie(db, date(2025, 1, 10), date(2025, 1, 10), por="uf", max_series=2)
+    assert [s["chave"] for s in serie["series"]] == ["SP", "MG", OUTROS]
+
+    # cabendo todas, não há "outros"
+    serie = montar_serie(db, date(2025, 1, 10), date(2025, 1, 10), por="uf", max_series=3)
+    assert OUTROS not in por_chave(serie)
+
+
+def test_orgao_trocado_move_a_contagem(db):
+    salvar(db, item_pncp(1))
+    antes = montar_serie(db, date(2025, 1, 10), date(2025, 1, 10), por="orgao")
+    assert [(s["nome"], s["total"]) for s in antes["series"]] == [("Prefeitura 1", 1)]
+
+    # mesma licitação, agora publicada por outro órgão
+    outro_orgao = dict(item_pncp(1)["orgaoEntidade"], razaoSocial="Consórcio Intermunicipal")
+    salvar(db, item_pncp(1, orgaoEntidade=outro_orgao))
+
+    depois = montar_serie(db, date(2025, 1, 10), date(2025, 1, 10), por="orgao")
+    assert [(s["nome"], s["total"]) for s in depois["series"]] == [("Consórcio Intermunicipal", 1)]
+    assert sorted(total for (total,) in db.query(ContagemOrgaos.total)) == [0, 1]
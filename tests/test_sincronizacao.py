@@ -0,0 +1,121 @@
+from datetime import datetime
+
+import pytest
+
+import coletor_pncp
+import sincronizacao
+from coletas import coletar_periodo_completo
+from models import SincronizacaoPncp
+from sincronizacao import marcar_dia_concluido, planejar_inicio, registrar_pagina
+
+TAMANHO = 10
+
+
+def estado(data, concluido=False, ultima_pagina=0, tamanho_pagina=TAMANHO):
+    return SincronizacaoPncp(
+        data=data, modalidade=6, tamanho_pagina=tamanho_pagina, ultima_pagina=ultima_pagina, concluido=concluido
+    )
+
+
+@pytest.fixture
+def hoje(monkeypatch):
+    def fixar(instante: datetime):
+        monkeypatch.setattr(sincronizacao, "agora_pncp", lambda: instante)
+    fixar(datetime(2025, 3, 10, 12, 0))
+    return fixar
+
+
+def test_modo_normal_comeca_tudo_da_pagina_1(hoje):
+    estados = {"20250101": estado("20250101", concluido=True)}
+    assert planejar_inicio(["20250101", "20250102"], estados, TAMANHO, False, 3) == {"20250101": 1, "20250102": 1}
+
+
+def test_incremental_pula_concluidos_e_continua_da_proxima_pagina(hoje):
+    dias = ["20250101", "20250102", "20250103", "20250104"]
+    estados = {
+        "20250101": estado("20250101", concluido=True, ultima_pagina=4),
+        "20250102": estado("20250102", ultima_pagina=2),
+        # tamanho de página diferente: as páginas antigas não valem
+        "20250103": estado("20250103", ultima_pagina=5, tamanho_pagina=50),
+    }
+
+    assert planejar_inicio(dias, estados, TAMANHO, True, 3) == {"20250102": 3, "20250103": 1, "20250104": 1}
+
+
+def test_incremental_refaz_os_ultimos_dias_mesmo_concluidos(hoje):
+    dias = ["20250306", "20250307", "20250308", "20250309", "20250310"]
+    estados = {d: estado(d, concluido=True, ultima_pagina=2) for d in dias}
+
+    assert planejar_inicio(dias, estados, TAMANHO, True, 3) == {
+        "20250307": 1, "20250308": 1, "20250309": 1, "20250310": 1,
+    }
+
+
+def test_janela_de_reprocessamento_no_relogio_de_brasilia(hoje):
+    # 22h em Brasília = 01h do dia seguinte em UTC: ainda é dia 10
+    hoje(datetime(2025, 3, 10, 22, 0))
+    dias = ["20250309", "20250310"]
+    estados = {d: estado(d, concluido=True, ultima_pagina=1) for d in dias}
+
+    assert planejar_inicio(dias, estados, TAMANHO, True, 1) == {"20250309": 1, "20250310": 1}
+
+
+def test_marca_dagua_so_anda_de_forma_contigua(db):
+    estados, gravadas = {}, {}
+
+    def registrar(pagina):
+        registrar_pagina(db, estados, "20250101", 6, pagina, TAMANHO, {"totalPaginas": 5}, gravadas)
+        return estados["20250101"].ultima_pagina
+
+    # fora de ordem: 1, 3, 2 → a 3 só conta quando a 2 chega
+    assert [registrar(p) for p in (1, 3, 2)] == [1, 1, 3]
+    # a 4 falhou: a 5 não pula por cima dela
+    assert registrar(5) == 3
+    marcar_dia_concluido(db, estados, "20250101", 6, TAMANHO, 5)
+    assert not estados["20250101"].concluido
+    assert estados["20250101"].total_paginas == 5
+
+    # a página 1 de novo recomeça o dia
+    assert registrar(1) == 1
+
+
+def test_dia_vazio_fica_concluido(db):
+    estados = {}
+    marcar_dia_concluido(db, estados, "20250101", 6, TAMANHO, 0)
+    assert estados["20250101"].concluido
+
+
+def test_coleta_incremental_retoma_da_pagina_que_falhou(db, hoje, monkeypatch):
+    falhar = {2}
+    pedidas = []
+
+    def buscar_pagina(unidade, pagina, tamanho_pagina, limitador):
+        pedidas.append(pagina)
+        if pagina in falhar:
+            raise ConnectionError("caiu")
+        itens = [
+            {"numeroControlePNCP": f"{unidade[0]}-{pagina}-{i}", "objetoCompra": "x", "dataPublicacaoPncp": "2025-01-01T10:00:00"}
+            for i in range(tamanho_pagina)
+        ]
+        return itens, {"totalPaginas": 3, "totalRegistros": 3 * tamanho_pagina}
+
+    monkeypatch.setattr(coletor_pncp, "buscar_pagina", buscar_pagina)
+
+    primeira = coletar_periodo_completo(db, "20250101", "20250101", tamanho_pagina=TAMANHO, incremental=True)
+    assert primeira["status"] == "PARCIAL"
+    assert sorted(pedidas) == [1, 2, 3]
+    sinc = db.query(SincronizacaoPncp).one()
+    assert (sinc.ultima_pagina, sinc.concluido) == (1, False)
+
+    falhar.clear()
+    pedidas.clear()
+    segunda = coletar_periodo_completo(db, "20250101", "20250101", tamanho_pagina=TAMANHO, incremental=True)
+    assert segunda["status"] == "OK"
+    assert sorted(pedidas) == [2, 3]
+    db.refresh(sinc)
+    assert (sinc.ultima_pagina, sinc.concluido) == (3, True)
+
+    pedidas.clear()
+    terceira = coletar_periodo_completo(db, "20250101", "20250101", tamanho_pagina=TAMANHO, incremental=True)
+    assert pedidas == []
+    assert terceira["dias_ja_sincronizados"] == 1